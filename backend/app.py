@@ -1,21 +1,55 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context, send_file
 from flask_cors import CORS
 from config import Config
-from models import db, MedicineBatch, Manufacturer, Pharmacy
+from models import db, MedicineBatch, Manufacturer, Pharmacy, BatchExpiry
+from cache import batch_cache, field_check_cache
+from bloom import batch_filter
+from suggest import batch_suggestions
+from verification import (lookup_batch, lookup_batches, build_result, build_missing, verify_body,
+                          normalize_batch_number, filter_batches)
 import os
-from sqlalchemy import text
-from datetime import datetime
-from werkzeug.utils import secure_filename
+from sqlalchemy import text, tuple_
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from db_pool import pool_metrics, engine_options
+from db_routing import db_router
+from ledger import inclusion_proof
+from uploads import upload_pipeline
+from passwords import password_hasher
+from instrumentation import instrumentation
+from ratelimit import rate_limiter
+from scan_events import scan_log
+from snapshot import catalogue_snapshots
+from review_queue import (MODELS as REVIEW_MODELS, STATUSES as REVIEW_STATUSES, parse_cursor,
+                          queue_page, queue_summary, set_status, review_required)
+from http_cache import data_version, page_etag, not_modified, cacheable, cache_miss, verify_cache_options
+from uniqueness import find_conflict, integrity_conflict, field_exists, forget_fields, normalize_field, FIELD_COLUMNS
+from sqlalchemy.exc import IntegrityError
+import threading
+import time
+from datetime import datetime, date, timedelta
+import json
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     CORS(app)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    db_router.init_app(app)  # adds the replica binds, so before db.init_app
     db.init_app(app)
+    instrumentation.init_app(app)
+    rate_limiter.init_app(app)
+    batch_cache.init_app(app)
+    field_check_cache.init_app(app, prefix='CHECK_FIELD_CACHE', watch_version=False)
+    batch_filter.init_app(app)
+    batch_suggestions.init_app(app)
+    upload_pipeline.init_app(app)
+    password_hasher.init_app(app)
+    scan_log.init_app(app)
+    catalogue_snapshots.init_app(app)
     
     upload_folders = [
-        os.path.join('static', 'uploads', 'manufacturers'),
-        os.path.join('static', 'uploads', 'pharmacies')
+        app.config['UPLOAD_STAGING_FOLDER'],
+        app.config['UPLOAD_STORE_FOLDER']
     ]
     for folder in upload_folders:
         os.makedirs(folder, exist_ok=True)
@@ -33,21 +67,87 @@ def register_routes(app):
             'version': '1.0.0'
         })
     
+    @app.errorhandler(PoolTimeoutError)
+    def pool_exhausted(e):
+        """Every connection is checked out and none came back within DB_POOL_TIMEOUT"""
+        response = jsonify({
+            'success': False,
+            'message': 'Server is busy, please retry shortly',
+            'error': 'database connection pool exhausted'
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    health_state = {'checked_at': 0.0, 'body': None, 'status': 200}
+    health_lock = threading.Lock()
+    
     @app.route('/api/health')
     def health_check():
-        try:
-            db.session.execute(text('SELECT 1'))
-            return jsonify({
-                'status': 'healthy',
-                'database': 'connected',
-                'timestamp': datetime.utcnow().isoformat()
-            })
-        except Exception as e:
-            return jsonify({
-                'status': 'unhealthy',
-                'error': str(e),
-                'timestamp': datetime.utcnow().isoformat()
-            }), 500
+        """Liveness probe, answered from the last DB round-trip for HEALTH_CACHE_SECONDS"""
+        max_age = app.config.get('HEALTH_CACHE_SECONDS', 0)
+        fresh = request.args.get('fresh') == '1'
+        with health_lock:
+            age = time.monotonic() - health_state['checked_at']
+            if not fresh and health_state['body'] and age < max_age:
+                return jsonify(dict(health_state['body'], cached=True, age=round(age, 3))), health_state['status']
+            
+            try:
+                db.session.execute(text('SELECT 1'))
+                body, status = {
+                    'status': 'healthy',
+                    'database': 'connected',
+                    'timestamp': datetime.utcnow().isoformat()
+                }, 200
+            except Exception as e:
+                body, status = {
+                    'status': 'unhealthy',
+                    'error': str(e),
+                    'timestamp': datetime.utcnow().isoformat()
+                }, 500
+            health_state.update(checked_at=time.monotonic(), body=body, status=status)
+            return jsonify(dict(body, cached=False)), status
+    
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """Request, query and payload counters plus pool and cache gauges, Prometheus text format"""
+        pool = pool_metrics.snapshot(db.engine.pool)
+        cache = batch_cache.stats()
+        scans = scan_log.stats()
+        routing = db_router.stats()
+        gauges = [
+            ('pharmaledger_db_pool_wait_ms_max', 'Longest checkout wait in milliseconds.', pool['wait_ms_max']),
+            ('pharmaledger_batch_cache_size', 'Entries in the verify-batch cache.', cache['size']),
+            ('pharmaledger_batch_cache_hit_ratio', 'Hit ratio of the verify-batch cache.', cache['hit_ratio']),
+            ('pharmaledger_scan_log_buffered', 'Scan events waiting to be written.', scans['buffered']),
+            ('pharmaledger_db_replicas_healthy', 'Replicas currently taking reads.',
+             sum(replica['healthy'] for replica in routing['replicas']))
+        ]
+        if 'checked_out' in pool:
+            gauges.append(('pharmaledger_db_pool_checked_out', 'Connections in use.', pool['checked_out']))
+        # only ever go up until a restart, so counter series with the _total suffix
+        counters = [
+            ('pharmaledger_db_pool_checkouts_total', 'Connection checkouts since start.', pool['checkouts']),
+            ('pharmaledger_db_pool_timeouts_total', 'Checkouts that timed out since start.', pool['timeouts']),
+            ('pharmaledger_rate_limited_total', 'Requests rejected with 429 since start.',
+             rate_limiter.stats()['limited']),
+            ('pharmaledger_scan_log_dropped_total', 'Scan events overwritten before they were written.',
+             scans['dropped']),
+            ('pharmaledger_scan_anomalies_total', 'Verify scans flagged as anomalous since start.', scans['anomalies']),
+            ('pharmaledger_db_replica_reads_total', 'Read requests sent to a replica since start.',
+             sum(replica['reads'] for replica in routing['replicas'])),
+            ('pharmaledger_db_replica_fallbacks_total',
+             'Read requests sent to the primary for lack of a healthy replica.', routing['fallbacks'])
+        ]
+        return Response(instrumentation.render(gauges, counters), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/api/metrics/pool', methods=['GET'])
+    def pool_stats():
+        """Connection pool state and checkout wait times"""
+        return jsonify({
+            'success': True,
+            'pool': pool_metrics.snapshot(db.engine.pool),
+            'routing': db_router.stats()
+        })
     
     @app.route('/api/verify-batch', methods=['GET'])
     def verify_batch():
@@ -59,31 +159,80 @@ def register_routes(app):
                     'message': 'Batch number is required'
                 }), 400
             
-            batch = MedicineBatch.query.filter_by(batch_number=batch_number.upper()).first()
-            
-            if not batch:
+            # read before the lookup, so a reload in between only costs the client a revalidation
+            version = data_version()
+            record = lookup_batch(batch_number)
+            # buffered, flushed to scan_events in batches; the window says whether this batch
+            # number is being scanned implausibly often or from implausibly many places
+            anomalies = scan_log.record(normalize_batch_number(batch_number), record is not None,
+                                        rate_limiter.client_ip())
+            
+            body, status = verify_body(batch_number, record, anomalies, app.config.get('SUGGEST_ON_MISS', 3))
+            if not record:
+                return cache_miss(jsonify(body), scan_log.enabled, app.config.get('VERIFY_MISS_MAX_AGE', 30),
+                                  body.get('suggestionsWarming', False)), status
+            
+            proof = request.args.get('proof') == '1'
+            if proof:
+                # tamper-evidence: the sealed ledger entry of the returned record with its merkle path
+                body['ledger'] = inclusion_proof(db.session.connection(), record)
+            options = verify_cache_options(record, body['status'], anomalies, version, proof, scan_log.enabled,
+                                           app.config.get('VERIFY_CACHE_MAX_AGE', 300))
+            return cacheable(jsonify(body), **options)
+            
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Internal server error',
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/verify-batches', methods=['POST'])
+    def verify_batches():
+        """Bulk verification for pharmacy shelf audits, one result per submitted batch number"""
+        try:
+            payload = request.get_json(silent=True) or {}
+            batch_numbers = payload.get('batch_numbers')
+            if not isinstance(batch_numbers, list) or not batch_numbers:
                 return jsonify({
                     'success': False,
-                    'isAuthentic': False,
-                    'message': 'Batch number not found in database',
-                    'batchNumber': batch_number
-                }), 404
+                    'message': 'batch_numbers must be a non-empty list'
+                }), 400
             
-            is_expired = batch.expiry_date < datetime.utcnow().date()
+            max_batches = app.config.get('BULK_VERIFY_MAX', 5000)
+            if len(batch_numbers) > max_batches:
+                return jsonify({
+                    'success': False,
+                    'message': f'At most {max_batches} batch numbers per request'
+                }), 413
+            
+            batch_numbers = [str(value) for value in batch_numbers]
+            records = lookup_batches(batch_numbers, app.config.get('BULK_VERIFY_CHUNK_SIZE', 500))
+            today = datetime.utcnow().date()
+            
+            results = []
+            summary = {'authentic': 0, 'expired': 0, 'notFound': 0}
+            for batch_number in batch_numbers:
+                record = records.get(normalize_batch_number(batch_number))
+                if not record:
+                    results.append(build_missing(batch_number))
+                    summary['notFound'] += 1
+                    continue
+                result = build_result(record, today)
+                results.append(result)
+                summary['authentic' if result['isAuthentic'] else 'expired'] += 1
             
             return jsonify({
                 'success': True,
-                'isAuthentic': not is_expired,
-                'batchNumber': batch.batch_number,
-                'productName': batch.medicine_name,
-                'manufacturer': 'Verified Manufacturer',
-                'manufactureDate': batch.manufacture_date.strftime('%Y-%m-%d'),
-                'expiryDate': batch.expiry_date.strftime('%Y-%m-%d'),
-                'status': 'Expired' if is_expired else 'Authentic',
-                'pharmacyName': batch.pharmacy_name,
-                'dateUploaded': batch.date_uploaded.strftime('%Y-%m-%d %H:%M:%S') if batch.date_uploaded else None
+                'count': len(results),
+                'summary': summary,
+                'results': results
             })
             
+        except PoolTimeoutError:
+            raise
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -91,15 +240,89 @@ def register_routes(app):
                 'error': str(e)
             }), 500
     
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        """Hit/miss/eviction counters of the verify-batch cache, Bloom filter and suggestion index"""
+        return jsonify({
+            'success': True,
+            'cache': batch_cache.stats(),
+            'filter': batch_filter.stats(),
+            'suggestions': batch_suggestions.stats()
+        })
+    
+    @app.route('/api/suggest-batch', methods=['GET'])
+    def suggest_batch():
+        """Ranked near-matches for a mistyped or misread batch number, served from memory"""
+        try:
+            query = request.args.get('q', '').strip()
+            if not query:
+                return jsonify({
+                    'success': False,
+                    'message': 'q is required'
+                }), 400
+            
+            limit = max(1, min(request.args.get('limit', 5, type=int), app.config.get('SUGGEST_MAX_RESULTS', 10)))
+            return jsonify({
+                'success': True,
+                'query': query.upper(),
+                'suggestions': batch_suggestions.suggest(query, limit),
+                'warming': batch_suggestions.warming
+            })
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Error building suggestions',
+                'error': str(e)
+            }), 500
+    
     @app.route('/api/batches', methods=['GET'])
     def get_all_batches():
+        """Keyset pagination on medicine_id, or a streamed NDJSON export with format=ndjson"""
         try:
-            batches = MedicineBatch.query.all()
-            return jsonify({
+            # a page is fully determined by the data version and the query string
+            version = data_version()
+            etag = page_etag(version, request.query_string)
+            max_age = app.config.get('BATCHES_CACHE_MAX_AGE', 60)
+            if not_modified(etag):
+                return cacheable(Response(), etag, version, max_age)
+            
+            try:
+                query = filter_batches(MedicineBatch.query, request.args)
+                after = request.args.get('cursor', type=int)
+                limit = max(1, min(request.args.get('limit', 100, type=int), app.config.get('BATCHES_PAGE_MAX', 1000)))
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Dates must be in YYYY-MM-DD format'
+                }), 400
+            
+            if after is not None:
+                query = query.filter(MedicineBatch.medicine_id > after)
+            query = query.order_by(MedicineBatch.medicine_id)
+            
+            if request.args.get('format') == 'ndjson':
+                # rows are fetched in chunks of yield_per, so memory stays flat whatever the table size
+                rows = query.yield_per(app.config.get('BATCHES_EXPORT_CHUNK', 1000))
+                
+                def generate():
+                    for batch in rows:
+                        yield json.dumps(batch.to_dict()) + '\n'
+                
+                response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+                return cacheable(response, etag, version, max_age)
+            
+            batches = query.limit(limit).all()
+            next_cursor = batches[-1].medicine_id if len(batches) == limit else None
+            return cacheable(jsonify({
                 'success': True,
                 'count': len(batches),
-                'batches': [batch.to_dict() for batch in batches]
-            })
+                'batches': [batch.to_dict() for batch in batches],
+                'next_cursor': next_cursor
+            }), etag, version, max_age)
+        except PoolTimeoutError:
+            raise
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -107,19 +330,242 @@ def register_routes(app):
                 'error': str(e)
             }), 500
 
+    @app.route('/api/catalogue/manifest', methods=['GET'])
+    def catalogue_manifest():
+        """Snapshot ids, sizes, digests and deltas the loader has published for offline clients"""
+        manifest = catalogue_snapshots.manifest() if catalogue_snapshots.enabled else None
+        if not manifest:
+            return jsonify({
+                'success': False,
+                'message': 'No catalogue snapshot has been published yet'
+            }), 404
+        return jsonify({
+            'success': True,
+            'manifest': manifest
+        })
+    
+    @app.route('/api/catalogue/snapshot', methods=['GET'])
+    @app.route('/api/catalogue/delta', methods=['GET'])
+    def catalogue_sync():
+        """Latest signed catalogue snapshot, or with ?since=<id> the delta from that snapshot.
+
+        A client already on the latest snapshot gets a 204, one whose snapshot is no longer
+        kept gets the full file; X-Snapshot-Kind says which one was sent.
+        """
+        since = request.args.get('since')
+        if since is not None and not since.isdigit():
+            return jsonify({
+                'success': False,
+                'message': 'since must be a snapshot id'
+            }), 400
+        
+        found = catalogue_snapshots.for_sync(int(since) if since else None) if catalogue_snapshots.enabled else None
+        if found is None:
+            return jsonify({
+                'success': False,
+                'message': 'No catalogue snapshot has been published yet'
+            }), 404
+        kind, entry = found
+        latest = catalogue_snapshots.manifest()['latest']
+        if kind == 'current':
+            response = Response(status=204)
+        else:
+            response = send_file(catalogue_snapshots.path(entry), mimetype='application/octet-stream',
+                                 as_attachment=True, download_name=entry['file'], etag=entry['sha256'],
+                                 max_age=app.config.get('SNAPSHOT_CACHE_MAX_AGE', 60), conditional=True)
+            response.headers['X-Snapshot-Sha256'] = entry['sha256']
+        response.headers['X-Snapshot-Kind'] = kind
+        response.headers['X-Snapshot-Id'] = str(latest)
+        return response
+    
+    @app.route('/api/catalogue/ledger', methods=['GET'])
+    def catalogue_ledger():
+        """Signed roots of every sealed ledger block, to check verify-batch ?proof=1 answers against"""
+        manifest = catalogue_snapshots.manifest() if catalogue_snapshots.enabled else None
+        entry = manifest.get('ledger') if manifest else None
+        if not entry:
+            return jsonify({
+                'success': False,
+                'message': 'No ledger roots have been published yet'
+            }), 404
+        response = send_file(catalogue_snapshots.path(entry), mimetype='application/json', etag=entry['sha256'],
+                             max_age=app.config.get('SNAPSHOT_CACHE_MAX_AGE', 60), conditional=True)
+        response.headers['X-Snapshot-Id'] = str(manifest['latest'])
+        return response
+    
+    @app.route('/api/reports/expiring', methods=['GET'])
+    def expiring_report():
+        """Batches expiring within `days`, served from the loader-maintained batch_expiry summary"""
+        try:
+            try:
+                days = request.args.get('days', app.config.get('EXPIRY_REPORT_DEFAULT_DAYS', 30), type=int)
+                days = min(max(days, 0), app.config.get('EXPIRY_REPORT_MAX_DAYS', 365))
+                limit = max(1, min(request.args.get('limit', 100, type=int), app.config.get('BATCHES_PAGE_MAX', 1000)))
+                after = None
+                if request.args.get('cursor'):
+                    cursor_date, cursor_id = request.args['cursor'].split(':')
+                    after = (date.fromisoformat(cursor_date), int(cursor_id))
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Invalid cursor'
+                }), 400
+            
+            today = datetime.utcnow().date()
+            query = BatchExpiry.query.filter(BatchExpiry.expiry_date <= today + timedelta(days=days))
+            if request.args.get('include_expired') != '1':
+                query = query.filter(BatchExpiry.expiry_date >= today)
+            if request.args.get('pharmacy_name'):
+                query = query.filter(BatchExpiry.pharmacy_name == request.args['pharmacy_name'].strip())
+            if after is not None:
+                query = query.filter(tuple_(BatchExpiry.expiry_date, BatchExpiry.id) > after)
+            
+            # (expiry_date, id) keyset walks ix_batch_expiry_expiry / ix_batch_expiry_pharmacy_expiry
+            rows = query.order_by(BatchExpiry.expiry_date, BatchExpiry.id).limit(limit).all()
+            next_cursor = f"{rows[-1].expiry_date.isoformat()}:{rows[-1].id}" if len(rows) == limit else None
+            return jsonify({
+                'success': True,
+                'as_of': today.strftime('%Y-%m-%d'),
+                'days': days,
+                'count': len(rows),
+                'batches': [row.to_dict(today) for row in rows],
+                'next_cursor': next_cursor
+            })
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Error building expiry report',
+                'error': str(e)
+            }), 500
+
+    @app.route('/api/review/summary', methods=['GET'])
+    @review_required
+    def review_summary():
+        """Registrations per status for manufacturers and pharmacies"""
+        try:
+            return jsonify({
+                'success': True,
+                'queues': {kind: queue_summary(db.session, kind) for kind in REVIEW_MODELS}
+            })
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Error reading review queues',
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/review/<kind>', methods=['GET'])
+    @review_required
+    def review_queue(kind):
+        """Registrations in one status (pending by default), oldest first, keyset-paginated"""
+        if kind not in REVIEW_MODELS:
+            return jsonify({
+                'success': False,
+                'message': 'Unknown review queue'
+            }), 404
+        status = request.args.get('status', 'pending')
+        if status not in REVIEW_STATUSES:
+            return jsonify({
+                'success': False,
+                'message': f"status must be one of {', '.join(REVIEW_STATUSES)}"
+            }), 400
+        try:
+            limit = min(max(request.args.get('limit', 100, type=int), 1), app.config.get('REVIEW_PAGE_MAX', 500))
+            after = parse_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid cursor'
+            }), 400
+        try:
+            # (status, created_at, id) keyset walks ix_<kind>_status_created
+            items, next_cursor = queue_page(db.session, kind, status, after, limit)
+            return jsonify({
+                'success': True,
+                'status': status,
+                'count': len(items),
+                kind: items,
+                'next_cursor': next_cursor
+            })
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Error reading review queue',
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/review/<kind>/status', methods=['POST'])
+    @review_required
+    def review_set_status(kind):
+        """Bulk status change, {"ids": [...], "status": "approved"} runs as one UPDATE"""
+        if kind not in REVIEW_MODELS:
+            return jsonify({
+                'success': False,
+                'message': 'Unknown review queue'
+            }), 404
+        payload = request.get_json(silent=True) or {}
+        ids = payload.get('ids')
+        status = payload.get('status')
+        if status not in REVIEW_STATUSES:
+            return jsonify({
+                'success': False,
+                'message': f"status must be one of {', '.join(REVIEW_STATUSES)}"
+            }), 400
+        if (not isinstance(ids, list) or not ids
+                or not all(isinstance(value, int) and not isinstance(value, bool) for value in ids)):
+            return jsonify({
+                'success': False,
+                'message': 'ids must be a non-empty list of registration ids'
+            }), 400
+        max_ids = app.config.get('REVIEW_BULK_MAX', 1000)
+        if len(ids) > max_ids:
+            return jsonify({
+                'success': False,
+                'message': f'At most {max_ids} ids per request'
+            }), 413
+        
+        try:
+            ids = sorted(set(ids))
+            updated = set_status(db.session, kind, ids, status)
+            db.session.commit()
+            app.logger.info('review status changed', extra={'queue': kind, 'status': status,
+                                                            'requested': len(ids), 'updated': updated})
+            return jsonify({
+                'success': True,
+                'status': status,
+                'requested': len(ids),
+                'updated': updated,
+                'skipped': len(ids) - updated  # missing or not in a state `status` can follow
+            })
+        except PoolTimeoutError:
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'message': 'Error updating registrations',
+                'error': str(e)
+            }), 500
+    
     # route for registering manufacturers
     @app.route('/api/register-manufacturer', methods=['POST'])
     def register_manufacturer():
-        print("Manufacturer registration route called")
         try:
             from datetime import date
             
             form_data = request.form
             files = request.files
             
-            print("=== RECEIVED DATA ===")
-            print("Form fields:", dict(form_data))
-            print("Files:", list(files.keys()))
+            # field names only, the values are personal data
+            app.logger.debug('manufacturer registration received',
+                             extra={'fields': sorted(form_data.keys()), 'files': sorted(files.keys())})
             
             required = ['company-name', 'license-number', 'contact-name',
                        'contact-phone', 'contact-email', 'password']
@@ -131,24 +577,16 @@ def register_routes(app):
                         'error': f'{field.replace("-", " ").title()} is required'
                     }), 400
             
-            if Manufacturer.query.filter_by(contact_email=form_data.get('contact-email').strip().lower()).first():
-                return jsonify({'success': False, 'error': 'Email already registered'}), 409
-            
-            if Manufacturer.query.filter_by(contact_phone=form_data.get('contact-phone').strip()).first():
-                return jsonify({'success': False, 'error': 'Phone already registered'}), 409
+            contact_email = form_data.get('contact-email').strip().lower()
+            contact_phone = form_data.get('contact-phone').strip()
+            license_number = form_data.get('license-number').strip()
+            conflict = find_conflict(Manufacturer, contact_email, contact_phone, license_number)
+            if conflict:
+                return jsonify({'success': False, 'error': conflict}), 409
             
-            if Manufacturer.query.filter_by(license_number=form_data.get('license-number').strip()).first():
-                return jsonify({'success': False, 'error': 'License already registered'}), 409
-            
-            license_file_path = None
-            if 'license-document' in files:
-                file = files['license-document']
-                if file and file.filename:
-                    filename = secure_filename(f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
-                    folder = os.path.join('static', 'uploads', 'manufacturers')
-                    os.makedirs(folder, exist_ok=True)
-                    file.save(os.path.join(folder, filename))
-                    license_file_path = f'/static/uploads/manufacturers/{filename}'
+            # files were spooled into the staging folder while the form was parsed,
+            # hashing and moving them into storage happens on the upload pool after commit
+            license_upload = upload_pipeline.stage(files.get('license-document'))
             
             license_expiry = None
             if form_data.get('license-expiry'):
@@ -174,7 +612,7 @@ def register_routes(app):
                 website=form_data.get('website', '').strip() or None,
                 company_profile=form_data.get('company-profile', '').strip() or None,
                 certifications=form_data.get('certifications', '').strip() or None,
-                license_file=license_file_path,
+                license_file=license_upload[1] if license_upload else None,
                 status='pending'
             )
             
@@ -182,8 +620,11 @@ def register_routes(app):
             
             db.session.add(manufacturer)
             db.session.commit()
+            forget_fields(Manufacturer, contact_email, contact_phone, license_number)
+            
+            upload_pipeline.submit(Manufacturer, manufacturer.id, 'license_file', [license_upload] if license_upload else [])
             
-            print(f"✓ Saved: {manufacturer.company_name} (ID: {manufacturer.id})")
+            app.logger.info('manufacturer registered', extra={'manufacturer_id': manufacturer.id})
             
             return jsonify({
                 'success': True,
@@ -192,11 +633,23 @@ def register_routes(app):
                 'registration_id': f'MFG-{manufacturer.id:06d}'
             }), 201
             
+        except IntegrityError as e:
+            # lost a race with a concurrent registration, the unique constraints caught it
+            db.session.rollback()
+            upload_pipeline.discard_claimed()
+            conflict = integrity_conflict(e)
+            if conflict:
+                return jsonify({'success': False, 'error': conflict}), 409
+            app.logger.error('registration failed', extra={'path': request.path, 'error': str(e)})
+            return jsonify({
+                'success': False,
+                'error': 'Registration failed. Please try again.'
+            }), 500
+            
         except Exception as e:
             db.session.rollback()
-            print(f"✗ Error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            upload_pipeline.discard_claimed()
+            app.logger.exception('registration failed', extra={'path': request.path})
             return jsonify({
                 'success': False,
                 'error': 'Registration failed. Please try again.'
@@ -204,7 +657,6 @@ def register_routes(app):
     
     @app.route('/api/register-pharmacy', methods=['POST'])
     def register_pharmacy():
-        print("Pharmacy registration route called")
         try:
             from datetime import date
             
@@ -212,10 +664,9 @@ def register_routes(app):
             form_data = request.form
             files = request.files
 
-            # for me to know it's working
-            print("=== RECEIVED PHARMACY DATA ===")
-            print("Form fields:", dict(form_data))
-            print("Files:", list(files.keys()))
+            # field names only, the values are personal data
+            app.logger.debug('pharmacy registration received',
+                             extra={'fields': sorted(form_data.keys()), 'files': sorted(files.keys())})
             
             required = ['pharmacy-name', 'pharmacy-type', 'license-number', 
                        'owner-name', 'contact-name', 'contact-phone', 
@@ -228,45 +679,18 @@ def register_routes(app):
                         'error': f'{field.replace("-", " ").title()} is required'
                     }), 400
             
-            if Pharmacy.query.filter_by(contact_email=form_data.get('contact-email').strip().lower()).first():
-                return jsonify({'success': False, 'error': 'Email already registered'}), 409
-            
-            if Pharmacy.query.filter_by(contact_phone=form_data.get('contact-phone').strip()).first():
-                return jsonify({'success': False, 'error': 'Phone already registered'}), 409
-            
-            if Pharmacy.query.filter_by(license_number=form_data.get('license-number').strip()).first():
-                return jsonify({'success': False, 'error': 'License already registered'}), 409
-            
-            license_file_path = None
-            if 'license-document' in files:
-                file = files['license-document']
-                if file and file.filename:
-                    filename = secure_filename(f"{datetime.now().strftime('%Y%m%d%H%M%S')}_license_{file.filename}")
-                    folder = os.path.join('static', 'uploads', 'pharmacies')
-                    os.makedirs(folder, exist_ok=True)
-                    file.save(os.path.join(folder, filename))
-                    license_file_path = f'/static/uploads/pharmacies/{filename}'
-            
-            pharmacist_cert_path = None
-            if 'pharmacist-certificate' in files:
-                file = files['pharmacist-certificate']
-                if file and file.filename:
-                    filename = secure_filename(f"{datetime.now().strftime('%Y%m%d%H%M%S')}_pharmacist_{file.filename}")
-                    folder = os.path.join('static', 'uploads', 'pharmacies')
-                    os.makedirs(folder, exist_ok=True)
-                    file.save(os.path.join(folder, filename))
-                    pharmacist_cert_path = f'/static/uploads/pharmacies/{filename}'
-            
-            other_docs_paths = []
-            if 'other-documents' in files:
-                other_files = request.files.getlist('other-documents')
-                for file in other_files:
-                    if file and file.filename:
-                        filename = secure_filename(f"{datetime.now().strftime('%Y%m%d%H%M%S')}_other_{file.filename}")
-                        folder = os.path.join('static', 'uploads', 'pharmacies')
-                        os.makedirs(folder, exist_ok=True)
-                        file.save(os.path.join(folder, filename))
-                        other_docs_paths.append(f'/static/uploads/pharmacies/{filename}')
+            contact_email = form_data.get('contact-email').strip().lower()
+            contact_phone = form_data.get('contact-phone').strip()
+            license_number = form_data.get('license-number').strip()
+            conflict = find_conflict(Pharmacy, contact_email, contact_phone, license_number)
+            if conflict:
+                return jsonify({'success': False, 'error': conflict}), 409
+            
+            # files were spooled into the staging folder while the form was parsed,
+            # hashing and moving them into storage happens on the upload pool after commit
+            license_upload = upload_pipeline.stage(files.get('license-document'))
+            certificate_upload = upload_pipeline.stage(files.get('pharmacist-certificate'))
+            other_uploads = [upload for upload in map(upload_pipeline.stage, files.getlist('other-documents')) if upload]
             
             license_expiry = None
             if form_data.get('license-expiry'):
@@ -292,9 +716,9 @@ def register_routes(app):
                 contact_designation=form_data.get('contact-designation', '').strip() or None,
                 contact_phone=form_data.get('contact-phone', '').strip(),
                 contact_email=form_data.get('contact-email', '').strip().lower(),
-                license_file=license_file_path,
-                pharmacist_certificate=pharmacist_cert_path,
-                other_documents=','.join(other_docs_paths) if other_docs_paths else None,
+                license_file=license_upload[1] if license_upload else None,
+                pharmacist_certificate=certificate_upload[1] if certificate_upload else None,
+                other_documents=','.join(url for _, url in other_uploads) if other_uploads else None,
                 certifications=form_data.get('other-certifications', '').strip() or None,
                 status='pending'
             )
@@ -303,8 +727,13 @@ def register_routes(app):
             
             db.session.add(pharmacy)
             db.session.commit()
+            forget_fields(Pharmacy, contact_email, contact_phone, license_number)
             
-            print(f"✓ Saved: {pharmacy.pharmacy_name} (ID: {pharmacy.id})")
+            upload_pipeline.submit(Pharmacy, pharmacy.id, 'license_file', [license_upload] if license_upload else [])
+            upload_pipeline.submit(Pharmacy, pharmacy.id, 'pharmacist_certificate', [certificate_upload] if certificate_upload else [])
+            upload_pipeline.submit(Pharmacy, pharmacy.id, 'other_documents', other_uploads, joined=True)
+            
+            app.logger.info('pharmacy registered', extra={'pharmacy_id': pharmacy.id})
             
             return jsonify({
                 'success': True,
@@ -313,11 +742,23 @@ def register_routes(app):
                 'registration_id': f'PHR-{pharmacy.id:06d}'
             }), 201
             
+        except IntegrityError as e:
+            # lost a race with a concurrent registration, the unique constraints caught it
+            db.session.rollback()
+            upload_pipeline.discard_claimed()
+            conflict = integrity_conflict(e)
+            if conflict:
+                return jsonify({'success': False, 'error': conflict}), 409
+            app.logger.error('registration failed', extra={'path': request.path, 'error': str(e)})
+            return jsonify({
+                'success': False,
+                'error': 'Registration failed. Please try again.'
+            }), 500
+            
         except Exception as e:
             db.session.rollback()
-            print(f"✗ Error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            upload_pipeline.discard_claimed()
+            app.logger.exception('registration failed', extra={'path': request.path})
             return jsonify({
                 'success': False,
                 'error': 'Registration failed. Please try again.'
@@ -333,27 +774,14 @@ def register_routes(app):
         if not field or not value:
             return jsonify({'exists': False})
         
+        if field not in FIELD_COLUMNS:
+            return jsonify({'exists': False})
+        
         try:
-            exists = False
-            
-            if entity_type == 'pharmacy':
-                if field == 'email':
-                    exists = Pharmacy.query.filter_by(contact_email=value.lower()).first()
-                elif field == 'phone':
-                    exists = Pharmacy.query.filter_by(contact_phone=value).first()
-                elif field == 'license':
-                    exists = Pharmacy.query.filter_by(license_number=value).first()
-            else:  
-                if field == 'email':
-                    exists = Manufacturer.query.filter_by(contact_email=value.lower()).first()
-                elif field == 'phone':
-                    exists = Manufacturer.query.filter_by(contact_phone=value).first()
-                elif field == 'license':
-                    exists = Manufacturer.query.filter_by(license_number=value).first()
-            
-            return jsonify({'exists': bool(exists)})
+            model = Pharmacy if entity_type == 'pharmacy' else Manufacturer
+            return jsonify({'exists': field_exists(model, field, normalize_field(field, value))})
         except Exception as e:
-            print(f"Check field error: {str(e)}")
+            app.logger.warning('check-field failed', extra={'field': field, 'error': str(e)})
             return jsonify({'exists': False})
 
 app = create_app()
@@ -361,5 +789,5 @@ app = create_app()
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-        print("✓ Database tables created!")
+        app.logger.info('database tables created')
     app.run(debug=True, host='127.0.0.1', port=5000)
@@ -0,0 +1,188 @@
+# asyncio serving mode for the read-only endpoints (/api/verify-batch, /api/health, /api/batches)
+# same routes and JSON contract as app.py, served by Quart on an async SQLAlchemy engine (aiomysql)
+# so one worker keeps thousands of scans in flight. registrations stay on the flask app.
+# install with: pip install -r requirements-async.txt
+# run with: hypercorn async_app:app --bind 127.0.0.1:8000 --workers 4
+import json
+from datetime import datetime
+from quart import Quart, jsonify, request, Response
+from quart_cors import cors
+from sqlalchemy import select, text, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from config import Config
+from models import MedicineBatch, Batch
+from cache import batch_cache
+from bloom import batch_filter
+from scan_events import scan_log
+from suggest import batch_suggestions
+from ratelimit import rate_limiter, client_address
+from ledger import inclusion_proof
+from http_cache import (data_version, page_etag, cache_headers, not_modified_response, still_fresh, cache_miss,
+                        verify_cache_options)
+from verification import verify_body, normalize_batch_number, snapshot, filter_batches
+
+BATCH_COLUMNS = MedicineBatch.__table__.c
+
+def create_async_app():
+    app = Quart(__name__)
+    app.config.from_object(Config)
+    app = cors(app)
+    batch_cache.init_app(app)
+    batch_filter.init_app(app)
+    rate_limiter.init_async_app(app)
+    # the scan log and the suggestion index work from their own threads, through a small
+    # sync engine on the same database
+    sync_engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'], pool_size=2, max_overflow=0,
+                                pool_pre_ping=True)
+    scan_log.init_app(app, engine=sync_engine)
+    batch_suggestions.init_app(app, engine=sync_engine)
+
+    engine = create_async_engine(
+        app.config['ASYNC_DATABASE_URI'],
+        pool_size=app.config.get('ASYNC_POOL_SIZE', 20),
+        max_overflow=app.config.get('ASYNC_MAX_OVERFLOW', 10),
+        pool_recycle=app.config.get('ASYNC_POOL_RECYCLE', 1800),
+        pool_pre_ping=True
+    )
+    app.extensions['async_engine'] = engine
+
+    @app.after_serving
+    async def dispose_engine():
+        await engine.dispose()
+
+    register_async_routes(app, engine)
+    return app
+
+async def lookup_batch_async(engine, batch_number, catalogue):
+    """Async twin of verification.lookup_batch, shares the same cache and Bloom filter"""
+    key = normalize_batch_number(batch_number)
+    hit, record = batch_cache.get(key)
+    if hit:
+        return record
+
+    generation = batch_cache.generation
+    if not batch_filter.might_contain(key):
+        batch_cache.set(key, None, generation)
+        return None
+
+    table = Batch.__table__ if catalogue else MedicineBatch.__table__
+    stmt = select(table).where(table.c.batch_number == key)
+    if not catalogue:
+        stmt = stmt.order_by(table.c.medicine_id)  # the first unit row, like lookup_batch
+    async with engine.connect() as conn:
+        result = await conn.execute(stmt.limit(1))
+        row = result.first()
+    record = snapshot(row) if row else None
+    batch_cache.set(key, record, generation)
+    return record
+
+def register_async_routes(app, engine):
+
+    @app.route('/api/health')
+    async def health_check():
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text('SELECT 1'))
+            return jsonify({
+                'status': 'healthy',
+                'database': 'connected',
+                'timestamp': datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            return jsonify({
+                'status': 'unhealthy',
+                'error': str(e),
+                'timestamp': datetime.utcnow().isoformat()
+            }), 500
+
+    @app.route('/api/verify-batch', methods=['GET'])
+    async def verify_batch():
+        try:
+            batch_number = request.args.get('batch_number', '').strip()
+            if not batch_number:
+                return jsonify({
+                    'success': False,
+                    'message': 'Batch number is required'
+                }), 400
+
+            # same body, caching and 304s as app.py's verify_batch
+            version = data_version()
+            record = await lookup_batch_async(engine, batch_number, app.config.get('BATCH_CATALOGUE_ENABLED', False))
+            ip = client_address(request.headers, request.remote_addr, app.config.get('RATE_LIMIT_TRUSTED_PROXIES', 0))
+            anomalies = scan_log.record(normalize_batch_number(batch_number), record is not None, ip)
+
+            body, status = verify_body(batch_number, record, anomalies, app.config.get('SUGGEST_ON_MISS', 3))
+            if not record:
+                return cache_miss(jsonify(body), scan_log.enabled, app.config.get('VERIFY_MISS_MAX_AGE', 30),
+                                  body.get('suggestionsWarming', False)), status
+
+            proof = request.args.get('proof') == '1'
+            if proof:
+                async with engine.connect() as conn:
+                    body['ledger'] = await conn.run_sync(inclusion_proof, record)
+            options = verify_cache_options(record, body['status'], anomalies, version, proof, scan_log.enabled,
+                                           app.config.get('VERIFY_CACHE_MAX_AGE', 300))
+            conditional = options.pop('conditional')
+            response = cache_headers(jsonify(body), **options)
+            if conditional and still_fresh(request.headers, response):
+                return not_modified_response(Response, **options)
+            return response
+
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Internal server error',
+                'error': str(e)
+            }), 500
+
+    @app.route('/api/batches', methods=['GET'])
+    async def get_all_batches():
+        """Keyset pagination on medicine_id, or a streamed NDJSON export with format=ndjson"""
+        try:
+            # same validators as app.py's get_all_batches
+            version = data_version()
+            etag = page_etag(version, request.query_string)
+            max_age = app.config.get('BATCHES_CACHE_MAX_AGE', 60)
+            if etag in request.if_none_match:
+                return not_modified_response(Response, etag, version, max_age)
+
+            try:
+                stmt = filter_batches(select(MedicineBatch.__table__), request.args)
+                after = request.args.get('cursor', type=int)
+                limit = max(1, min(request.args.get('limit', 100, type=int), app.config.get('BATCHES_PAGE_MAX', 1000)))
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Dates must be in YYYY-MM-DD format'
+                }), 400
+
+            if after is not None:
+                stmt = stmt.where(BATCH_COLUMNS.medicine_id > after)
+            stmt = stmt.order_by(BATCH_COLUMNS.medicine_id)
+
+            if request.args.get('format') == 'ndjson':
+                async def generate():
+                    async with engine.connect() as conn:
+                        rows = await conn.stream(stmt.execution_options(yield_per=app.config.get('BATCHES_EXPORT_CHUNK', 1000)))
+                        async for row in rows:
+                            yield json.dumps(MedicineBatch.to_dict(row)) + '\n'
+
+                return cache_headers(Response(generate(), mimetype='application/x-ndjson'), etag, version, max_age)
+
+            async with engine.connect() as conn:
+                rows = (await conn.execute(stmt.limit(limit))).all()
+            next_cursor = rows[-1].medicine_id if len(rows) == limit else None
+            return cache_headers(jsonify({
+                'success': True,
+                'count': len(rows),
+                'batches': [MedicineBatch.to_dict(row) for row in rows],
+                'next_cursor': next_cursor
+            }), etag, version, max_age)
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': 'Error fetching batches',
+                'error': str(e)
+            }), 500
+
+app = create_async_app()
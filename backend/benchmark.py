@@ -0,0 +1,336 @@
+import io
+import os
+import sys
+import csv
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import resource
+import subprocess
+import contextlib
+import multiprocessing
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+# reproducible benchmarks for the backend hot paths against a local database stand-in
+#   python benchmark.py --rows 10000 --rows 100000 --json bench.json
+#   python benchmark.py --db mysql+pymysql://user:pw@127.0.0.1/pharmaledger_bench --rows 1000000
+# the endpoints are driven in-process through the flask test client, so the numbers are the
+# app's own cost without network noise (loadtest.py measures a running server over http).
+# every scenario runs in its own fresh process, so the peak RSS it reports is its own.
+
+UNITS_PER_BATCH = 10  # medicine_batches rows per synthetic batch number
+PHARMACIES = 500
+MEDICINES = ('DOLO paracetamol 500 mg', 'Azithral 500', 'Pan 40', 'Augmentin 625 Duo', 'Crocin Advance',
+             'Allegra 120', 'Montair LC', 'Shelcal 500', 'Thyronorm 50 mcg', 'Telma 40')
+CHANGED_EVERY = 100  # the incremental scenario changes one row in CHANGED_EVERY and appends as many
+SCENARIOS = ('load_full', 'load_incremental', 'verify_batch', 'get_all_batches', 'check_field',
+             'register_manufacturer', 'register_pharmacy')
+
+def batch_numbers(rows):
+    """Batch numbers of a synthetic dataset, known without reading it back"""
+    return [f'BN{batch:08d}' for batch in range(max(rows // UNITS_PER_BATCH, 1))]
+
+def synthetic_rows(rows, seed):
+    """Deterministic medicine_batches rows, UNITS_PER_BATCH consecutive units per batch"""
+    rng = random.Random(seed)
+    batch = None
+    for medicine_id in range(1, rows + 1):
+        if (medicine_id - 1) % UNITS_PER_BATCH == 0:
+            manufactured = date(2024, 1, 1) + timedelta(days=rng.randrange(1000))
+            batch = {
+                'batch_number': f'BN{(medicine_id - 1) // UNITS_PER_BATCH:08d}',
+                'medicine_name': rng.choice(MEDICINES),
+                'manufacture_date': manufactured.isoformat(),
+                'expiry_date': (manufactured + timedelta(days=rng.randrange(180, 1100))).isoformat()
+            }
+        yield dict(batch, medicine_id=medicine_id, pharmacy_name=f'Pharmacy {rng.randrange(PHARMACIES):03d}')
+
+def write_csv(path, rows):
+    fields = ['medicine_id', 'batch_number', 'medicine_name', 'manufacture_date', 'expiry_date', 'pharmacy_name']
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+def changed_rows(rows, seed):
+    """The base dataset with every CHANGED_EVERY-th row re-dated and as many new rows appended"""
+    for row in synthetic_rows(rows, seed):
+        if row['medicine_id'] % CHANGED_EVERY == 0:
+            row['expiry_date'] = (date.fromisoformat(row['expiry_date']) + timedelta(days=30)).isoformat()
+        yield row
+    for row in synthetic_rows(rows // CHANGED_EVERY, seed + 1):
+        yield dict(row, medicine_id=rows + row['medicine_id'], batch_number='NEW' + row['batch_number'][2:])
+
+def dataset(work_dir, rows, seed):
+    """(base csv, changed csv) for `rows`, generated once and reused by later runs"""
+    base = os.path.join(work_dir, f'synthetic_{rows}_{seed}.csv')
+    changed = os.path.join(work_dir, f'synthetic_{rows}_{seed}_changed.csv')
+    if not os.path.exists(base):
+        print(f"Generating {rows} rows -> {base}")
+        write_csv(base, synthetic_rows(rows, seed))
+    if not os.path.exists(changed):
+        write_csv(changed, changed_rows(rows, seed))
+    return base, changed
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def peak_rss_mb():
+    """Peak resident set size of this process, ru_maxrss is in KiB on Linux and bytes on macOS"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def configure(db_url, work_dir):
+    """Point the app config at the stand-in database and keep every side file in `work_dir`"""
+    import config
+    config.Config.SQLALCHEMY_DATABASE_URI = db_url
+    config.Config.DATA_VERSION_FILE = os.path.join(work_dir, 'data_version.txt')
+    config.Config.BATCH_FILTER_FILE = os.path.join(work_dir, 'batch_filter.bin')
+    config.Config.UPLOAD_FOLDER = os.path.join(work_dir, 'uploads')
+    config.Config.UPLOAD_STAGING_FOLDER = os.path.join(work_dir, 'uploads', 'pending')
+    config.Config.UPLOAD_STORE_FOLDER = os.path.join(work_dir, 'uploads', 'documents')
+    config.Config.SNAPSHOT_DIR = os.path.join(work_dir, 'snapshots')
+    config.Config.RATE_LIMIT_ENABLED = False  # every benchmark request comes from the same address
+    return config.Config
+
+def prepare_database(db_url, work_dir):
+    """Drop and recreate the schema so every dataset size starts from an empty database"""
+    configure(db_url, work_dir)
+    from app import app
+    from models import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return {}
+
+def bench_load(db_url, work_dir, csv_file, mode, chunk_size, workers):
+    """Time one loader run, the after-load upkeep (ledger, filter, expiry summary) included"""
+    config = configure(db_url, work_dir)
+    import load_batches
+    load_batches.ENGINE_URL = db_url
+    load_batches.FILTER_FILE = config.BATCH_FILTER_FILE
+    load_batches.VERSION_FILE = config.DATA_VERSION_FILE
+    load_batches.SNAPSHOT_DIR = config.SNAPSHOT_DIR  # never overwrite the snapshots the app serves
+    if not (load_batches.SNAPSHOT_SIGNING_KEY or load_batches.SNAPSHOT_HMAC_KEY):
+        load_batches.SNAPSHOT_HMAC_KEY = 'benchmark'  # time the signing too, the files stay in work_dir
+    for suffix in (load_batches.MANIFEST_SUFFIX, load_batches.REJECTS_SUFFIX):
+        if os.path.exists(csv_file + suffix):
+            os.remove(csv_file + suffix)  # a benchmark run always loads the whole file
+
+    with open(csv_file, 'rb') as file:
+        rows = sum(1 for _ in file) - 1
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as output:  # the loader's progress lines
+        if mode == 'full':
+            ok = load_batches.load_batches_to_db(csv_file, chunk_size, workers)
+        else:
+            ok = load_batches.load_batches_incremental(csv_file, chunk_size)
+    elapsed = time.perf_counter() - started
+    if not ok:
+        raise RuntimeError(f"{mode} load failed:\n{output.getvalue()}")
+    return {
+        'requests': rows,
+        'errors': 0,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_sec': round(rows / elapsed, 1) if elapsed else 0.0
+    }
+
+def build_requests(scenario, rows, count, miss_ratio, seed):
+    """(method, path, form data) tuples for one endpoint scenario"""
+    rng = random.Random(seed)
+    known = batch_numbers(rows)
+    requests = []
+    for i in range(count):
+        if scenario == 'verify_batch':
+            if rng.random() < miss_ratio:
+                batch_number = f'FAKE{rng.randrange(10 ** 8):08d}'
+            else:
+                batch_number = rng.choice(known)
+            requests.append(('GET', f'/api/verify-batch?batch_number={batch_number}', None))
+        elif scenario == 'get_all_batches':
+            # keyset pages start from any medicine_id, no need to walk from the first one
+            requests.append(('GET', f'/api/batches?limit=100&cursor={rng.randrange(rows)}', None))
+        elif scenario == 'check_field':
+            field = rng.choice(('email', 'phone', 'license'))
+            value = {'email': f'user{rng.randrange(count)}@bench.local',
+                     'phone': f'9{rng.randrange(count):09d}',
+                     'license': f'LIC-{rng.randrange(count):06d}'}[field]
+            entity = rng.choice(('manufacturer', 'pharmacy'))
+            requests.append(('GET', f'/api/check-field?field={field}&value={value}&type={entity}', None))
+        elif scenario == 'register_manufacturer':
+            requests.append(('POST', '/api/register-manufacturer', {
+                'company-name': f'Bench Pharma {i}', 'license-number': f'MFG-LIC-{seed}-{i}',
+                'contact-name': 'Bench', 'contact-phone': f'8{seed % 10}{i:08d}',
+                'contact-email': f'mfg{seed}-{i}@bench.local', 'password': 'bench-password-1'
+            }))
+        elif scenario == 'register_pharmacy':
+            requests.append(('POST', '/api/register-pharmacy', {
+                'pharmacy-name': f'Bench Pharmacy {i}', 'pharmacy-type': 'retail',
+                'license-number': f'PHR-LIC-{seed}-{i}', 'pharmacy-address': 'Bench Road',
+                'owner-name': 'Bench', 'contact-name': 'Bench', 'contact-phone': f'7{seed % 10}{i:08d}',
+                'contact-email': f'phr{seed}-{i}@bench.local', 'password': 'bench-password-1'
+            }))
+    return requests
+
+def bench_endpoint(db_url, work_dir, scenario, rows, count, concurrency, miss_ratio, seed):
+    """Replay the scenario's requests through the test client with `concurrency` threads"""
+    configure(db_url, work_dir)
+    from app import app
+
+    requests = build_requests(scenario, rows, count, miss_ratio, seed)
+    queue = iter(requests)
+    latencies = []
+    statuses = {}
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        client = app.test_client()
+        for method, path, data in queue:
+            started = time.perf_counter()
+            try:
+                response = client.open(path, method=method, data=data)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(requests),
+        'errors': errors,
+        'statuses': {str(status): hits for status, hits in sorted(statuses.items())},
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2)
+    }
+
+def _child(queue, func, args):
+    try:
+        result = func(*args)
+        result['peak_rss_mb'] = peak_rss_mb()
+        queue.put(result)
+    except BaseException as e:
+        queue.put({'error': f'{type(e).__name__}: {e}'})
+    finally:
+        if 'passwords' in sys.modules:
+            sys.modules['passwords'].password_hasher.shutdown()  # its workers would block the exit
+
+def isolated(func, *args):
+    """Run func(*args) in a fresh process, returns its result dict with the process' peak RSS"""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(queue, func, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(args):
+    os.makedirs(args.work_dir, exist_ok=True)
+    db_url = args.db or f"sqlite:///{os.path.join(args.work_dir, 'bench.db')}"
+    scenarios = args.scenario or list(SCENARIOS)
+    results = []
+    for rows in args.rows:
+        base_csv, changed_csv = dataset(args.work_dir, rows, args.seed)
+        isolated(prepare_database, db_url, args.work_dir)
+        # the incremental and endpoint scenarios need the base data in place
+        loads = [('load_full', 'full', base_csv)]
+        if 'load_incremental' in scenarios:
+            loads.append(('load_incremental', 'incremental', changed_csv))
+        for scenario, mode, csv_file in loads:
+            print(f"[{rows} rows] {scenario}...")
+            result = isolated(bench_load, db_url, args.work_dir, csv_file, mode, args.chunk_size, args.workers)
+            if scenario in scenarios:
+                results.append(dict(scenario=scenario, rows=rows, **result))
+
+        for scenario in scenarios:
+            if scenario.startswith('load_'):
+                continue
+            count = args.register_requests if scenario.startswith('register_') else args.requests
+            print(f"[{rows} rows] {scenario}...")
+            result = isolated(bench_endpoint, db_url, args.work_dir, scenario, rows, count,
+                              args.concurrency, args.miss_ratio, args.seed + rows)
+            results.append(dict(scenario=scenario, rows=rows, **result))
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': db_url.split(':', 1)[0],
+            'seed': args.seed,
+            'concurrency': args.concurrency,
+            'chunk_size': args.chunk_size,
+            'workers': args.workers
+        },
+        'results': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the loader and API hot paths on synthetic data')
+    parser.add_argument('--rows', type=int, action='append',
+                        help='medicine_batches rows to generate, repeat for several sizes (default 10000)')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='run only these scenarios, repeat to pick several (default all)')
+    parser.add_argument('--db', help='SQLAlchemy url of the database to use, default a sqlite file in --work-dir')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'pharmaledger-bench'),
+                        help='where datasets, the sqlite file and side files are kept')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per read endpoint')
+    parser.add_argument('--register-requests', type=int, default=50,
+                        help='requests per registration endpoint, each one hashes a password')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per endpoint')
+    parser.add_argument('--miss-ratio', type=float, default=0.3, help='share of unknown batch numbers')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='loader rows per insert')
+    parser.add_argument('--workers', type=int, default=1, help='loader writer threads for a full load')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_file', help='write the results to this file')
+    args = parser.parse_args()
+    args.rows = args.rows or [10000]
+
+    report = run(args)
+
+    print("-" * 96)
+    print(f"{'scenario':<24}{'rows':>10}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'rss MB':>10}{'errors':>10}")
+    for result in report['results']:
+        print(f"{result['scenario']:<24}{result['rows']:>10}{result['throughput_per_sec']:>12}"
+              f"{result.get('p50_ms', '-'):>10}{result.get('p95_ms', '-'):>10}{result.get('p99_ms', '-'):>10}"
+              f"{result['peak_rss_mb']:>10}{result['errors']:>10}")
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.json_file}")
+
+if __name__ == '__main__':
+    main()
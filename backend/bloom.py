@@ -0,0 +1,130 @@
+import os
+import math
+import mmap
+import struct
+import hashlib
+import threading
+from sqlalchemy import text
+from data_version import VersionWatcher
+
+# filter file shared by the loader and the flask workers, wrt the backend folder
+DEFAULT_FILTER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch_filter.bin')
+
+MAGIC = b'PLBF'
+HEADER = struct.Struct('<4sQQQ')  # magic, bit count, hash count, item count
+
+
+def _positions(key, bit_count, hash_count):
+    """Double hashing over one blake2b digest, k bit positions per key"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    h1, h2 = struct.unpack('<QQ', digest)
+    h2 |= 1
+    return [(h1 + i * h2) % bit_count for i in range(hash_count)]
+
+
+def build_filter(conn, path=DEFAULT_FILTER_FILE, fp_rate=0.01):
+    """
+    Write a Bloom filter over every batch number in medicine_batches to `path`.
+    The file is swapped in atomically, workers that still map the old one keep it
+    until they notice the data version bump. Returns the number of batch numbers.
+    """
+    item_count = conn.execute(text("SELECT COUNT(DISTINCT batch_number) FROM medicine_batches")).scalar() or 0
+    bit_count = max(64, int(-max(item_count, 1) * math.log(fp_rate) / (math.log(2) ** 2)))
+    hash_count = max(1, round(bit_count / max(item_count, 1) * math.log(2)))
+    bits = bytearray((bit_count + 7) // 8)
+
+    rows = conn.execution_options(stream_results=True).execute(
+        text("SELECT DISTINCT batch_number FROM medicine_batches"))
+    for (batch_number,) in rows:
+        for bit in _positions(batch_number, bit_count, hash_count):
+            bits[bit >> 3] |= 1 << (bit & 7)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, bit_count, hash_count, item_count))
+        file.write(bits)
+    os.replace(tmp_path, path)
+    return item_count
+
+
+class BatchFilter:
+    """Memory-mapped view of the loader's Bloom filter, shared by every worker through the page cache.
+
+    might_contain() False is a definite miss, True means ask the database. Without a
+    filter file every lookup falls through to the database.
+    """
+
+    def __init__(self, path=DEFAULT_FILTER_FILE, watcher=None):
+        self.path = path
+        self.watcher = watcher
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = False
+        self._state = None  # (mmap, bit count, hash count), swapped as one reference
+        self.item_count = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        """Read the filter settings from the flask config"""
+        self.enabled = app.config.get('BATCH_FILTER_ENABLED', True)
+        self.path = app.config.get('BATCH_FILTER_FILE', self.path)
+        self.watcher = VersionWatcher(
+            app.config.get('DATA_VERSION_FILE'),
+            app.config.get('DATA_VERSION_POLL_INTERVAL', 1.0)
+        )
+        app.extensions['batch_filter'] = self
+
+    def _open(self):
+        # the old map is only dropped, not closed, another thread may still be reading it
+        self._state = None
+        try:
+            with open(self.path, 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+        magic, bit_count, hash_count, item_count = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            mapped.close()
+            return
+        self.item_count = item_count
+        self._state = (mapped, bit_count, hash_count)
+
+    def _refresh(self):
+        version = self.watcher.current() if self.watcher else None
+        if self._checked and version == self._version:
+            return
+        with self._lock:
+            if not self._checked or version != self._version:
+                self._open()
+                self._version = version
+                self._checked = True
+
+    def might_contain(self, batch_number):
+        """False only when the batch number is definitely not in the database"""
+        if not self.enabled:
+            return True
+        self._refresh()
+        state = self._state
+        if state is None:
+            return True
+        mapped, bit_count, hash_count = state
+        for bit in _positions(batch_number, bit_count, hash_count):
+            if not mapped[HEADER.size + (bit >> 3)] & (1 << (bit & 7)):
+                self.rejected += 1
+                return False
+        return True
+
+    def stats(self):
+        """Counters for the stats endpoint"""
+        state = self._state
+        return {
+            'loaded': state is not None,
+            'batch_numbers': self.item_count if state else 0,
+            'bits': state[1] if state else 0,
+            'hashes': state[2] if state else 0,
+            'rejected': self.rejected
+        }
+
+
+batch_filter = BatchFilter()
@@ -0,0 +1,111 @@
+import time
+import threading
+from collections import OrderedDict
+from data_version import VersionWatcher
+
+_MISSING = object()
+
+
+class BatchCache:
+    """Bounded LRU cache with TTL for batch lookups, keyed by normalized batch number.
+
+    Known-missing batch numbers are cached too (value None) with their own, shorter TTL.
+    The whole cache is dropped whenever the loader bumps the data version.
+    """
+
+    def __init__(self, max_size=10000, ttl=300, negative_ttl=30, watcher=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.watcher = watcher
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app, prefix='BATCH_CACHE', watch_version=True):
+        """Read cache sizing from the `prefix`_* flask config keys and hook the data version watcher"""
+        self.max_size = app.config.get(f'{prefix}_SIZE', self.max_size)
+        self.ttl = app.config.get(f'{prefix}_TTL', self.ttl)
+        self.negative_ttl = app.config.get(f'{prefix}_NEGATIVE_TTL', self.negative_ttl)
+        if watch_version:
+            self.watcher = VersionWatcher(
+                app.config.get('DATA_VERSION_FILE'),
+                app.config.get('DATA_VERSION_POLL_INTERVAL', 1.0)
+            )
+        app.extensions[prefix.lower()] = self
+
+    def _check_version(self):
+        if self.watcher is None:
+            return
+        version = self.watcher.current()
+        if version != self._version:
+            if self._version is not None:
+                self._entries.clear()
+                self.generation += 1
+                self.invalidations += 1
+            self._version = version
+
+    def get(self, key):
+        """Return (hit, value), value is None for a cached miss"""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return False, None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key, value, generation=None):
+        """Store a lookup result, dropped if the cache was invalidated since `generation`"""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry and start a new generation"""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        """Counters for the stats endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'data_version': self._version
+            }
+
+
+batch_cache = BatchCache()
+field_check_cache = BatchCache(max_size=10000, ttl=10, negative_ttl=10)  # /api/check-field, free values only
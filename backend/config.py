@@ -1,4 +1,7 @@
 import os
+from data_version import DEFAULT_VERSION_FILE
+from bloom import DEFAULT_FILTER_FILE
+from snapshot import DEFAULT_SNAPSHOT_DIR
 
 class Config:
     """Configuration class for Flask application"""
@@ -9,6 +12,132 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  
     
+    # connection pool, the checkout wait times are recorded for /api/metrics/pool
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 5  # seconds to wait for a free connection before answering 503
+    DB_POOL_RECYCLE = 1800  # seconds, below MySQL's wait_timeout
+    DB_POOL_PRE_PING = True
+    # SQLALCHEMY_ENGINE_OPTIONS is built from these in create_app (db_pool.engine_options)
+    
+    # read replicas (db_routing.py): the read-only routes below go to a healthy replica, the rest to the primary
+    DB_REPLICAS = [url for url in os.environ.get('DB_REPLICAS', '').split(',') if url]  # comma separated urls
+    DB_READ_ROUTES = (
+        '/api/verify-batch',
+        '/api/verify-batches',
+        '/api/batches',
+        '/api/check-field',
+        '/api/suggest-batch',
+        '/api/reports/expiring'
+    )
+    DB_REPLICA_CHECK_INTERVAL = 5.0  # seconds between health probes of every replica
+    DB_REPLICA_LAG_SQL = None  # query returning replication lag in seconds, None skips the lag check
+    DB_REPLICA_MAX_LAG = 5.0  # a replica further behind gets no reads
+    DB_READ_YOUR_WRITES_SECONDS = 10  # a value this process just wrote is read from the primary this long
+    
+    # /api/health answers from the last probe for this many seconds, ?fresh=1 forces a probe
+    HEALTH_CACHE_SECONDS = 5
+    
     # folder path to save pharmacy and manufacturer's uploaded files
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024  
+    UPLOAD_STAGING_FOLDER = os.path.join(UPLOAD_FOLDER, 'pending')  # multipart parts are spooled here
+    UPLOAD_STORE_FOLDER = os.path.join(UPLOAD_FOLDER, 'documents')  # content-addressed, one copy per sha256
+    UPLOAD_WORKERS = 2  # background threads hashing and storing documents
+    
+    # verify-batch read-through cache, dropped whenever the loader bumps the data version
+    BATCH_CACHE_SIZE = 10000
+    BATCH_CACHE_TTL = 300  # seconds, for batches that exist
+    BATCH_CACHE_NEGATIVE_TTL = 30  # seconds, for batch numbers not found
+    DATA_VERSION_FILE = DEFAULT_VERSION_FILE
+    DATA_VERSION_POLL_INTERVAL = 1.0
+    
+    # bulk verification for pharmacy shelf audits
+    BULK_VERIFY_MAX = 5000  # batch numbers per request
+    BULK_VERIFY_CHUNK_SIZE = 500  # batch numbers per IN (...) query
+    
+    # /api/batches paging and export
+    BATCHES_PAGE_MAX = 1000  # rows per page
+    BATCHES_EXPORT_CHUNK = 1000  # rows fetched per round-trip while streaming ndjson
+    BATCHES_CACHE_MAX_AGE = 60  # Cache-Control max-age of pages / exports, ETag revalidation after that
+    SNAPSHOT_ENABLED = True  # serve the loader's catalogue snapshots (snapshot.py) to offline clients
+    SNAPSHOT_DIR = DEFAULT_SNAPSHOT_DIR
+    SNAPSHOT_CACHE_MAX_AGE = 60  # snapshot / delta downloads, ETag is the file's sha256
+    EXPIRY_REPORT_DEFAULT_DAYS = 30  # /api/reports/expiring window without ?days=
+    EXPIRY_REPORT_MAX_DAYS = 365
+    
+    # verify from the normalized batches table instead of medicine_batches (run migrate_catalogue.py first)
+    BATCH_CATALOGUE_ENABLED = False
+    
+    # HTTP caching of verify-batch (ETag / Last-Modified from the data version, 304 on a match)
+    VERIFY_CACHE_MAX_AGE = 300  # seconds, upper bound so edge caches pick up a reload within it
+    VERIFY_MISS_MAX_AGE = 30  # unknown batch numbers
+    
+    # Bloom filter over all batch numbers, written by the loader and memory-mapped by every worker
+    BATCH_FILTER_ENABLED = True
+    BATCH_FILTER_FILE = DEFAULT_FILTER_FILE
+    
+    # near-match suggestions for unknown batch numbers (suggest.py), in-memory trigram index
+    SUGGEST_ENABLED = True
+    SUGGEST_MAX_DISTANCE = 2  # edits, a look-alike substitution (O/0, I/1, S/5...) counts 0.25
+    SUGGEST_MAX_RESULTS = 10
+    SUGGEST_PROBE_GRAMS = 4  # rarest query trigrams scanned for fuzzy candidates, more = better recall, slower
+    SUGGEST_CANDIDATES = 12  # best-overlapping candidates scored with the edit distance
+    SUGGEST_ON_MISS = 3  # suggestions added to a verify-batch 404, 0 turns them off
+    
+    # async serving mode (async_app.py), same database through the aiomysql driver
+    ASYNC_DATABASE_URI = '--'
+    ASYNC_POOL_SIZE = 20
+    ASYNC_MAX_OVERFLOW = 10
+    ASYNC_POOL_RECYCLE = 1800  # seconds
+    
+    # password hashing policy (werkzeug method string: algorithm plus work factors),
+    # hashes made under an older policy are upgraded on the next successful check_password
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = 2  # hashing processes, 0 hashes inline in the request thread
+    PASSWORD_HASH_TIMEOUT = 10.0  # seconds to wait on the pool before hashing inline instead
+    
+    # /api/check-field answers for values that are still free, dropped when a registration takes them
+    CHECK_FIELD_CACHE_SIZE = 10000
+    CHECK_FIELD_CACHE_TTL = 10  # seconds
+    CHECK_FIELD_CACHE_NEGATIVE_TTL = 10
+    
+    # instrumentation (instrumentation.py): JSON logs, per-route timings on /metrics, sampled query / payload stats
+    LOG_LEVEL = 'INFO'  # DEBUG also logs which form fields a registration carried, never their values
+    INSTRUMENTATION_SAMPLE_RATE = 0.1  # share of requests whose queries and payload sizes are recorded
+    PROFILING_ENABLED = False  # lets ?profile=1 run a request under cProfile, keep off in production
+    PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+    
+    # token-bucket rate limiting (ratelimit.py), route rule -> (requests per second, burst) per client IP
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMITS = {
+        '/api/verify-batch': (20, 60),
+        '/api/catalogue/snapshot': (0.05, 3),
+        '/api/catalogue/delta': (0.5, 5),
+        '/api/verify-batches': (1, 5),
+        '/api/check-field': (5, 20),
+        '/api/suggest-batch': (10, 30),
+        '/api/review/<kind>/status': (2, 10),
+        '/api/register-manufacturer': (0.05, 5),
+        '/api/register-pharmacy': (0.05, 5)
+    }
+    RATE_LIMIT_PER_IP = (50, 150)  # one more bucket per client over every /api/ route, None to skip
+    RATE_LIMIT_TRUSTED_PROXIES = 0  # proxies in front of the app appending to X-Forwarded-For
+    RATE_LIMIT_STORAGE_URL = None  # e.g. 'redis://127.0.0.1:6379/0' to share buckets across workers
+    RATE_LIMIT_MAX_KEYS = 100000  # in-process buckets kept before idle ones are dropped
+    
+    # scan log (scan_events.py): buffered verify-batch scan events and cloned-batch flags
+    SCAN_LOG_ENABLED = True  # also makes verify-batch responses private, shared caches would hide scans
+    SCAN_BUFFER_SIZE = 50000  # events held in memory, the oldest are overwritten if writes fall behind
+    SCAN_FLUSH_BATCH = 1000  # events per INSERT
+    SCAN_FLUSH_INTERVAL = 2.0  # seconds between flushes when the batch doesn't fill up sooner
+    SCAN_WINDOW_SECONDS = 3600  # sliding window the anomaly counts cover
+    SCAN_WINDOW_SLOTS = 12  # window granularity, it slides one slot (5 minutes) at a time
+    SCAN_ANOMALY_MAX_SCANS = 500  # scans of one batch number per window before it is flagged
+    SCAN_ANOMALY_MAX_SOURCES = 100  # distinct client networks per window before it is flagged
+    SCAN_TRACKED_BATCHES = 100000  # batch numbers with a live window, least recently scanned dropped first
+    
+    # registration review queue (review_queue.py), /api/review/* needs "Authorization: Bearer <token>"
+    REVIEW_API_TOKEN = os.environ.get('REVIEW_API_TOKEN')  # unset keeps the review API closed
+    REVIEW_PAGE_MAX = 500  # registrations per page
+    REVIEW_BULK_MAX = 1000  # ids per bulk status change
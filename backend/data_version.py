@@ -0,0 +1,64 @@
+import os
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+
+# marker file shared by the loader and the flask workers, wrt the backend folder
+DEFAULT_VERSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_version.txt')
+
+
+def bump_version(path=DEFAULT_VERSION_FILE):
+    """Write a fresh data version token, called by the loader after every reload"""
+    token = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(token)
+    os.replace(tmp_path, path)  # atomic swap so readers never see a half written token
+    return token
+
+
+def read_version(path=DEFAULT_VERSION_FILE):
+    """Return the current data version token, '0' if the loader has never run"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read().strip() or '0'
+    except FileNotFoundError:
+        return '0'
+
+
+def version_time(token):
+    """UTC datetime a version token was bumped at, None for the never-loaded '0'"""
+    stamp = token.split('-', 1)[0]
+    if not stamp.isdigit() or stamp == '0':
+        return None
+    return datetime.fromtimestamp(int(stamp), timezone.utc)
+
+
+class VersionWatcher:
+    """Cheap view of the data version, the marker file is stat'ed at most once per interval"""
+
+    def __init__(self, path=DEFAULT_VERSION_FILE, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._mtime = None
+        self._token = '0'
+
+    def current(self):
+        """Return the latest known version token"""
+        now = time.monotonic()
+        if now - self._checked_at < self.interval:
+            return self._token
+        with self._lock:
+            if now - self._checked_at >= self.interval:
+                try:
+                    mtime = os.stat(self.path).st_mtime
+                except FileNotFoundError:
+                    mtime = None
+                if mtime != self._mtime:
+                    self._mtime = mtime
+                    self._token = read_version(self.path)
+                self._checked_at = now
+        return self._token
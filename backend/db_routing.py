@@ -0,0 +1,214 @@
+import time
+import random
+import threading
+from collections import OrderedDict
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+REPLICA_BIND_PREFIX = 'replica_'
+RECENT_WRITES_MAX = 10000  # written keys remembered for read-your-writes, the oldest are dropped first
+
+
+class _Replica:
+    __slots__ = ('key', 'healthy', 'checked_at', 'failures', 'lag', 'error', 'reads')
+
+    def __init__(self, key):
+        self.key = key
+        self.healthy = True
+        self.checked_at = 0.0
+        self.failures = 0
+        self.lag = None
+        self.error = None
+        self.reads = 0
+
+
+class ReplicaRouter:
+    """Sends the read-only routes to a replica bind and everything else to the primary.
+
+    DB_REPLICAS are registered as SQLALCHEMY_BINDS (replica_0, replica_1, ...), so
+    init_app() has to run before db.init_app(). A request on one of DB_READ_ROUTES is
+    pinned to one healthy replica picked at random, any other request and any flush use
+    the primary. A handler that wrote a value remembers its key (remember_write), and a
+    read of that key within DB_READ_YOUR_WRITES_SECONDS switches its request to the
+    primary (use_primary); the browser frontend calls cross-origin without cookies, so
+    the window follows the written value, not the client. A background thread
+    probes every replica each DB_REPLICA_CHECK_INTERVAL seconds (SELECT 1, plus
+    DB_REPLICA_LAG_SQL when set) and a replica that errors or lags past DB_REPLICA_MAX_LAG
+    gets no reads until a probe passes again. With no healthy replica reads fall back
+    to the primary.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.app = None
+        self.read_routes = frozenset()
+        self.check_interval = 5.0
+        self.lag_sql = None
+        self.max_lag = 5.0
+        self.read_your_writes = 10
+        self._recent_writes = OrderedDict()
+        self.replicas = []
+        self._engines = None
+        self._lock = threading.Lock()
+        self._checker = None
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    def init_app(self, app):
+        """Register the replica binds and the routing hooks, call before db.init_app()"""
+        self.app = app
+        urls = list(app.config.get('DB_REPLICAS') or ())
+        self.enabled = bool(urls)
+        self.read_routes = frozenset(app.config.get('DB_READ_ROUTES', ()))
+        self.check_interval = app.config.get('DB_REPLICA_CHECK_INTERVAL', self.check_interval)
+        self.lag_sql = app.config.get('DB_REPLICA_LAG_SQL')
+        self.max_lag = app.config.get('DB_REPLICA_MAX_LAG', self.max_lag)
+        self.read_your_writes = app.config.get('DB_READ_YOUR_WRITES_SECONDS', self.read_your_writes)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        self.replicas = []
+        for number, url in enumerate(urls):
+            key = f'{REPLICA_BIND_PREFIX}{number}'
+            binds[key] = url
+            self.replicas.append(_Replica(key))
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.before_request(self._route)
+        app.extensions['db_router'] = self
+
+    def _engine(self, key):
+        if self._engines is None:
+            with self._lock:
+                if self._engines is None:
+                    with self.app.app_context():
+                        engines = self.app.extensions['sqlalchemy'].engines
+                    for replica in self.replicas:
+                        event.listen(engines[replica.key], 'handle_error', self._on_error(replica))
+                    self._engines = engines
+        return self._engines[key]
+
+    # request hooks
+
+    def _route(self):
+        g.db_replica = None
+        if not self.enabled or request.url_rule is None or request.url_rule.rule not in self.read_routes:
+            return None
+        self._start()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.fallbacks += 1
+            return None
+        replica = random.choice(healthy)
+        replica.reads += 1
+        g.db_replica = replica
+        return None
+
+    def remember_write(self, key):
+        """Record that this process just wrote `key` (any hashable naming the value)"""
+        if not self.enabled or not self.read_your_writes:
+            return
+        now = time.time()
+        with self._lock:
+            self._recent_writes.pop(key, None)
+            self._recent_writes[key] = now
+            while self._recent_writes and (len(self._recent_writes) > RECENT_WRITES_MAX or
+                                           next(iter(self._recent_writes.values())) < now - self.read_your_writes):
+                self._recent_writes.popitem(last=False)
+
+    def recently_written(self, key):
+        """True inside the read-your-writes window of `key`"""
+        written_at = self._recent_writes.get(key)
+        return written_at is not None and time.time() - written_at < self.read_your_writes
+
+    def use_primary(self):
+        """Read from the primary for the rest of this request, e.g. a value a lagging replica may not have yet"""
+        if has_request_context() and g.get('db_replica') is not None:
+            g.db_replica = None
+            self.primary_reads += 1
+
+    def read_engine(self):
+        """The replica engine this request was pinned to, None means the primary"""
+        if not self.enabled or not has_request_context():
+            return None
+        replica = g.get('db_replica')
+        if replica is None or not replica.healthy:
+            return None
+        return self._engine(replica.key)
+
+    # health checks
+
+    def _on_error(self, replica):
+        def handle_error(context):
+            if not (context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError)):
+                return  # a bad query, not a bad replica
+            replica.healthy = False  # no more reads until the next probe passes
+            replica.failures += 1
+            replica.error = str(context.original_exception)
+        return handle_error
+
+    def _start(self):
+        if self._checker is not None and self._checker.is_alive():
+            return
+        self._engine(self.replicas[0].key)  # hooks the error listeners before the first replica read
+        with self._lock:
+            if self._checker is not None and self._checker.is_alive():
+                return
+            self._checker = threading.Thread(target=self._run, name='replica-health', daemon=True)
+            self._checker.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+    def check(self):
+        """Probe every replica once and update its health, returns the healthy count"""
+        for replica in self.replicas:
+            try:
+                with self._engine(replica.key).connect() as conn:
+                    conn.execute(text('SELECT 1'))
+                    lag = conn.execute(text(self.lag_sql)).scalar() if self.lag_sql else None
+                replica.lag = float(lag) if lag is not None else None
+                if replica.lag is not None and replica.lag > self.max_lag:
+                    replica.healthy = False
+                    replica.error = f'lagging {replica.lag:.1f}s behind the primary'
+                else:
+                    replica.healthy = True
+                    replica.error = None
+            except Exception as e:
+                replica.healthy = False
+                replica.failures += 1
+                replica.error = str(e)
+            replica.checked_at = time.time()
+        return sum(replica.healthy for replica in self.replicas)
+
+    def stats(self):
+        """Replica health and read counters for the metrics endpoints"""
+        return {
+            'enabled': self.enabled,
+            'primary_reads': self.primary_reads,
+            'fallbacks': self.fallbacks,
+            'replicas': [{
+                'bind': replica.key,
+                'healthy': replica.healthy,
+                'reads': replica.reads,
+                'failures': replica.failures,
+                'lag': replica.lag,
+                'error': replica.error,
+                'checked_at': replica.checked_at
+            } for replica in self.replicas]
+        }
+
+
+db_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """db.session that lets db_router hand out the replica for reads, flushes stay on the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            engine = db_router.read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
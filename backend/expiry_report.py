@@ -0,0 +1,107 @@
+import sys
+from sqlalchemy import create_engine, text, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+# per (batch number, pharmacy) expiry summary behind /api/reports/expiring
+#   the loader refreshes it after every load: a full load rebuilds it, an incremental
+#   load only regroups the batch numbers it touched. expired / expiring is decided at
+#   query time with range predicates on the indexed expiry_date, so nothing goes stale
+#   at midnight.
+
+ENGINE_URL = '--' # same database as the loader, removed the url link for privacy
+REFRESH_CHUNK = 1000  # batch numbers regrouped per statement in an incremental refresh
+
+CREATE_SUMMARY_SQL = text("""
+    CREATE TABLE IF NOT EXISTS batch_expiry (
+        id INTEGER PRIMARY KEY AUTO_INCREMENT,
+        batch_number VARCHAR(100) NOT NULL,
+        pharmacy_name VARCHAR(255) NULL,
+        medicine_name VARCHAR(255) NOT NULL,
+        expiry_date DATE NOT NULL,
+        unit_count INTEGER NOT NULL DEFAULT 0,
+        INDEX ix_batch_expiry_batch_number (batch_number),
+        INDEX ix_batch_expiry_expiry (expiry_date, id),
+        INDEX ix_batch_expiry_pharmacy_expiry (pharmacy_name, expiry_date, id)
+    )
+""")
+
+# MySQL has no CREATE INDEX IF NOT EXISTS, an existing index is reported and skipped
+CREATE_INDEX_SQL = [
+    text("CREATE INDEX ix_medicine_batches_expiry_date ON medicine_batches (expiry_date)"),
+    text("CREATE INDEX ix_batches_expiry_date ON batches (expiry_date)")
+]
+
+# units are counted per pharmacy, the medicine name and expiry are the batch's first unit
+# row (lowest medicine_id), the same record verify-batch and the catalogue serve
+FILL_SQL = """
+    INSERT INTO batch_expiry (batch_number, pharmacy_name, medicine_name, expiry_date, unit_count)
+    SELECT g.batch_number, g.pharmacy_name, mb.medicine_name, mb.expiry_date, g.unit_count
+    FROM (
+        SELECT batch_number, pharmacy_name, COUNT(*) AS unit_count
+        FROM medicine_batches {where} GROUP BY batch_number, pharmacy_name
+    ) g
+    JOIN (
+        SELECT batch_number, MIN(medicine_id) AS first_id
+        FROM medicine_batches {where} GROUP BY batch_number
+    ) f ON f.batch_number = g.batch_number
+    JOIN medicine_batches mb ON mb.medicine_id = f.first_id
+"""
+
+FULL_FILL_SQL = text(FILL_SQL.format(where=''))
+
+PARTIAL_FILL_SQL = text(FILL_SQL.format(where='WHERE batch_number IN :batch_numbers')).bindparams(
+    bindparam('batch_numbers', expanding=True))
+
+PARTIAL_DELETE_SQL = text("DELETE FROM batch_expiry WHERE batch_number IN :batch_numbers").bindparams(
+    bindparam('batch_numbers', expanding=True))
+
+
+def create_tables(conn):
+    """Create the summary table and the expiry_date indexes (MySQL DDL, same as models.py)"""
+    conn.execute(CREATE_SUMMARY_SQL)
+    for statement in CREATE_INDEX_SQL:
+        try:
+            with conn.begin_nested():
+                conn.execute(statement)
+        except SQLAlchemyError as e:
+            print(f"Skipped index: {e.orig if hasattr(e, 'orig') else e}")
+
+def refresh_expiry_summary(conn, batch_numbers=None):
+    """
+    Bring batch_expiry up to date inside the caller's transaction.
+    Without `batch_numbers` the table is rebuilt, otherwise only those batch numbers
+    (the ones the load wrote or moved rows away from) are regrouped. Returns the number
+    of batch numbers refreshed, None for a full rebuild.
+    """
+    if batch_numbers is None:
+        conn.execute(text("DELETE FROM batch_expiry"))
+        conn.execute(FULL_FILL_SQL)
+        return None
+
+    touched = sorted(batch_numbers)
+    for start in range(0, len(touched), REFRESH_CHUNK):
+        chunk = touched[start:start + REFRESH_CHUNK]
+        conn.execute(PARTIAL_DELETE_SQL, {'batch_numbers': chunk})
+        conn.execute(PARTIAL_FILL_SQL, {'batch_numbers': chunk})
+    return len(touched)
+
+def migrate(engine_url=ENGINE_URL):
+    """Create and fill the expiry summary for an existing database"""
+    print("PharmaLedger - Expiry Summary Migration")
+    print("=" * 60)
+
+    engine = create_engine(engine_url, echo=False)
+    try:
+        with engine.begin() as conn:
+            create_tables(conn)
+            refresh_expiry_summary(conn)
+            rows = conn.execute(text("SELECT COUNT(*) FROM batch_expiry")).scalar()
+        print(f"✓ Expiry summary built: {rows} rows.")
+    except SQLAlchemyError as e:
+        print(f"✗ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,129 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from flask import request
+from werkzeug.http import is_resource_modified
+from data_version import version_time
+from cache import batch_cache
+
+
+def data_version():
+    """Loader data version as last seen by the verify-batch cache's watcher"""
+    return batch_cache.watcher.current() if batch_cache.watcher else '0'
+
+
+def make_etag(*parts):
+    """Strong validator over the data version plus whatever else shapes the body"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:20]
+
+
+def expires_at(record):
+    """When a verify result flips from Authentic to Expired.
+
+    build_result() compares expiry_date < today (UTC), so a batch turns Expired at
+    midnight UTC at the end of its expiry date.
+    """
+    return datetime.combine(record['expiry_date'] + timedelta(days=1), datetime.min.time(), timezone.utc)
+
+
+def seconds_until_change(record, now=None):
+    """Seconds until a verify result flips from Authentic to Expired, None once it has expired"""
+    now = now or datetime.now(timezone.utc)
+    flips_at = expires_at(record)
+    if flips_at <= now:
+        return None
+    return int((flips_at - now).total_seconds())
+
+
+def not_modified(etag):
+    """True when the client's If-None-Match already holds `etag`, checked before any db work"""
+    return etag in request.if_none_match
+
+
+def cache_headers(response, etag, version, max_age, shared=True, last_modified=True):
+    """Set ETag / Last-Modified / Cache-Control on a flask or quart response.
+
+    With shared=False only the client may keep the response (private), e.g. when every
+    request has to reach the app to be counted. Last-Modified is the data version's time;
+    pass a datetime when the body also changed at another moment (the later one wins) or
+    False when it depends on state with no modification time, If-Modified-Since would
+    then answer 304 for a body that changed.
+    """
+    response.set_etag(etag)
+    if last_modified:
+        modified = version_time(version)
+        if isinstance(last_modified, datetime):
+            modified = max(modified, last_modified) if modified else last_modified
+        if modified:
+            response.last_modified = modified
+    if shared:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    response.cache_control.max_age = max(int(max_age), 0)
+    return response
+
+
+def cacheable(response, etag, version, max_age, shared=True, last_modified=True, conditional=True):
+    """cache_headers() and turn the response into a 304 when it still matches, conditional=False never does"""
+    cache_headers(response, etag, version, max_age, shared, last_modified)
+    return response.make_conditional(request) if conditional else response
+
+
+def page_etag(version, query_string):
+    """ETag of a /api/batches page or export, fully determined by the data version and the query string"""
+    return make_etag(version, query_string.decode('utf-8', 'replace'))
+
+
+def not_modified_response(response_class, etag, version, max_age, shared=True, last_modified=True):
+    """Bodiless 304 with the same validators and Cache-Control, for quart which has no make_conditional"""
+    return cache_headers(response_class(status=304), etag, version, max_age, shared, last_modified)
+
+
+def still_fresh(headers, response):
+    """True when the request's validators match the ones cache_headers() set, for quart which has no make_conditional"""
+    environ = {'REQUEST_METHOD': 'GET'}
+    for name in ('If-None-Match', 'If-Modified-Since'):
+        if name in headers:
+            environ['HTTP_' + name.upper().replace('-', '_')] = headers[name]
+    etag, _ = response.get_etag()
+    return not is_resource_modified(environ, etag=etag, last_modified=response.last_modified)
+
+
+def verify_cache_options(record, status, anomalies, version, proof, scan_logged, max_age):
+    """cacheable() keyword arguments for a found verify-batch result, the same for app.py and async_app.py"""
+    # the body only changes on a reload or when the batch expires, edge caches can keep
+    # it until then, capped so a reload is picked up within max_age
+    until_change = seconds_until_change(record)
+    if until_change is not None:
+        max_age = min(max_age, until_change)
+    if anomalies:
+        max_age = 0  # re-checked on every scan while the batch number is flagged
+    # the status also changes at the expiry flip; scanAnomaly comes and goes with no
+    # modification time at all, so with the scan log on only the ETag validates
+    if scan_logged:
+        last_modified = False
+    elif until_change is None:
+        last_modified = expires_at(record)  # Expired since then, unless a reload came later
+    else:
+        last_modified = True
+    return {
+        'etag': make_etag(version, record['batch_number'], status, proof, ','.join(anomalies)),
+        'version': version,
+        'max_age': max_age,
+        # scans answered by a shared cache would never reach the scan log
+        'shared': not scan_logged,
+        'last_modified': last_modified,
+        'conditional': not anomalies
+    }
+
+
+def cache_miss(response, scan_logged, max_age, warming=False):
+    """Cache-Control of a verify-batch 404, no validators: the batch number may appear with any reload"""
+    if warming:
+        max_age = 0  # the suggestions are missing, not empty
+    if scan_logged:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
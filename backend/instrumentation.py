@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+import cProfile
+from datetime import datetime, timezone
+from flask import request
+from flask.logging import default_handler
+from sqlalchemy import event
+
+# request timing buckets in seconds, Prometheus histogram style (cumulative, +Inf implied)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# attributes every LogRecord has, anything else was passed through extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus the fields passed with extra={...}"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _RouteStats:
+    __slots__ = ('buckets', 'count', 'duration', 'sampled', 'queries', 'query_time',
+                 'request_bytes', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.sampled = 0
+        self.queries = 0
+        self.query_time = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+class Instrumentation:
+    """Per-route timings, sampled DB query and payload stats, Prometheus text and an opt-in profiler.
+
+    Every request is counted and timed, that costs two perf_counter calls and a locked
+    update. Query counts / durations and payload sizes are only recorded for a
+    `sample_rate` share of requests, the SQLAlchemy listeners return at once otherwise.
+    With PROFILING_ENABLED a request sent with ?profile=1 runs under cProfile and its
+    stats are dumped to PROFILE_DIR, named in the X-Profile response header.
+    """
+
+    def __init__(self, sample_rate=0.1):
+        self.sample_rate = sample_rate
+        self.profile_dir = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._routes = {}
+        self._statuses = {}
+
+    def init_app(self, app):
+        """Configure logging, hook the request and SQLAlchemy events"""
+        self.sample_rate = app.config.get('INSTRUMENTATION_SAMPLE_RATE', self.sample_rate)
+        if app.config.get('PROFILING_ENABLED'):
+            self.profile_dir = app.config.get('PROFILE_DIR')
+            os.makedirs(self.profile_dir, exist_ok=True)
+        configure_logging(app)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            engines = app.extensions['sqlalchemy'].engines.values()  # primary and any replica binds
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_query)
+            event.listen(engine, 'after_cursor_execute', self._after_query)
+        app.extensions['instrumentation'] = self
+
+    # request hooks
+
+    def _before_request(self):
+        state = self._local
+        state.started = time.perf_counter()
+        state.sampled = random.random() < self.sample_rate
+        state.queries = 0
+        state.query_time = 0.0
+        state.profiler = None
+        if self.profile_dir and request.args.get('profile') == '1':
+            state.sampled = True
+            state.profiler = cProfile.Profile()
+            state.profiler.enable()
+
+    def _after_request(self, response):
+        state = self._local
+        started = getattr(state, 'started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        if state.profiler is not None:
+            state.profiler.disable()
+            name = f"{route.strip('/').replace('/', '_') or 'root'}-{int(time.time() * 1000)}.prof"
+            path = os.path.join(self.profile_dir, name)
+            state.profiler.dump_stats(path)
+            state.profiler = None
+            response.headers['X-Profile'] = name
+        response_bytes = response.calculate_content_length() if state.sampled else None
+        self._record(route, request.method, response.status_code, elapsed, state.sampled,
+                     state.queries, state.query_time, request.content_length, response_bytes)
+        state.started = None
+        return response
+
+    def _teardown_request(self, exc=None):
+        state = self._local
+        if getattr(state, 'profiler', None) is not None:
+            state.profiler.disable()  # the request failed before after_request ran
+            state.profiler = None
+        state.started = None
+        state.sampled = False
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'sampled', False):
+            self._local.query_started = time.perf_counter()
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        state = self._local
+        if getattr(state, 'sampled', False):
+            state.queries += 1
+            state.query_time += time.perf_counter() - state.query_started
+
+    def _record(self, route, method, status, elapsed, sampled, queries, query_time, request_bytes, response_bytes):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = _RouteStats()
+            stats.count += 1
+            stats.duration += elapsed
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[index] += 1
+                    break
+            if sampled:
+                stats.sampled += 1
+                stats.queries += queries
+                stats.query_time += query_time
+                stats.request_bytes += request_bytes or 0
+                stats.response_bytes += response_bytes or 0
+            key = (route, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    # exposition
+
+    def render(self, extra_gauges=(), extra_counters=()):
+        """Prometheus text exposition of the counters, `extra_gauges` / `extra_counters` are (name, help, value) triples"""
+        with self._lock:
+            routes = {key: (list(stats.buckets), stats.count, stats.duration, stats.sampled, stats.queries,
+                            stats.query_time, stats.request_bytes, stats.response_bytes)
+                      for key, stats in self._routes.items()}
+            statuses = dict(self._statuses)
+
+        lines = [
+            '# HELP pharmaledger_http_requests_total Requests handled, by route, method and status.',
+            '# TYPE pharmaledger_http_requests_total counter'
+        ]
+        for (route, method, status), count in sorted(statuses.items()):
+            lines.append(f'pharmaledger_http_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+        lines += [
+            '# HELP pharmaledger_http_request_duration_seconds Request handling time, by route and method.',
+            '# TYPE pharmaledger_http_request_duration_seconds histogram'
+        ]
+        for (route, method), (buckets, count, duration, *_) in sorted(routes.items()):
+            labels = f'route="{route}",method="{method}"'
+            cumulative = 0
+            for bound, hits in zip(DURATION_BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'pharmaledger_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'pharmaledger_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'pharmaledger_http_request_duration_seconds_sum{{{labels}}} {duration:.6f}')
+            lines.append(f'pharmaledger_http_request_duration_seconds_count{{{labels}}} {count}')
+
+        sampled_series = (
+            ('pharmaledger_sampled_requests_total', 'Requests whose queries and payloads were recorded.', 3, '{}'),
+            ('pharmaledger_db_queries_total', 'DB queries issued by sampled requests.', 4, '{}'),
+            ('pharmaledger_db_query_seconds_total', 'Time spent in DB queries by sampled requests.', 5, '{:.6f}'),
+            ('pharmaledger_http_request_bytes_total', 'Request body bytes of sampled requests.', 6, '{}'),
+            ('pharmaledger_http_response_bytes_total', 'Response body bytes of sampled requests.', 7, '{}')
+        )
+        for name, help_text, index, fmt in sampled_series:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (route, method), values in sorted(routes.items()):
+                lines.append(f'{name}{{route="{route}",method="{method}"}} {fmt.format(values[index])}')
+
+        lines += [
+            '# HELP pharmaledger_instrumentation_sample_rate Share of requests with query and payload stats.',
+            '# TYPE pharmaledger_instrumentation_sample_rate gauge',
+            f'pharmaledger_instrumentation_sample_rate {self.sample_rate}'
+        ]
+        for name, help_text, value in extra_gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+        for name, help_text, value in extra_counters:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def configure_logging(app):
+    """Structured JSON logs on app.logger, level from LOG_LEVEL"""
+    app.logger.removeHandler(default_handler)
+    if not any(isinstance(handler.formatter, JsonFormatter) for handler in app.logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        app.logger.addHandler(handler)
+    app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    app.logger.propagate = False
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,294 @@
+import sys
+import json
+import hashlib
+from datetime import datetime
+from sqlalchemy import create_engine, text, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+# append-only, hash-chained history of medicine_batches, sealed into Merkle-root blocks
+#   entry_hash = sha256(prev_entry_hash + record_hash), one entry per inserted / changed / removed row
+#   block      = merkle root over the entry hashes of up to BLOCK_SIZE consecutive entries,
+#                chained through block_hash = sha256(prev_block_hash + merkle_root)
+# the loader appends and seals after every load, so no hashing happens on the request path.
+
+ENGINE_URL = '--' # same database as the loader, removed the url link for privacy
+BLOCK_SIZE = 1024  # entries per sealed block, a proof has at most log2(BLOCK_SIZE) steps
+SYNC_CHUNK = 5000  # medicine_ids diffed against the ledger heads per round-trip
+GENESIS_HASH = '0' * 64
+RECORD_FIELDS = ('medicine_id', 'batch_number', 'medicine_name', 'manufacture_date', 'expiry_date', 'pharmacy_name')
+
+def sha256(data):
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def record_hash(record):
+    """Canonical hash of one medicine_batches row, None for a removed row"""
+    if record is None:
+        return sha256('{"deleted": true}')
+    canonical = {field: str(record[field]) if record[field] is not None else None for field in RECORD_FIELDS}
+    return sha256(json.dumps(canonical, sort_keys=True, separators=(',', ':')))
+
+def entry_hash(prev_hash, rec_hash):
+    return sha256(prev_hash + rec_hash)
+
+def _leaf(value):
+    return sha256('\x00' + value)
+
+def _node(left, right):
+    return sha256('\x01' + left + right)
+
+def merkle_levels(hashes):
+    """Every tree level over the entry hashes, leaves first and the root last"""
+    levels = [[_leaf(value) for value in hashes]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                       for i in range(0, len(level), 2)])
+    return levels
+
+def merkle_root(hashes):
+    """Root over the entry hashes, an unpaired node is promoted to the next level"""
+    return merkle_levels(hashes)[-1][0] if hashes else GENESIS_HASH
+
+def proof_positions(size, index):
+    """(level, position) of the siblings on the path from leaf `index` in a block of `size` entries"""
+    positions = []
+    level = 0
+    while size > 1:
+        sibling = index ^ 1
+        if sibling < size:
+            positions.append((level, sibling, 'left' if sibling < index else 'right'))
+        size, index, level = (size + 1) // 2, index // 2, level + 1
+    return positions
+
+def merkle_proof(hashes, index):
+    """Sibling path from leaf `index` to the root, as [{'hash', 'side'}]"""
+    proof = []
+    level = [_leaf(value) for value in hashes]
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({'hash': level[sibling], 'side': 'left' if sibling < index else 'right'})
+        level = [_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        index //= 2
+    return proof
+
+def verify_proof(entry, proof, root):
+    """Check an entry hash against a block's merkle root, O(log n) hashes"""
+    current = _leaf(entry)
+    for step in proof:
+        current = _node(step['hash'], current) if step['side'] == 'left' else _node(current, step['hash'])
+    return current == root
+
+ROWS_BY_ID_SQL = text("""
+    SELECT medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name
+    FROM medicine_batches WHERE medicine_id IN :ids ORDER BY medicine_id
+""").bindparams(bindparam('ids', expanding=True))
+
+HEADS_BY_ID_SQL = text("SELECT medicine_id, record_hash FROM ledger_heads WHERE medicine_id IN :ids").bindparams(
+    bindparam('ids', expanding=True))
+
+ROWS_IN_RANGE_SQL = text("""
+    SELECT medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name
+    FROM medicine_batches WHERE medicine_id > :after ORDER BY medicine_id LIMIT :limit
+""")
+
+HEADS_IN_RANGE_SQL = text("""
+    SELECT medicine_id, record_hash FROM ledger_heads WHERE medicine_id > :after AND medicine_id <= :upto
+""")
+
+INSERT_ENTRY_SQL = text("""
+    INSERT INTO ledger_entries (seq, medicine_id, batch_number, record_hash, prev_hash, entry_hash, created_at)
+    VALUES (:seq, :medicine_id, :batch_number, :record_hash, :prev_hash, :entry_hash, :created_at)
+""")
+
+DELETE_HEADS_SQL = text("DELETE FROM ledger_heads WHERE medicine_id IN :ids").bindparams(bindparam('ids', expanding=True))
+
+INSERT_HEAD_SQL = text("INSERT INTO ledger_heads (medicine_id, record_hash, seq) VALUES (:medicine_id, :record_hash, :seq)")
+
+INSERT_NODE_SQL = text("INSERT INTO ledger_nodes (block_id, level, position, hash) VALUES (:block_id, :level, :position, :hash)")
+
+class _Chain:
+    """Running tail of the hash chain while appending"""
+
+    def __init__(self, conn):
+        tail = conn.execute(text("SELECT seq, entry_hash FROM ledger_entries ORDER BY seq DESC LIMIT 1")).first()
+        self.seq, self.hash = (tail.seq, tail.entry_hash) if tail else (0, GENESIS_HASH)
+        self.created_at = datetime.utcnow()
+
+    def append(self, entries, medicine_id, batch_number, rec_hash):
+        self.seq += 1
+        current = entry_hash(self.hash, rec_hash)
+        entries.append({'seq': self.seq, 'medicine_id': medicine_id, 'batch_number': batch_number,
+                        'record_hash': rec_hash, 'prev_hash': self.hash, 'entry_hash': current,
+                        'created_at': self.created_at})
+        self.hash = current
+
+def _write(conn, entries):
+    if not entries:
+        return
+    conn.execute(INSERT_ENTRY_SQL, entries)
+    conn.execute(DELETE_HEADS_SQL, {'ids': [entry['medicine_id'] for entry in entries]})
+    conn.execute(INSERT_HEAD_SQL, [{'medicine_id': entry['medicine_id'], 'record_hash': entry['record_hash'],
+                                    'seq': entry['seq']} for entry in entries])
+
+def _diff(conn, chain, rows, heads):
+    """Append and write the entries for `rows` against their `heads`, returns how many"""
+    tombstone = record_hash(None)
+    entries = []
+    for row in rows:
+        current = record_hash(row)
+        if heads.pop(row['medicine_id'], None) != current:
+            chain.append(entries, row['medicine_id'], row['batch_number'], current)
+    for medicine_id, previous in sorted(heads.items()):
+        if previous != tombstone:  # row removed since the last load
+            chain.append(entries, medicine_id, None, tombstone)
+    _write(conn, entries)
+    return len(entries)
+
+def sync_ledger(conn, chunk_size=SYNC_CHUNK, medicine_ids=None):
+    """
+    Append an entry for every medicine_batches row whose content differs from its ledger
+    head, plus a tombstone for every row that disappeared. With `medicine_ids` (the rows
+    a load wrote) only those are diffed, otherwise the whole table is walked in
+    medicine_id order; either way one chunk at a time, so memory stays bounded. The
+    loader is the only writer. Returns the number of appended entries.
+    """
+    chain = _Chain(conn)
+    appended = 0
+    if medicine_ids is not None:
+        ids = sorted(medicine_ids)
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = conn.execute(ROWS_BY_ID_SQL, {'ids': chunk}).mappings().all()
+            heads = {row.medicine_id: row.record_hash for row in conn.execute(HEADS_BY_ID_SQL, {'ids': chunk})}
+            appended += _diff(conn, chain, rows, heads)
+        return appended
+
+    after = 0
+    while True:
+        rows = conn.execute(ROWS_IN_RANGE_SQL, {'after': after, 'limit': chunk_size}).mappings().all()
+        upto = rows[-1]['medicine_id'] if rows else sys.maxsize
+        heads = {row.medicine_id: row.record_hash for row in conn.execute(HEADS_IN_RANGE_SQL, {'after': after, 'upto': upto})}
+        appended += _diff(conn, chain, rows, heads)
+        if not rows:
+            return appended
+        after = upto
+
+def store_nodes(conn, block_id, hashes):
+    """Keep every tree level of a block below the root, so a proof reads log2(n) hashes instead of rehashing the block"""
+    nodes = [{'block_id': block_id, 'level': level, 'position': position, 'hash': value}
+             for level, values in enumerate(merkle_levels(hashes)[:-1])
+             for position, value in enumerate(values)]
+    if nodes:
+        conn.execute(INSERT_NODE_SQL, nodes)
+
+def seal_blocks(conn, block_size=BLOCK_SIZE):
+    """Group unsealed entries into Merkle-root blocks chained by block hash, returns blocks sealed"""
+    tail = conn.execute(text("SELECT id, block_hash FROM ledger_blocks ORDER BY id DESC LIMIT 1")).first()
+    block_id, prev_block = (tail.id, tail.block_hash) if tail else (0, GENESIS_HASH)
+    sealed = 0
+    while True:
+        entries = conn.execute(text(
+            "SELECT seq, entry_hash FROM ledger_entries WHERE block_id IS NULL ORDER BY seq LIMIT :limit"
+        ), {'limit': block_size}).all()
+        if not entries:
+            return sealed
+        hashes = [entry.entry_hash for entry in entries]
+        root = merkle_root(hashes)
+        block_id += 1
+        block_hash = sha256(prev_block + root)
+        conn.execute(text("""
+            INSERT INTO ledger_blocks (id, first_seq, last_seq, merkle_root, prev_block_hash, block_hash, created_at)
+            VALUES (:id, :first_seq, :last_seq, :merkle_root, :prev_block_hash, :block_hash, :created_at)
+        """), {'id': block_id, 'first_seq': entries[0].seq, 'last_seq': entries[-1].seq, 'merkle_root': root,
+               'prev_block_hash': prev_block, 'block_hash': block_hash, 'created_at': datetime.utcnow()})
+        conn.execute(text("UPDATE ledger_entries SET block_id = :id WHERE seq BETWEEN :first AND :last"),
+                     {'id': block_id, 'first': entries[0].seq, 'last': entries[-1].seq})
+        store_nodes(conn, block_id, hashes)
+        prev_block = block_hash
+        sealed += 1
+
+def inclusion_proof(conn, record):
+    """
+    Sealed ledger entry of exactly the verified `record` (the batch's first unit row) with
+    its Merkle proof. The record hash is recomputed from the returned fields, so the proof
+    never vouches for another row or an older version; None when that content isn't
+    sealed (yet).
+    """
+    medicine_id = record.get('medicine_id')
+    if medicine_id is None:  # catalogue rows don't carry it
+        medicine_id = conn.execute(text(
+            "SELECT MIN(medicine_id) FROM medicine_batches WHERE batch_number = :batch_number"
+        ), {'batch_number': record['batch_number']}).scalar()
+        if medicine_id is None:
+            return None
+    rec_hash = record_hash(dict(record, medicine_id=medicine_id))
+    entry = conn.execute(text("""
+        SELECT seq, medicine_id, record_hash, prev_hash, entry_hash, block_id FROM ledger_entries
+        WHERE medicine_id = :medicine_id AND record_hash = :record_hash AND block_id IS NOT NULL
+        ORDER BY seq DESC LIMIT 1
+    """), {'medicine_id': medicine_id, 'record_hash': rec_hash}).first()
+    if entry is None:
+        return None
+    block = conn.execute(text(
+        "SELECT id, first_seq, last_seq, merkle_root, prev_block_hash, block_hash FROM ledger_blocks WHERE id = :id"
+    ), {'id': entry.block_id}).first()
+    # a block holds consecutive seqs, so the leaf index is the offset from its first one
+    positions = proof_positions(block.last_seq - block.first_seq + 1, entry.seq - block.first_seq)
+    proof = None
+    if positions:
+        where = ' OR '.join(f'(level = :level{i} AND position = :position{i})' for i in range(len(positions)))
+        params = {'id': block.id}
+        for i, (level, position, _) in enumerate(positions):
+            params[f'level{i}'], params[f'position{i}'] = level, position
+        nodes = {(row.level, row.position): row.hash for row in conn.execute(
+            text(f"SELECT level, position, hash FROM ledger_nodes WHERE block_id = :id AND ({where})"), params)}
+        if len(nodes) == len(positions):
+            proof = [{'hash': nodes[(level, position)], 'side': side} for level, position, side in positions]
+    else:
+        proof = []
+    if proof is None:
+        # sealed before the nodes were stored and not backfilled yet
+        leaves = [row.entry_hash for row in conn.execute(
+            text("SELECT entry_hash FROM ledger_entries WHERE block_id = :id ORDER BY seq"), {'id': block.id})]
+        proof = merkle_proof(leaves, leaves.index(entry.entry_hash))
+    return {
+        'seq': entry.seq,
+        'medicineId': entry.medicine_id,
+        'recordHash': entry.record_hash,
+        'prevHash': entry.prev_hash,
+        'entryHash': entry.entry_hash,
+        'blockId': block.id,
+        'merkleRoot': block.merkle_root,
+        'prevBlockHash': block.prev_block_hash,
+        'blockHash': block.block_hash,
+        'proof': proof
+    }
+
+def backfill_nodes(conn):
+    """Store the tree levels of blocks sealed before ledger_nodes existed, returns blocks filled"""
+    missing = conn.execute(text(
+        "SELECT id FROM ledger_blocks b WHERE last_seq > first_seq AND NOT EXISTS "
+        "(SELECT 1 FROM ledger_nodes n WHERE n.block_id = b.id) ORDER BY id"
+    )).scalars().all()
+    for block_id in missing:
+        hashes = [row.entry_hash for row in conn.execute(
+            text("SELECT entry_hash FROM ledger_entries WHERE block_id = :id ORDER BY seq"), {'id': block_id})]
+        store_nodes(conn, block_id, hashes)
+    return len(missing)
+
+if __name__ == '__main__':
+    # periodic sealing, e.g. from cron: python ledger.py
+    engine = create_engine(ENGINE_URL, echo=False)
+    try:
+        with engine.begin() as conn:
+            appended = sync_ledger(conn)
+            sealed = seal_blocks(conn)
+            backfilled = backfill_nodes(conn)
+        print(f"✓ Ledger: {appended} entries appended, {sealed} blocks sealed, {backfilled} blocks backfilled.")
+    except SQLAlchemyError as e:
+        print(f"✗ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
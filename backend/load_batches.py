@@ -1,10 +1,23 @@
 import os
+import re
 import csv
 import sys
-from datetime import datetime, timezone
-from sqlalchemy import create_engine, text
+import json
+import hashlib
+import argparse
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timezone
+from sqlalchemy import create_engine, text, bindparam
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import sessionmaker
+from data_version import bump_version, DEFAULT_VERSION_FILE
+from migrate_catalogue import sync_catalogue
+from bloom import build_filter, DEFAULT_FILTER_FILE
+from ledger import sync_ledger, seal_blocks
+from expiry_report import refresh_expiry_summary
+from snapshot import build_snapshot, Signer, DEFAULT_SNAPSHOT_DIR
+from config import Config
 
 # database configuration ( removed all the info for privacy )
 DB_CONFIG = {
@@ -18,96 +31,483 @@ DB_CONFIG = {
 # connecting to Sql
 ENGINE_URL = '--' # again removed the url link for privacy
 CSV_FILE = 'medicine_batches.csv'  # csv file location wrt the backend folder
+CHUNK_SIZE = 1000  # rows per insert / transaction, keeps each statement under the packet limit
+WRITER_WORKERS = 4  # writer threads in full mode, each one holds a pooled connection
+PROGRESS_EVERY = 50000  # rows between throughput reports
+SYNC_CATALOGUE = Config.BATCH_CATALOGUE_ENABLED  # the app verifies from the catalogue, so every load keeps it current
+BLOOM_FP_RATE = 0.01  # false positive rate of the batch number filter used by verify-batch
+LEDGER_ENABLED = True  # append changed rows to the hash-chained ledger and seal blocks after each load
+EXPIRY_SUMMARY_ENABLED = True  # refresh the batch_expiry summary behind /api/reports/expiring after each load
+MANIFEST_SUFFIX = '.manifest.json'  # checkpoint written next to the csv file
+REJECTS_SUFFIX = '.rejects.csv'  # rejected rows with their reason, written next to the csv file
+BITMAP_MAX_ID = 2 ** 28  # medicine_ids up to this are tracked in a bitmap (32 MB at most) while reading
+FILTER_FILE = DEFAULT_FILTER_FILE  # Bloom filter written after each load, read by the flask workers
+VERSION_FILE = DEFAULT_VERSION_FILE  # data version marker bumped after each load
+SNAPSHOT_ENABLED = True  # write a catalogue snapshot plus deltas for offline clients after each load
+SNAPSHOT_DIR = DEFAULT_SNAPSHOT_DIR  # served by /api/catalogue/snapshot and /api/catalogue/delta
+SNAPSHOT_KEEP = 5  # snapshots kept, clients on any of them get a delta instead of a full download
+SNAPSHOT_SIGNING_KEY = os.environ.get('SNAPSHOT_SIGNING_KEY')  # Ed25519 private key (PEM file), needs cryptography
+SNAPSHOT_HMAC_KEY = os.environ.get('SNAPSHOT_HMAC_KEY')  # HMAC-SHA256 key used when there is no Ed25519 key
+SNAPSHOT_ALLOW_UNSIGNED = os.environ.get('SNAPSHOT_ALLOW_UNSIGNED') == '1'  # without a key no snapshot is published
+COMPARED_FIELDS = ('batch_number', 'medicine_name', 'manufacture_date', 'expiry_date', 'pharmacy_name')
 
-def load_batches_to_db():
+INSERT_SQL = text("""
+    INSERT INTO medicine_batches 
+    (medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name, date_uploaded) 
+    VALUES (:medicine_id, :batch_number, :medicine_name, :manufacture_date, :expiry_date, :pharmacy_name, :date_uploaded)
+""")
+
+UPDATE_SQL = text("""
+    UPDATE medicine_batches
+    SET batch_number = :batch_number, medicine_name = :medicine_name, manufacture_date = :manufacture_date,
+        expiry_date = :expiry_date, pharmacy_name = :pharmacy_name, date_uploaded = :date_uploaded
+    WHERE medicine_id = :medicine_id
+""")
+
+# matched after parse_row strips and upper-cases the value, so 'b-12.a' loads as 'B-12.A';
+# anything else (spaces, other punctuation) is rejected. compiled once, matched per row
+BATCH_NUMBER_RE = re.compile(r'[A-Z0-9][A-Z0-9./-]{0,99}')
+
+class RowRejected(ValueError):
+    """Raised by parse_row with the reason a csv row can't be loaded"""
+
+class RejectLog:
+    """Side-car csv of rejected rows with the reason, opened lazily on the first reject"""
+
+    def __init__(self, csv_file, resume=False):
+        self.path = csv_file + REJECTS_SUFFIX
+        self.count = 0
+        self._file = None
+        self._writer = None
+        if not resume and os.path.exists(self.path):
+            os.remove(self.path)  # stale report from an earlier run
+
+    def add(self, row_num, row, reason):
+        if self._writer is None:
+            is_new = not os.path.exists(self.path)
+            self._file = open(self.path, 'a', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            if is_new:
+                self._writer.writerow(['row_num', 'reason'] + list(row.keys()))
+        self._writer.writerow([row_num, reason] + list(row.values()))
+        self.count += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            print(f"✗ {self.count} rows rejected, see {self.path}")
+
+def parse_date(value, field):
+    try:
+        return date.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        raise RowRejected(f'{field} must be YYYY-MM-DD, got {value!r}')
+
+def parse_row(row, loaded_at):
+    """Validate one csv row and turn it into the dict bound to the insert statement"""
+    medicine_id = (row.get('medicine_id') or '').strip()
+    if medicine_id and not medicine_id.isdigit():
+        raise RowRejected(f'medicine_id must be a positive integer, got {medicine_id!r}')
+
+    batch_number = (row.get('batch_number') or '').strip().upper()
+    if not BATCH_NUMBER_RE.fullmatch(batch_number):
+        raise RowRejected(f'invalid batch_number {batch_number!r}')
+
+    medicine_name = (row.get('medicine_name') or '').strip()
+    if not medicine_name:
+        raise RowRejected('medicine_name is empty')
+
+    manufacture_date = parse_date(row.get('manufacture_date'), 'manufacture_date')
+    expiry_date = parse_date(row.get('expiry_date'), 'expiry_date')
+    if expiry_date <= manufacture_date:
+        raise RowRejected('expiry_date must be after manufacture_date')
+
+    return {
+        'medicine_id': int(medicine_id) if medicine_id else None, # planning to remove that none further, present as of now to skip error
+        'batch_number': batch_number,
+        'medicine_name': medicine_name,
+        'manufacture_date': manufacture_date,
+        'expiry_date': expiry_date,
+        'pharmacy_name': row['pharmacy_name'].strip() if row.get('pharmacy_name') else None,
+        'date_uploaded': loaded_at
+    }
+
+class SeenIds:
+    """medicine_ids read so far: one bit per id up to BITMAP_MAX_ID, a set for the rare larger ones.
+
+    10 million ids fit in 1.25 MB, where a set of ints would need hundreds.
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._large = set()
+
+    def add(self, medicine_id):
+        """Record an id, returns False when it was already seen"""
+        if medicine_id > BITMAP_MAX_ID:
+            if medicine_id in self._large:
+                return False
+            self._large.add(medicine_id)
+            return True
+        byte, bit = divmod(medicine_id, 8)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))  # grow geometrically
+        if self._bits[byte] & (1 << bit):
+            return False
+        self._bits[byte] |= 1 << bit
+        return True
+
+def read_csv_rows(csv_file, loaded_at, start_after=1, rejects=None):
+    """
+    Yield (row_num, batch_data) for every valid row past `start_after`, in one pass.
+    Invalid rows, and every repeat of a medicine_id after its first valid row, go to
+    `rejects` instead of aborting the load, so which row wins never depends on the writers.
+    """
+    seen_ids = SeenIds()
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row_num, row in enumerate(reader, start=2):  # row 1 is the header
+            if not row or not any(row.values()):  # skiping the empty rows ( if any )
+                continue
+            try:
+                batch_data = parse_row(row, loaded_at)
+                medicine_id = batch_data['medicine_id']
+                if medicine_id is not None and not seen_ids.add(medicine_id):
+                    raise RowRejected(f'duplicate medicine_id {medicine_id} in file')
+            except RowRejected as e:
+                if row_num <= start_after:
+                    continue  # rejected by the run that read it
+                if rejects is None:
+                    raise
+                rejects.add(row_num, row, str(e))
+                continue
+            if row_num <= start_after:
+                continue  # loaded by an earlier run, only its medicine_id matters here
+            yield row_num, batch_data
+
+def chunked(rows, chunk_size):
+    """Group the (row_num, batch_data) stream into lists of at most chunk_size batch dicts"""
+    chunk = []
+    for _, batch_data in rows:
+        chunk.append(batch_data)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def after_load(engine, sync_catalogue_after=SYNC_CATALOGUE, touched=None, written_ids=None):
+    """
+    Catalogue, ledger, expiry summary, Bloom filter and snapshot upkeep once the rows are in, then bump
+    the data version. `touched` (batch numbers the load wrote or moved rows away from)
+    limits the catalogue and expiry refresh to those and `written_ids` (medicine_ids it
+    wrote) the ledger diff, None rebuilds / walks everything.
+    """
+    if sync_catalogue_after:
+        with engine.begin() as conn:
+            counts = sync_catalogue(conn, touched)
+        print(f"✓ Catalogue synced for {len(touched)} batch numbers." if counts is None
+              else f"✓ Catalogue rebuilt: {counts[0]} batches, {counts[1]} units.")
+
+    if EXPIRY_SUMMARY_ENABLED:
+        with engine.begin() as conn:
+            refreshed = refresh_expiry_summary(conn, touched)
+        print("✓ Expiry summary rebuilt." if refreshed is None
+              else f"✓ Expiry summary refreshed for {refreshed} batch numbers.")
+
+    if LEDGER_ENABLED:
+        with engine.begin() as conn:
+            appended = sync_ledger(conn, medicine_ids=written_ids)
+            sealed = seal_blocks(conn)
+        print(f"✓ Ledger: {appended} entries appended, {sealed} blocks sealed.")
+
+    with engine.connect() as conn:
+        count = build_filter(conn, FILTER_FILE, fp_rate=BLOOM_FP_RATE)
+    print(f"✓ Batch filter rebuilt over {count} batch numbers.")
+
+    signer = None
+    if SNAPSHOT_ENABLED:
+        try:
+            signer = Signer.from_settings(SNAPSHOT_SIGNING_KEY, SNAPSHOT_HMAC_KEY, SNAPSHOT_ALLOW_UNSIGNED)
+        except RuntimeError as e:
+            print(f"⚠ Catalogue snapshot NOT published: {e}")
+    if signer is not None:
+        with engine.connect() as conn:
+            manifest = build_snapshot(conn, SNAPSHOT_DIR, signer, keep=SNAPSHOT_KEEP, ledger=LEDGER_ENABLED)
+        latest = manifest['snapshots'][-1]
+        print(f"✓ Catalogue snapshot {latest['id']} written: {latest['records']} batches, "
+              f"{latest['size']} bytes, {len(manifest['deltas'])} deltas, signature {manifest['signature']}.")
+        if manifest['ledger']:
+            print(f"✓ Ledger roots published: {manifest['ledger']['blocks']} blocks.")
+
+    # tells the flask workers to drop their cached verification results
+    version = bump_version(VERSION_FILE)
+    print(f"✓ Data version bumped to {version}")
+
+def load_batches_to_db(csv_file=CSV_FILE, chunk_size=CHUNK_SIZE, workers=WRITER_WORKERS,
+                       sync_catalogue_after=SYNC_CATALOGUE):
     """
     Load CSV data into medicine_batches table. 
+    The file is streamed chunk by chunk to a pool of writer threads, each insert runs on
+    its own pooled connection and at most 2 chunks per worker are in flight, so memory
+    stays flat however large the file is. Returns True when the rows and the post-load
+    upkeep went through, False otherwise.
     """
-    if not os.path.exists(CSV_FILE):
-        print(f"✗ CSV file '{CSV_FILE}' not found in {os.getcwd()}")
-        sys.exit(1)
+    if not os.path.exists(csv_file):
+        print(f"✗ CSV file '{csv_file}' not found in {os.getcwd()}")
+        return False
 
     # printing to know the task has been done
     print("PharmaLedger - Medicine Batch Data Loader")
     print("=" * 60)
-    print(f"Loading data from: {CSV_FILE}")
+    print(f"Loading data from: {csv_file} ({workers} writers, {chunk_size} rows per insert)")
     print("-" * 60)
 
-    
-    engine = create_engine(ENGINE_URL, echo=False)  
-    Session = sessionmaker(bind=engine) # for further development, hasn't been implemented yet
-    session = Session()
+    # one pooled connection per writer thread
+    engine = create_engine(ENGINE_URL, echo=False, pool_size=workers, max_overflow=0)
+    in_flight = threading.BoundedSemaphore(workers * 2)
+
+    def write_chunk(chunk):
+        try:
+            with engine.begin() as conn:
+                conn.execute(INSERT_SQL, chunk)
+            return len(chunk)
+        finally:
+            in_flight.release()
 
+    rejects = RejectLog(csv_file)
     try:
         print("Clearing existing data...")
         with engine.connect() as conn:
-            conn.execute(text("TRUNCATE TABLE medicine_batches"))
+            # sqlite (local benchmark stand-in) has no TRUNCATE
+            conn.execute(text("DELETE FROM medicine_batches" if engine.dialect.name == 'sqlite'
+                              else "TRUNCATE TABLE medicine_batches"))
             conn.commit()
         print("✓ Table truncated successfully.")
 
-        # using file handling to read the csv file and hence uploading to the database
-        batches = []
-        with open(CSV_FILE, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row_num, row in enumerate(reader, start=2):  # i started it from the second row to skep adding the header, because it is of no use and will construct an already existing error
-                if not row or not any(row.values()):  # skiping the empty rows ( if any )
-                    continue
-                # preparing the batch data to be finally uploaded to the database
-                batch_data = {
-                    'medicine_id': int(row['medicine_id']) if row.get('medicine_id') else None, # planning to remove that none further, present as of now to skip error
-                    'batch_number': row['batch_number'].strip().upper(),
-                    'medicine_name': row['medicine_name'].strip(),
-                    'manufacture_date': row['manufacture_date'],
-                    'expiry_date': row['expiry_date'],
-                    'pharmacy_name': row['pharmacy_name'].strip() if row.get('pharmacy_name') else None,
-                    'date_uploaded': datetime.now(timezone.iso) # using iso date format as it's nation based as of now
-                }
-                batches.append(batch_data)
-                if len(batches) % 5 == 0:
-                    print(f"Read {len(batches)} rows...")
-
-        if not batches:
-            print("✗ No valid data found in CSV.")
-            return
-
-        print(f"Inserting {len(batches)} batches...")
+        loaded_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)  # one timestamp for the whole load
+        started = time.perf_counter()
+        inserted, reported = 0, 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk in chunked(read_csv_rows(csv_file, loaded_at, rejects=rejects), chunk_size):
+                in_flight.acquire()  # blocks the reader while the writers catch up
+                pending.add(pool.submit(write_chunk, chunk))
+                done = {future for future in pending if future.done()}
+                for future in done:
+                    inserted += future.result()  # re-raises a writer's database error here
+                pending -= done
+                if inserted - reported >= PROGRESS_EVERY:
+                    reported = inserted
+                    elapsed = time.perf_counter() - started
+                    print(f"Inserted {inserted} rows ({inserted / elapsed:,.0f} rows/sec)...")
+            for future in pending:
+                inserted += future.result()
 
-        insert_sql = text("""
-            INSERT INTO medicine_batches 
-            (medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name, date_uploaded) 
-            VALUES (:medicine_id, :batch_number, :medicine_name, :manufacture_date, :expiry_date, :pharmacy_name, :date_uploaded)
-        """)
-
-        with engine.connect() as conn:
-            conn.execute(insert_sql, batches)  
-            conn.commit()
+        if not inserted:
+            print("✗ No valid data found in CSV.")
+            return False
 
+        elapsed = time.perf_counter() - started
         print("✓ Data loaded successfully!")
-        print(f"Total batches inserted: {len(batches)}")
+        print(f"Total batches inserted: {inserted} in {elapsed:.1f}s ({inserted / elapsed:,.0f} rows/sec)")
 
         with engine.connect() as conn:
             result = conn.execute(text("SELECT COUNT(*) FROM medicine_batches")).scalar()
             print(f"DB verification: {result} rows in table.")
 
+        after_load(engine, sync_catalogue_after)
+        return True
+
     except IntegrityError as e:
-        session.rollback()
         print(f"✗ Integrity Error (e.g., duplicates): {e}")
         print("Tip: Ensure medicine_id in CSV is unique or let DB auto-increment.")
     except SQLAlchemyError as e:
-        session.rollback()
         print(f"✗ Database Error: {e}")
     except FileNotFoundError:
-        print(f"✗ CSV file not found: {CSV_FILE}")
+        print(f"✗ CSV file not found: {csv_file}")
     except Exception as e:
-        session.rollback()
         print(f"✗ Unexpected Error: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        session.close()
+        rejects.close()
+        engine.dispose()
+    return False
+
+def file_fingerprint(csv_file):
+    """sha256 of the csv contents, so a checkpoint is only reused for the very same file"""
+    digest = hashlib.sha256()
+    with open(csv_file, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_manifest(manifest_file, fingerprint):
+    """Return the saved checkpoint for this file, or a fresh one"""
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if manifest.get('fingerprint') == fingerprint:
+            return manifest
+        print("CSV file changed since the last checkpoint, starting over.")
+    return {'fingerprint': fingerprint, 'rows_done': 1, 'inserted': 0, 'updated': 0,
+            'unchanged': 0, 'skipped': 0, 'completed': False, 'post_load_pending': False}
+
+def write_manifest(manifest_file, manifest):
+    """Persist the checkpoint atomically after every committed chunk"""
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_file, manifest_file)
+
+def upsert_chunk(conn, chunk, touched=None, written_ids=None):
+    """
+    Diff one chunk against the table by medicine_id, insert new rows and update changed ones.
+    The batch numbers of written rows, and the old one of a row that changed batch, are
+    added to `touched`, their medicine_ids to `written_ids`.
+    """
+    ids = [batch['medicine_id'] for batch in chunk]
+    existing_sql = text(
+        "SELECT medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name "
+        "FROM medicine_batches WHERE medicine_id IN :ids"
+    ).bindparams(bindparam('ids', expanding=True))
+    existing = {row.medicine_id: row for row in conn.execute(existing_sql, {'ids': ids})}
+
+    inserts, updates = [], []
+    for batch in chunk:
+        current = existing.get(batch['medicine_id'])
+        if current is None:
+            inserts.append(batch)
+        elif any(str(getattr(current, field) or '') != str(batch[field] or '') for field in COMPARED_FIELDS):
+            updates.append(batch)
+            if touched is not None:
+                touched.add(current.batch_number)
+        else:
+            continue
+        if touched is not None:
+            touched.add(batch['batch_number'])
+        if written_ids is not None:
+            written_ids.add(batch['medicine_id'])
+
+    if inserts:
+        conn.execute(INSERT_SQL, inserts)
+    if updates:
+        conn.execute(UPDATE_SQL, updates)
+    return len(inserts), len(updates), len(chunk) - len(inserts) - len(updates)
+
+def load_batches_incremental(csv_file=CSV_FILE, chunk_size=CHUNK_SIZE, sync_catalogue_after=SYNC_CATALOGUE):
+    """
+    Upsert the CSV into medicine_batches without truncating it.
+    Rows are keyed by medicine_id and only new or changed rows are written, one
+    transaction per chunk. A manifest next to the CSV records the last committed
+    row so an interrupted load resumes from there. Returns True when every row and the
+    post-load upkeep went through, False when a run has to be resumed.
+    """
+    if not os.path.exists(csv_file):
+        print(f"✗ CSV file '{csv_file}' not found in {os.getcwd()}")
+        return False
+
+    print("PharmaLedger - Medicine Batch Incremental Loader")
+    print("=" * 60)
+
+    manifest_file = csv_file + MANIFEST_SUFFIX
+    manifest = read_manifest(manifest_file, file_fingerprint(csv_file))
+    # committed chunks of an earlier run whose upkeep never ran (killed, or after_load failed):
+    # without it the Bloom filter would still call their new batch numbers absent
+    post_load_pending = manifest.get('post_load_pending', False)
+    if manifest['completed'] and not post_load_pending:
+        print("✓ This file has already been loaded, nothing to do.")
+        return True
+    if manifest['rows_done'] > 1:
+        print(f"Resuming after CSV row {manifest['rows_done']}...")
+
+    engine = create_engine(ENGINE_URL, echo=False)
+    # whole seconds, DATETIME(0) would round the microseconds away
+    loaded_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    rejects = RejectLog(csv_file, resume=manifest['rows_done'] > 1)
+    changed, ok = False, True
+    touched, written_ids = set(), set()
+
+    def commit_chunk(chunk, last_row):
+        nonlocal changed
+        with engine.begin() as conn:
+            inserted, updated, unchanged = upsert_chunk(conn, chunk, touched, written_ids)
+        manifest['inserted'] += inserted
+        manifest['updated'] += updated
+        manifest['unchanged'] += unchanged
+        manifest['rows_done'] = last_row
+        changed = changed or bool(inserted or updated)
+        if changed:
+            manifest['post_load_pending'] = True  # cleared once after_load went through
+        write_manifest(manifest_file, manifest)
+        print(f"Committed up to row {last_row}: +{inserted} new, ~{updated} changed")
+
+    try:
+        if manifest['completed']:
+            print("Rows already loaded, finishing the post-load upkeep of the earlier run...")
+        else:
+            chunk, last_row = [], manifest['rows_done']
+            for row_num, batch_data in read_csv_rows(csv_file, loaded_at, manifest['rows_done'], rejects):
+                last_row = row_num
+                if batch_data['medicine_id'] is None:
+                    manifest['skipped'] += 1  # no natural key to diff on
+                    continue
+                chunk.append(batch_data)
+                if len(chunk) >= chunk_size:
+                    commit_chunk(chunk, last_row)
+                    chunk = []
+            if chunk:
+                commit_chunk(chunk, last_row)
+            manifest['rows_done'] = last_row
+            manifest['completed'] = True
+            write_manifest(manifest_file, manifest)
+            print("✓ Incremental load finished!")
+            print(f"Inserted: {manifest['inserted']} | Updated: {manifest['updated']} | "
+                  f"Unchanged: {manifest['unchanged']} | Skipped (no medicine_id): {manifest['skipped']}")
+
+    except SQLAlchemyError as e:
+        print(f"✗ Database Error: {e}")
+        print("Progress is saved, run the incremental load again to resume.")
+        ok = False
+    finally:
+        rejects.close()
+        if changed or post_load_pending:  # also after an interrupted run, the committed chunks are live
+            try:
+                # what an earlier process touched is unknown, so that upkeep is a full one
+                if post_load_pending:
+                    after_load(engine, sync_catalogue_after)
+                else:
+                    after_load(engine, sync_catalogue_after, touched, written_ids)
+                manifest['post_load_pending'] = False
+                write_manifest(manifest_file, manifest)
+            except SQLAlchemyError as e:
+                print(f"✗ Post-load step failed: {e}")
+                print("It runs again on the next incremental load of this file.")
+                ok = False
         engine.dispose()
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Load medicine batches from CSV into the database')
+    parser.add_argument('--incremental', action='store_true',
+                        help='upsert new/changed rows instead of truncating the table')
+    parser.add_argument('--csv', default=CSV_FILE, help='csv file to load')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='rows per insert statement / transaction')
+    parser.add_argument('--workers', type=int, default=WRITER_WORKERS,
+                        help='writer threads for a full load')
+    parser.add_argument('--sync-catalogue', action='store_true', default=SYNC_CATALOGUE,
+                        help='sync the normalized batch catalogue after the load (default: BATCH_CATALOGUE_ENABLED)')
+    args = parser.parse_args()
+
+    if args.incremental:
+        ok = load_batches_incremental(args.csv, args.chunk_size, args.sync_catalogue)
+    else:
+        ok = load_batches_to_db(args.csv, args.chunk_size, args.workers, args.sync_catalogue)
+    sys.exit(0 if ok else 1)
 
 if __name__ == '__main__':
-    load_batches_to_db()
+    main()
 
 # end of file
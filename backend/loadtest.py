@@ -0,0 +1,112 @@
+import csv
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import httpx
+
+# compares the flask app (app.py) with the async serving mode (async_app.py) on the same scan mix
+# needs httpx, see requirements-async.txt
+# start both first, e.g.
+#   python app.py                                        -> http://127.0.0.1:5000
+#   hypercorn async_app:app --bind 127.0.0.1:8000       -> http://127.0.0.1:8000
+# then: python loadtest.py --target flask=http://127.0.0.1:5000 --target async=http://127.0.0.1:8000
+
+CSV_FILE = 'medicine_batches.csv'  # batch numbers to scan, wrt the backend folder
+
+def load_batch_numbers(csv_file):
+    """Distinct batch numbers from the loader csv"""
+    with open(csv_file, 'r', encoding='utf-8') as file:
+        return sorted({row['batch_number'].strip().upper() for row in csv.DictReader(file) if row.get('batch_number')})
+
+def build_paths(batch_numbers, total, miss_ratio, seed=42):
+    """Scan mix: mostly real batch numbers, `miss_ratio` of them made up like counterfeit scans"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(total):
+        if rng.random() < miss_ratio or not batch_numbers:
+            batch_number = f'FAKE{rng.randrange(10 ** 8):08d}'
+        else:
+            batch_number = rng.choice(batch_numbers)
+        paths.append(f'/api/verify-batch?batch_number={batch_number}')
+    return paths
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_target(base_url, paths, concurrency, timeout):
+    """Fire every path at `base_url` with `concurrency` workers, return the measurements"""
+    latencies = []
+    statuses = {}
+    errors = 0
+    queue = iter(paths)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            nonlocal errors
+            for path in queue:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(paths),
+        'errors': errors,
+        'statuses': statuses,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test /api/verify-batch on one or more servers')
+    parser.add_argument('--target', action='append', required=True,
+                        help='name=url of a server to test, repeat to compare')
+    parser.add_argument('--requests', type=int, default=10000, help='requests per target')
+    parser.add_argument('--concurrency', type=int, default=200, help='concurrent clients')
+    parser.add_argument('--miss-ratio', type=float, default=0.3, help='share of unknown batch numbers')
+    parser.add_argument('--csv', default=CSV_FILE, help='csv with the batch numbers to scan')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per request timeout in seconds')
+    parser.add_argument('--json', dest='json_file', help='also write the results to this file')
+    args = parser.parse_args()
+
+    paths = build_paths(load_batch_numbers(args.csv), args.requests, args.miss_ratio)
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if not url:
+            print(f"✗ --target must look like name=url, got {target!r}")
+            sys.exit(1)
+        print(f"Running {args.requests} requests against {name} ({url}), concurrency {args.concurrency}...")
+        results[name] = asyncio.run(run_target(url, paths, args.concurrency, args.timeout))
+
+    print("-" * 78)
+    print(f"{'target':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}  statuses")
+    for name, result in results.items():
+        print(f"{name:<12}{result['requests_per_sec']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['errors']:>10}  {result['statuses']}")
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
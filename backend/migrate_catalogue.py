@@ -0,0 +1,115 @@
+import sys
+from sqlalchemy import create_engine, text, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+# same database as the loader
+ENGINE_URL = '--' # removed the url link for privacy
+
+SYNC_CHUNK = 1000  # batch numbers re-synced per statement in an incremental sync
+
+CREATE_BATCHES_SQL = text("""
+    CREATE TABLE IF NOT EXISTS batches (
+        id INTEGER PRIMARY KEY AUTO_INCREMENT,
+        batch_number VARCHAR(100) NOT NULL UNIQUE,
+        medicine_name VARCHAR(255) NOT NULL,
+        manufacture_date DATE NOT NULL,
+        expiry_date DATE NOT NULL,
+        pharmacy_name VARCHAR(255) NULL,
+        unit_count INTEGER NOT NULL DEFAULT 0,
+        date_uploaded DATETIME NULL
+    )
+""")
+
+CREATE_UNITS_SQL = text("""
+    CREATE TABLE IF NOT EXISTS batch_units (
+        medicine_id INTEGER PRIMARY KEY,
+        batch_id INTEGER NOT NULL,
+        pharmacy_name VARCHAR(255) NULL,
+        INDEX ix_batch_units_batch_id (batch_id),
+        FOREIGN KEY (batch_id) REFERENCES batches (id)
+    )
+""")
+
+# one catalogue row per batch number, taken from its first unit row
+FILL_BATCHES_SQL = """
+    INSERT INTO batches (batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name, unit_count, date_uploaded)
+    SELECT mb.batch_number, mb.medicine_name, mb.manufacture_date, mb.expiry_date, mb.pharmacy_name, f.unit_count, mb.date_uploaded
+    FROM medicine_batches mb
+    JOIN (
+        SELECT batch_number, MIN(medicine_id) AS first_id, COUNT(*) AS unit_count
+        FROM medicine_batches {where} GROUP BY batch_number
+    ) f ON mb.medicine_id = f.first_id
+"""
+
+FILL_UNITS_SQL = """
+    INSERT INTO batch_units (medicine_id, batch_id, pharmacy_name)
+    SELECT mb.medicine_id, b.id, mb.pharmacy_name
+    FROM medicine_batches mb
+    JOIN batches b ON b.batch_number = mb.batch_number
+    {where}
+"""
+
+FULL_FILL_SQL = [text(FILL_BATCHES_SQL.format(where='')), text(FILL_UNITS_SQL.format(where=''))]
+
+def _partial(sql):
+    return text(sql).bindparams(bindparam('batch_numbers', expanding=True))
+
+# the touched batch numbers only, their old rows are deleted first (units before batches, the fk)
+PARTIAL_SYNC_SQL = [
+    _partial("DELETE FROM batch_units WHERE batch_id IN "
+             "(SELECT id FROM batches WHERE batch_number IN :batch_numbers)"),
+    _partial("DELETE FROM batches WHERE batch_number IN :batch_numbers"),
+    _partial(FILL_BATCHES_SQL.format(where='WHERE batch_number IN :batch_numbers')),
+    _partial(FILL_UNITS_SQL.format(where='WHERE mb.batch_number IN :batch_numbers'))
+]
+
+def create_tables(conn):
+    """Create the catalogue tables if they don't exist yet (MySQL DDL, same as models.py)"""
+    conn.execute(CREATE_BATCHES_SQL)
+    conn.execute(CREATE_UNITS_SQL)
+
+def sync_catalogue(conn, batch_numbers=None):
+    """
+    Bring batches / batch_units up to date from medicine_batches with set-based statements.
+    Without `batch_numbers` both tables are rebuilt, otherwise only those batch numbers
+    (the ones the load wrote or moved rows away from) are. Runs inside the caller's
+    transaction, so readers keep seeing the old catalogue until it commits. Returns the
+    (batches, units) row counts, or None for an incremental sync.
+    """
+    if batch_numbers is None:
+        conn.execute(text("DELETE FROM batch_units"))
+        conn.execute(text("DELETE FROM batches"))
+        for statement in FULL_FILL_SQL:
+            conn.execute(statement)
+        batches = conn.execute(text("SELECT COUNT(*) FROM batches")).scalar()
+        units = conn.execute(text("SELECT COUNT(*) FROM batch_units")).scalar()
+        return batches, units
+
+    touched = sorted(batch_numbers)
+    for start in range(0, len(touched), SYNC_CHUNK):
+        chunk = touched[start:start + SYNC_CHUNK]
+        for statement in PARTIAL_SYNC_SQL:
+            conn.execute(statement, {'batch_numbers': chunk})
+    return None
+
+def migrate(engine_url=ENGINE_URL):
+    """Create and fill the catalogue, medicine_batches stays as the loader's staging table"""
+    print("PharmaLedger - Batch Catalogue Migration")
+    print("=" * 60)
+
+    engine = create_engine(engine_url, echo=False)
+    try:
+        with engine.begin() as conn:
+            create_tables(conn)
+            batches, units = sync_catalogue(conn)
+        print(f"✓ Catalogue built: {batches} batches, {units} units.")
+        print("Set BATCH_CATALOGUE_ENABLED = True in config.py: verification then reads the")
+        print("catalogue and every load keeps it current.")
+    except SQLAlchemyError as e:
+        print(f"✗ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    migrate()
@@ -1,12 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import password_hasher
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # reads may go to a replica, see db_routing.py
 
 class Manufacturer(db.Model):
     """Manufacturer model for storing manufacturer registration data"""
     __tablename__ = 'manufacturers'
+    __table_args__ = (
+        db.Index('ix_manufacturers_status_created', 'status', 'created_at', 'id'),  # review queue keyset
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     company_name = db.Column(db.String(255), nullable=False)
@@ -33,12 +37,16 @@ class Manufacturer(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password under the configured hashing policy"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify password against hash"""
-        return check_password_hash(self.password_hash, password)
+        """Verify password against hash, re-hashing it if the policy changed (caller commits)"""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            self.password_hash = password_hasher.hash(password)
+        return True
     
     def __repr__(self):
         return f'<Manufacturer {self.company_name}>'
@@ -46,6 +54,9 @@ class Manufacturer(db.Model):
 class Pharmacy(db.Model):
     """Pharmacy model for storing pharmacy registration data"""
     __tablename__ = 'pharmacies'
+    __table_args__ = (
+        db.Index('ix_pharmacies_status_created', 'status', 'created_at', 'id'),  # review queue keyset
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     pharmacy_name = db.Column(db.String(255), nullable=False)
@@ -74,12 +85,16 @@ class Pharmacy(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password under the configured hashing policy"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify password against hash"""
-        return check_password_hash(self.password_hash, password)
+        """Verify password against hash, re-hashing it if the policy changed (caller commits)"""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            self.password_hash = password_hasher.hash(password)
+        return True
     
     def to_dict(self):
         """Convert model to dictionary for API responses"""
@@ -106,7 +121,7 @@ class MedicineBatch(db.Model):
     batch_number = db.Column(db.String(100), nullable=False, index=True)
     medicine_name = db.Column(db.String(255), nullable=False)
     manufacture_date = db.Column(db.Date, nullable=False)
-    expiry_date = db.Column(db.Date, nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False, index=True)
     pharmacy_name = db.Column(db.String(255), nullable=True)
     date_uploaded = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -124,3 +139,131 @@ class MedicineBatch(db.Model):
             'pharmacy_name': self.pharmacy_name,
             'date_uploaded': self.date_uploaded.strftime('%Y-%m-%d %H:%M:%S') if self.date_uploaded else None
         }
+
+class Batch(db.Model):
+    """Batch-level catalogue, one row per batch number (see migrate_catalogue.py).
+
+    pharmacy_name is the pharmacy of the batch's first unit, the same one verify-batch
+    has always reported.
+    """
+    __tablename__ = 'batches'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    batch_number = db.Column(db.String(100), nullable=False, unique=True)
+    medicine_name = db.Column(db.String(255), nullable=False)
+    manufacture_date = db.Column(db.Date, nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False, index=True)
+    pharmacy_name = db.Column(db.String(255), nullable=True)
+    unit_count = db.Column(db.Integer, nullable=False, default=0)
+    date_uploaded = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Batch {self.batch_number}>'
+
+class BatchUnit(db.Model):
+    """Compact per-unit row referencing its batch, replaces the repeated medicine_batches columns"""
+    __tablename__ = 'batch_units'
+    
+    medicine_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=False, index=True)
+    pharmacy_name = db.Column(db.String(255), nullable=True)
+    
+    def __repr__(self):
+        return f'<BatchUnit {self.medicine_id}>'
+
+class BatchExpiry(db.Model):
+    """Expiry summary per batch number and pharmacy, refreshed by the loader (see expiry_report.py)"""
+    __tablename__ = 'batch_expiry'
+    __table_args__ = (
+        db.Index('ix_batch_expiry_expiry', 'expiry_date', 'id'),
+        db.Index('ix_batch_expiry_pharmacy_expiry', 'pharmacy_name', 'expiry_date', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    batch_number = db.Column(db.String(100), nullable=False, index=True)
+    pharmacy_name = db.Column(db.String(255), nullable=True)
+    medicine_name = db.Column(db.String(255), nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False)
+    unit_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self, today):
+        """Report row, status and days_left are relative to `today`"""
+        days_left = (self.expiry_date - today).days
+        return {
+            'batch_number': self.batch_number,
+            'medicine_name': self.medicine_name,
+            'pharmacy_name': self.pharmacy_name,
+            'expiry_date': self.expiry_date.strftime('%Y-%m-%d'),
+            'unit_count': self.unit_count,
+            'days_left': days_left,
+            'status': 'Expired' if days_left < 0 else 'Expiring'
+        }
+    
+    def __repr__(self):
+        return f'<BatchExpiry {self.batch_number}>'
+
+class LedgerEntry(db.Model):
+    """Append-only, hash-chained history of medicine_batches rows (written by ledger.py only)"""
+    __tablename__ = 'ledger_entries'
+    
+    seq = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    medicine_id = db.Column(db.Integer, nullable=False, index=True)
+    batch_number = db.Column(db.String(100), nullable=True, index=True)  # None for a removed row
+    record_hash = db.Column(db.String(64), nullable=False)
+    prev_hash = db.Column(db.String(64), nullable=False)
+    entry_hash = db.Column(db.String(64), nullable=False, unique=True)
+    block_id = db.Column(db.Integer, db.ForeignKey('ledger_blocks.id'), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LedgerEntry {self.seq}>'
+
+class LedgerHead(db.Model):
+    """Latest ledger record hash per medicine_id, lets each load append only what changed"""
+    __tablename__ = 'ledger_heads'
+    
+    medicine_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    record_hash = db.Column(db.String(64), nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False)
+
+class LedgerBlock(db.Model):
+    """Merkle root over a run of ledger entries, chained to the previous block"""
+    __tablename__ = 'ledger_blocks'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    first_seq = db.Column(db.BigInteger, nullable=False)
+    last_seq = db.Column(db.BigInteger, nullable=False)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    prev_block_hash = db.Column(db.String(64), nullable=False)
+    block_hash = db.Column(db.String(64), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LedgerBlock {self.id}>'
+
+class LedgerNode(db.Model):
+    """One Merkle tree node of a sealed block below its root, level 0 are the leaves"""
+    __tablename__ = 'ledger_nodes'
+    
+    block_id = db.Column(db.Integer, db.ForeignKey('ledger_blocks.id'), primary_key=True, autoincrement=False)
+    level = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    hash = db.Column(db.String(64), nullable=False)
+
+
+class ScanEvent(db.Model):
+    """One /api/verify-batch scan, written in batches by the scan log (see scan_events.py)"""
+    __tablename__ = 'scan_events'
+    __table_args__ = (
+        db.Index('ix_scan_events_batch_scanned', 'batch_number', 'scanned_at'),
+    )
+    
+    # on MySQL the table is partitioned by day on scanned_at, the key is (id, scanned_at) there
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    scanned_at = db.Column(db.DateTime, nullable=False)
+    batch_number = db.Column(db.String(100), nullable=False)
+    found = db.Column(db.Boolean, nullable=False)
+    source_hash = db.Column(db.String(16), nullable=False)
+    
+    def __repr__(self):
+        return f'<ScanEvent {self.batch_number}>'
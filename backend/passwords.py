@@ -0,0 +1,103 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# the app runs background threads (scan log flusher, replica checker, upload pool...) by the
+# time the first password is hashed, a plain fork could copy one of their locks held. spawn,
+# not forkserver: a gunicorn worker forked from a preloaded parent inherits a dead forkserver
+_START_METHOD = 'spawn'
+
+# werkzeug's defaults for the work factors a method string may leave out
+_SCRYPT_DEFAULTS = ('32768', '8', '1')
+_PBKDF2_DEFAULTS = ('sha256', str(DEFAULT_PBKDF2_ITERATIONS))
+
+
+def normalize_method(method):
+    """Full (algorithm, work factors...) tuple, so 'pbkdf2:sha256' and 'pbkdf2:sha256:<default>' compare equal"""
+    algorithm, *factors = method.split(':')
+    defaults = {'scrypt': _SCRYPT_DEFAULTS, 'pbkdf2': _PBKDF2_DEFAULTS}.get(algorithm, ())
+    return (algorithm, *factors, *defaults[len(factors):])
+
+
+class PasswordHasher:
+    """Password hashing policy, run on a process pool so the hash cost never holds the GIL.
+
+    `method` uses werkzeug's format, algorithm plus work factors, e.g. 'scrypt:32768:8:1'
+    or 'pbkdf2:sha256:600000'. Stored hashes made under another method are upgraded the
+    next time the password is verified.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=2, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self.inline_fallbacks = 0
+
+    def init_app(self, app):
+        """Read the hashing policy, pool size and timeout from the flask config"""
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        app.extensions['password_hasher'] = self
+
+    def _get_pool(self):
+        # started on first use and per process: a pool inherited through fork (gunicorn
+        # --preload, a parent that hashed once) has no worker processes behind it
+        pid = os.getpid()
+        if self._pool is not None and self._pool_pid == pid:
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pool_pid != pid:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(_START_METHOD))
+                self._pool_pid = pid
+            return self._pool
+
+    def _discard_pool(self, pool):
+        # the next hash starts a fresh pool; the hashes other requests queued on this one
+        # still finish, the old pool exits once they have
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        pool = self._get_pool()
+        try:
+            return pool.submit(func, *args).result(timeout=self.timeout)
+        except (FutureTimeoutError, BrokenProcessPool, CancelledError, RuntimeError):
+            # a stuck or dead pool must not hang the request, hash inline and start afresh;
+            # RuntimeError is a submit racing another request's discard of the same pool
+            self.inline_fallbacks += 1
+            self._discard_pool(pool)
+            return func(*args)
+
+    def shutdown(self):
+        """Stop the pool, a process that started it has to do this before it can exit"""
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown()
+            self._pool = None
+
+    def hash(self, password):
+        """Hash under the current policy"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when the stored hash was made with another algorithm or work factor"""
+        return normalize_method(pwhash.split('$', 1)[0]) != normalize_method(self.method)
+
+
+password_hasher = PasswordHasher()
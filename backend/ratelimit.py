@@ -0,0 +1,186 @@
+import math
+import time
+import threading
+from flask import request, jsonify
+
+# token bucket in a Redis-compatible server, one hash per key, refilled from the elapsed time
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+def client_address(headers, remote_addr, trusted_proxies=0):
+    """Caller address, taken from X-Forwarded-For only as far as our own proxies wrote it"""
+    forwarded = headers.get('X-Forwarded-For') if trusted_proxies else None
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-trusted_proxies] if len(hops) >= trusted_proxies else hops[0]
+    return remote_addr or 'unknown'
+
+
+class MemoryBackend:
+    """Token buckets in this process, {key: [tokens, last refill]} behind one lock"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, rate, capacity, now):
+        """Spend one token, returns (allowed, tokens left)"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._evict(now)
+                bucket = self._buckets[key] = [capacity, now]
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, bucket[0]
+            return False, bucket[0]
+
+    def _evict(self, now, idle=60.0):
+        # buckets untouched for a minute are full again at any sane rate, dropping them is free
+        stale = [key for key, (_, updated) in self._buckets.items() if now - updated > idle]
+        for key in stale or list(self._buckets)[:len(self._buckets) // 2]:
+            del self._buckets[key]
+
+
+class RedisBackend:
+    """Token buckets shared by every worker and host through a Redis-compatible server.
+
+    `client` is anything with redis-py's eval(script, numkeys, *keys_and_args), so a local
+    stand-in (fakeredis, a test double) can take the server's place.
+    """
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RATE_LIMIT_STORAGE_URL needs the redis package (pip install redis)')
+        return cls(redis.Redis.from_url(url))
+
+    def take(self, key, rate, capacity, now):
+        allowed, tokens = self.client.eval(TOKEN_BUCKET_LUA, 1, self.prefix + key, rate, capacity, now)
+        return bool(int(allowed)), float(tokens)
+
+
+class RateLimiter:
+    """Per-IP and per-route token buckets checked before every request.
+
+    RATE_LIMITS maps route rules to (requests per second, burst), RATE_LIMIT_PER_IP is
+    one more bucket per client over all /api/ routes. A rejected request gets a 429 with
+    Retry-After. When the shared backend is unreachable requests are let through.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.enabled = True
+        self.limits = {}
+        self.per_ip = None
+        self.trusted_proxies = 0
+        self.app = None
+        self.limited = 0
+        self.backend_errors = 0
+
+    def init_app(self, app):
+        """Read the limits and storage from the flask config and register the check"""
+        self._configure(app)
+        app.before_request(self._check)
+        app.extensions['rate_limiter'] = self
+
+    def init_async_app(self, app):
+        """Same limits for the quart app (async_app.py), checked by an async before_request hook"""
+        from quart import request as async_request, jsonify as async_jsonify
+        self._configure(app)
+
+        async def check():
+            return self._check(async_request, async_jsonify)
+
+        app.before_request(check)
+        app.extensions['rate_limiter'] = self
+
+    def _configure(self, app):
+        self.app = app
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        self.limits = dict(app.config.get('RATE_LIMITS', {}))
+        self.per_ip = app.config.get('RATE_LIMIT_PER_IP')
+        self.trusted_proxies = app.config.get('RATE_LIMIT_TRUSTED_PROXIES', 0)
+        storage_url = app.config.get('RATE_LIMIT_STORAGE_URL')
+        if storage_url:
+            self.backend = RedisBackend.from_url(storage_url)
+        else:
+            self.backend = MemoryBackend(app.config.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+    def client_ip(self):
+        """Caller address of the current flask request, see client_address()"""
+        return client_address(request.headers, request.remote_addr, self.trusted_proxies)
+
+    def _take(self, key, limit, now):
+        rate, burst = limit
+        try:
+            allowed, tokens = self.backend.take(key, rate, burst, now)
+        except Exception as e:
+            self.backend_errors += 1
+            self.app.logger.warning('rate limit backend failed', extra={'error': str(e)})
+            return None
+        if allowed:
+            return None
+        return (1 - tokens) / rate  # seconds until the next token
+
+    def _check(self, current=request, make_json=jsonify):
+        if not self.enabled or current.method == 'OPTIONS':
+            return None
+        rule = current.url_rule.rule if current.url_rule else None
+        limit = self.limits.get(rule)
+        if limit is None and not (self.per_ip and current.path.startswith('/api/')):
+            return None
+
+        ip = client_address(current.headers, current.remote_addr, self.trusted_proxies)
+        now = time.time()
+        retry_after = None
+        if limit is not None:
+            retry_after = self._take(f'{rule}:{ip}', limit, now)
+        if retry_after is None and self.per_ip and current.path.startswith('/api/'):
+            retry_after = self._take(f'ip:{ip}', self.per_ip, now)
+        if retry_after is None:
+            return None
+
+        self.limited += 1
+        response = make_json({
+            'success': False,
+            'message': 'Too many requests, please slow down',
+            'error': 'rate limit exceeded'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def stats(self):
+        """Counters for the metrics endpoint"""
+        return {'limited': self.limited, 'backend_errors': self.backend_errors}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,128 @@
+import sys
+import hmac
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request, jsonify
+from sqlalchemy import create_engine, select, update, func, tuple_, text
+from sqlalchemy.exc import SQLAlchemyError
+from models import Manufacturer, Pharmacy
+
+# review queue for pending manufacturer / pharmacy registrations (FDA verification backlog)
+#   pages are keyset-paginated over (status, created_at, id) composite indexes and only
+#   read the columns a reviewer needs; status changes for a whole selection are one
+#   UPDATE ... WHERE id IN (...) AND status IN (allowed from-states).
+
+ENGINE_URL = '--' # same database as the app, removed the url link for privacy
+
+MODELS = {'manufacturers': Manufacturer, 'pharmacies': Pharmacy}
+
+# lean projections for the queue, password hashes and documents never leave the table
+QUEUE_COLUMNS = {
+    'manufacturers': ('id', 'company_name', 'license_number', 'license_authority', 'license_expiry',
+                      'gstin', 'contact_name', 'contact_email', 'contact_phone', 'status', 'created_at'),
+    'pharmacies': ('id', 'pharmacy_name', 'pharmacy_type', 'license_number', 'license_authority',
+                   'license_expiry', 'gstin', 'owner_name', 'contact_name', 'contact_email',
+                   'contact_phone', 'status', 'created_at')
+}
+
+# target status -> statuses a registration may be moved from
+TRANSITIONS = {
+    'approved': ('pending', 'suspended'),
+    'rejected': ('pending',),
+    'pending': ('rejected',),  # reopened
+    'suspended': ('approved',)
+}
+STATUSES = tuple(TRANSITIONS)
+
+# MySQL has no CREATE INDEX IF NOT EXISTS, an existing index is reported and skipped
+CREATE_INDEX_SQL = [
+    text("CREATE INDEX ix_manufacturers_status_created ON manufacturers (status, created_at, id)"),
+    text("CREATE INDEX ix_pharmacies_status_created ON pharmacies (status, created_at, id)")
+]
+
+
+def parse_cursor(cursor):
+    """'<created_at iso>:<id>' from a previous page, raises ValueError when malformed"""
+    created_at, row_id = cursor.rsplit(':', 1)
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+def queue_page(session, kind, status='pending', after=None, limit=100):
+    """One page of registrations in `status`, oldest first; returns (rows as dicts, next cursor)"""
+    model = MODELS[kind]
+    columns = [getattr(model, name) for name in QUEUE_COLUMNS[kind]]
+    query = select(*columns).where(model.status == status)
+    if after is not None:
+        query = query.where(tuple_(model.created_at, model.id) > after)
+    rows = session.execute(query.order_by(model.created_at, model.id).limit(limit)).mappings().all()
+
+    items = []
+    for row in rows:
+        item = dict(row)
+        item['license_expiry'] = row['license_expiry'].strftime('%Y-%m-%d') if row['license_expiry'] else None
+        item['created_at'] = row['created_at'].strftime('%Y-%m-%d %H:%M:%S') if row['created_at'] else None
+        items.append(item)
+    next_cursor = f"{rows[-1]['created_at'].isoformat()}:{rows[-1]['id']}" if rows and len(rows) == limit else None
+    return items, next_cursor
+
+
+def queue_summary(session, kind):
+    """{status: registrations}, answered from the status index"""
+    model = MODELS[kind]
+    return dict(session.execute(select(model.status, func.count()).group_by(model.status)).all())
+
+
+def set_status(session, kind, ids, status):
+    """Move the given registrations to `status` in one UPDATE, returns how many were moved.
+
+    Rows already in `status`, in a state it can't be reached from, or missing are left
+    alone; the caller commits.
+    """
+    model = MODELS[kind]
+    statement = (
+        update(model)
+        .where(model.id.in_(ids), model.status.in_(TRANSITIONS[status]))
+        .values(status=status, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return session.execute(statement).rowcount
+
+
+def review_required(view):
+    """Only lets requests through that carry REVIEW_API_TOKEN as a bearer token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('REVIEW_API_TOKEN')
+        supplied = request.headers.get('Authorization', '')
+        if not token or not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return jsonify({
+                'success': False,
+                'message': 'Review access required'
+            }), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def migrate(engine_url=ENGINE_URL):
+    """Add the (status, created_at, id) indexes the review queue pages over"""
+    print("PharmaLedger - Review Queue Indexes")
+    print("=" * 60)
+
+    engine = create_engine(engine_url, echo=False)
+    try:
+        with engine.begin() as conn:
+            for statement in CREATE_INDEX_SQL:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(statement)
+                    print(f"✓ {statement.text.split(' ON ')[0]}")
+                except SQLAlchemyError as e:
+                    print(f"Skipped index: {e.orig if hasattr(e, 'orig') else e}")
+    except SQLAlchemyError as e:
+        print(f"✗ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,357 @@
+import sys
+import hmac
+import atexit
+import hashlib
+import ipaddress
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError, DBAPIError, InterfaceError, TimeoutError as PoolTimeoutError
+
+# verification scan log behind the cloned-batch alerts
+#   every /api/verify-batch call is appended to an in-memory ring buffer and a background
+#   thread writes the buffer out in multi-row batches, a request never waits on an INSERT.
+#   a sliding window per batch number counts scans and distinct sources (client networks)
+#   so a batch number printed on cloned packs shows up while it is being scanned all over.
+#   on MySQL the table is partitioned by day, old days are dropped whole instead of DELETEd.
+
+ENGINE_URL = '--' # same database as the app, removed the url link for privacy
+PARTITION_DAYS_AHEAD = 7  # daily partitions kept ready in front of today
+RETENTION_DAYS = 90  # partitions older than this are dropped by maintain_partitions()
+BATCH_NUMBER_MAX = 100  # scan_events.batch_number is VARCHAR(100), longer input is cut before buffering
+
+CREATE_SCAN_EVENTS_SQL = text("""
+    CREATE TABLE IF NOT EXISTS scan_events (
+        id BIGINT NOT NULL AUTO_INCREMENT,
+        scanned_at DATETIME NOT NULL,
+        batch_number VARCHAR(100) NOT NULL,
+        found BOOLEAN NOT NULL,
+        source_hash CHAR(16) NOT NULL,
+        PRIMARY KEY (id, scanned_at),
+        INDEX ix_scan_events_batch_scanned (batch_number, scanned_at)
+    )
+    PARTITION BY RANGE COLUMNS (scanned_at) (
+        PARTITION p_future VALUES LESS THAN (MAXVALUE)
+    )
+""")
+
+INSERT_SCAN_SQL = text("""
+    INSERT INTO scan_events (scanned_at, batch_number, found, source_hash)
+    VALUES (:scanned_at, :batch_number, :found, :source_hash)
+""")
+
+PARTITIONS_SQL = text("""
+    SELECT partition_name FROM information_schema.partitions
+    WHERE table_schema = DATABASE() AND table_name = 'scan_events' AND partition_name IS NOT NULL
+""")
+
+
+def _partition_name(day):
+    return f"p{day.strftime('%Y%m%d')}"
+
+
+def maintain_partitions(conn, today=None, days_ahead=PARTITION_DAYS_AHEAD, retention_days=RETENTION_DAYS):
+    """Split daily partitions off p_future up to `days_ahead` and drop the ones past retention (MySQL).
+
+    Partition pYYYYMMDD holds the scans of that day. Returns (added, dropped) partition names.
+    """
+    today = today or datetime.utcnow().date()
+    existing = {row.partition_name for row in conn.execute(PARTITIONS_SQL)}
+    days = [today + timedelta(days=offset) for offset in range(-1, days_ahead + 1)]
+    last = max((name for name in existing if name != 'p_future'), default=None)
+    added = [day for day in days if _partition_name(day) not in existing and (last is None or _partition_name(day) > last)]
+    if added:
+        parts = ', '.join(f"PARTITION {_partition_name(day)} VALUES LESS THAN ('{day + timedelta(days=1)}')"
+                          for day in added)
+        conn.execute(text(f"ALTER TABLE scan_events REORGANIZE PARTITION p_future INTO "
+                          f"({parts}, PARTITION p_future VALUES LESS THAN (MAXVALUE))"))
+
+    cutoff = _partition_name(today - timedelta(days=retention_days))
+    dropped = sorted(name for name in existing if name != 'p_future' and name < cutoff)
+    if dropped:
+        conn.execute(text(f"ALTER TABLE scan_events DROP PARTITION {', '.join(dropped)}"))
+    return [_partition_name(day) for day in added], dropped
+
+
+def _transient(error):
+    """True for failures worth retrying as is: lost connections and pool timeouts, not bad rows"""
+    if isinstance(error, (PoolTimeoutError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def source_of(ip, secret):
+    """Keyed hash of the caller's network (/24 for IPv4, /48 for IPv6), raw addresses are never kept"""
+    try:
+        address = ipaddress.ip_address(ip)
+        prefix = 24 if address.version == 4 else 48
+        network = str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+    except ValueError:
+        network = str(ip)
+    return hmac.new(secret.encode('utf-8'), network.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+
+class _Window:
+    """Scans of one batch number over the last `window_slots` time slots.
+
+    `sources` counts in how many live slots each source appears, so the distinct
+    count is len(sources) and sliding a slot out only touches that slot's own set.
+    """
+    __slots__ = ('slots', 'total', 'sources')
+
+    def __init__(self):
+        self.slots = deque()  # [slot id, scans, set of sources]
+        self.total = 0
+        self.sources = {}
+
+    def add(self, slot, source, oldest, max_sources):
+        while self.slots and self.slots[0][0] < oldest:
+            _, scans, seen = self.slots.popleft()
+            self.total -= scans
+            for gone in seen:
+                if self.sources[gone] == 1:
+                    del self.sources[gone]
+                else:
+                    self.sources[gone] -= 1
+        if not self.slots or self.slots[-1][0] != slot:
+            self.slots.append([slot, 0, set()])
+        current = self.slots[-1]
+        current[1] += 1
+        self.total += 1
+        if source not in current[2] and (source in self.sources or len(self.sources) < max_sources):
+            current[2].add(source)
+            self.sources[source] = self.sources.get(source, 0) + 1
+
+
+class ScanLog:
+    """Buffered scan-event log with sliding-window anomaly flags per batch number.
+
+    record() is O(1): one deque append plus one window update under a lock. The flusher
+    thread writes at most `flush_batch` events per statement, every `flush_interval`
+    seconds or sooner once that many are waiting. When the database falls behind the
+    ring buffer overwrites the oldest unwritten events (counted in `dropped`), the
+    window counts are unaffected. Only lost connections are retried, rows the database
+    refuses are written one by one and the failing ones dropped (counted in `rejected`).
+    """
+
+    def __init__(self, buffer_size=50000, flush_batch=1000, flush_interval=2.0,
+                 window=3600, window_slots=12, max_scans=500, max_sources=100, max_tracked=100000):
+        self.enabled = True
+        self.buffer_size = buffer_size
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self.window = window
+        self.window_slots = window_slots
+        self.max_scans = max_scans
+        self.max_sources = max_sources
+        self.max_tracked = max_tracked
+        self.secret = ''
+        self.app = None
+        self.engine = None
+        self._buffer = deque(maxlen=buffer_size)
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.flush_errors = 0
+        self.anomalies = 0
+        self.rejected = 0
+
+    def init_app(self, app, engine=None):
+        """Read the buffer, window and threshold settings from the app config.
+
+        Events are written through `engine`, by default the flask app's db.engine.
+        """
+        self.app = app
+        self.engine = engine
+        self.enabled = app.config.get('SCAN_LOG_ENABLED', True)
+        self.buffer_size = app.config.get('SCAN_BUFFER_SIZE', self.buffer_size)
+        self.flush_batch = app.config.get('SCAN_FLUSH_BATCH', self.flush_batch)
+        self.flush_interval = app.config.get('SCAN_FLUSH_INTERVAL', self.flush_interval)
+        self.window = app.config.get('SCAN_WINDOW_SECONDS', self.window)
+        self.window_slots = app.config.get('SCAN_WINDOW_SLOTS', self.window_slots)
+        self.max_scans = app.config.get('SCAN_ANOMALY_MAX_SCANS', self.max_scans)
+        self.max_sources = app.config.get('SCAN_ANOMALY_MAX_SOURCES', self.max_sources)
+        self.max_tracked = app.config.get('SCAN_TRACKED_BATCHES', self.max_tracked)
+        self.secret = app.config['SECRET_KEY']
+        self._buffer = deque(maxlen=self.buffer_size)
+        app.extensions['scan_log'] = self
+
+    def record(self, batch_number, found, ip, now=None):
+        """Log one verification, returns the anomaly reasons for its batch number ([] when normal)"""
+        if not self.enabled:
+            return []
+        now = now or time.time()
+        batch_number = batch_number[:BATCH_NUMBER_MAX]
+        source = source_of(ip, self.secret)
+        slot_length = self.window / self.window_slots
+        slot = int(now // slot_length)
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append({
+                'scanned_at': datetime.utcfromtimestamp(now),
+                'batch_number': batch_number,
+                'found': found,
+                'source_hash': source
+            })
+            self.recorded += 1
+            window = self._windows.pop(batch_number, None)
+            if window is None:
+                window = _Window()
+                if len(self._windows) >= self.max_tracked:
+                    del self._windows[next(iter(self._windows))]  # least recently scanned
+            self._windows[batch_number] = window  # re-inserted, dicts keep scan order
+            # sources past 4x the threshold aren't tracked, the batch is flagged long before
+            window.add(slot, source, slot - self.window_slots + 1, self.max_sources * 4)
+            reasons = []
+            if window.total > self.max_scans:
+                reasons.append('scan_rate')
+            if len(window.sources) > self.max_sources:
+                reasons.append('many_sources')
+            if reasons:
+                self.anomalies += 1
+        self._start()
+        if len(self._buffer) >= self.flush_batch:
+            self._wake.set()
+        return reasons
+
+    def activity(self, batch_number):
+        """Scans and distinct sources in the current window, None for an untracked batch number"""
+        with self._lock:
+            window = self._windows.get(batch_number)
+            if window is None:
+                return None
+            return {'scans': window.total, 'sources': len(window.sources)}
+
+    # background writer
+
+    def _start(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            if self._flusher is None:
+                atexit.register(self._drain)
+            self._flusher = threading.Thread(target=self._run, name='scan-log-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while self.flush() >= self.flush_batch:
+                pass  # a backlog goes out in back to back batches
+
+    def _drain(self):
+        while self.flush():
+            pass
+
+    def flush(self):
+        """Write up to `flush_batch` buffered events in one statement, returns how many left the buffer"""
+        events = []
+        with self._lock:
+            while self._buffer and len(events) < self.flush_batch:
+                events.append(self._buffer.popleft())
+        if not events:
+            return 0
+        try:
+            with self._engine().begin() as conn:
+                conn.execute(INSERT_SCAN_SQL, events)
+        except Exception as e:
+            self.flush_errors += 1
+            if _transient(e):
+                self.app.logger.warning('scan log flush failed, retrying later',
+                                        extra={'events': len(events), 'error': str(e)})
+                self._requeue(events)
+                return 0
+            # a row (or the table) the database refuses, retrying the chunk would block the log
+            # for good: write what it takes row by row and drop the rest
+            return self._flush_rows(events, e)
+        self.written += len(events)
+        return len(events)
+
+    def _requeue(self, events):
+        with self._lock:
+            # back in front for the next attempt, newer events fall off if the buffer is full
+            room = self._buffer.maxlen - len(self._buffer)
+            self.dropped += max(len(events) - room, 0)
+            self._buffer.extendleft(reversed(events[:room]))
+
+    def _engine(self):
+        if self.engine is None:
+            from models import db
+            with self.app.app_context():
+                self.engine = db.engine
+        return self.engine
+
+    def _flush_rows(self, events, error):
+        written = rejected = 0
+        try:
+            with self._engine().connect() as conn:
+                for event in events:
+                    try:
+                        with conn.begin():
+                            conn.execute(INSERT_SCAN_SQL, event)
+                        written += 1
+                    except SQLAlchemyError as row_error:
+                        if _transient(row_error):
+                            raise
+                        rejected += 1
+                        error = row_error
+        except Exception as e:
+            pending = events[written + rejected:]
+            if not _transient(e):
+                rejected += len(pending)
+                error = e
+            else:
+                self._requeue(pending)
+        self.written += written
+        self.rejected += rejected
+        if rejected:
+            self.app.logger.error('scan log rows rejected', extra={'events': len(events), 'rejected': rejected,
+                                                                  'error': str(error)})
+        return written + rejected
+
+    def stats(self):
+        """Counters for the stats and metrics endpoints"""
+        return {
+            'recorded': self.recorded,
+            'written': self.written,
+            'buffered': len(self._buffer),
+            'dropped': self.dropped,
+            'flush_errors': self.flush_errors,
+            'rejected': self.rejected,
+            'tracked_batches': len(self._windows),
+            'anomalies': self.anomalies
+        }
+
+
+def migrate(engine_url=ENGINE_URL):
+    """Create the partitioned scan_events table and its upcoming daily partitions, run daily from cron"""
+    print("PharmaLedger - Scan Events Partitions")
+    print("=" * 60)
+
+    engine = create_engine(engine_url, echo=False)
+    try:
+        with engine.begin() as conn:
+            conn.execute(CREATE_SCAN_EVENTS_SQL)
+            added, dropped = maintain_partitions(conn)
+        print(f"✓ Partitions added: {len(added)}, dropped: {len(dropped)}.")
+    except SQLAlchemyError as e:
+        print(f"✗ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        engine.dispose()
+
+
+scan_log = ScanLog()
+
+if __name__ == '__main__':
+    migrate()
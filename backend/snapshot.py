@@ -0,0 +1,467 @@
+import os
+import json
+import hmac
+import mmap
+import time
+import struct
+import hashlib
+import threading
+from datetime import date
+from sqlalchemy import text
+
+# catalogue snapshots for offline verification, wrt the backend folder
+#   the loader writes a full snapshot of the verifiable catalogue after every load plus
+#   deltas from the last few snapshots to it. clients keep the newest file they have,
+#   verify locally with a binary search over the memory-mapped file and only download
+#   the delta from their snapshot id on the next sync.
+#   with the ledger on, a signed list of every sealed block root is published next to
+#   them, so a verify-batch ?proof=1 answer can be checked against something the server
+#   can't rewrite afterwards.
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots')
+MANIFEST_FILE = 'manifest.json'
+
+# file layout, all integers little-endian:
+#   header      HEADER below, offsets are from the start of the file
+#   strings     (string count + 1) u32 offsets into the blob, then the utf-8 blob
+#   index       one u32 per block, offset of the block from the data section start
+#   data        records sorted by batch number bytes, BLOCK_SIZE per block; each one is
+#               varint shared prefix, varint suffix length, suffix, u8 kind, then for an
+#               upsert varint medicine string, varint pharmacy string + 1 (0 = none),
+#               varint manufacture / expiry date as days since 1970-01-01.
+#               the first record of a block shares nothing, so blocks decode on their own
+#   signature   u16 length then the signature over every byte before it
+MAGIC = b'PLCATLG\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sBBHIIIIIIIIIIB11x')  # 64 bytes, fields as unpacked by SnapshotReader
+KIND_FULL, KIND_DELTA = 0, 1
+RECORD_UPSERT, RECORD_DELETE = 0, 1
+SIG_NONE, SIG_HMAC_SHA256, SIG_ED25519 = 0, 1, 2
+SIG_NAMES = {SIG_NONE: 'none', SIG_HMAC_SHA256: 'hmac-sha256', SIG_ED25519: 'ed25519'}
+SIG_IDS = {name: algorithm for algorithm, name in SIG_NAMES.items()}
+BLOCK_SIZE = 64  # records per restart point
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# one row per batch number, the lowest medicine_id like verify-batch's lookup
+CATALOGUE_SQL = text("""
+    SELECT m.batch_number, m.medicine_name, m.manufacture_date, m.expiry_date, m.pharmacy_name
+    FROM medicine_batches m
+    JOIN (SELECT MIN(medicine_id) AS medicine_id FROM medicine_batches GROUP BY batch_number) f
+      ON f.medicine_id = m.medicine_id
+""")
+
+LEDGER_ROOTS_SQL = text("SELECT id, merkle_root, block_hash FROM ledger_blocks ORDER BY id")
+
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _date(value):
+    # raw text() rows carry strings on sqlite
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _days(value):
+    return _date(value).toordinal() - EPOCH_ORDINAL
+
+
+class Signer:
+    """Signs snapshot files with Ed25519 (needs the cryptography package) or HMAC-SHA256.
+
+    Ed25519 is what offline clients should pin, they only hold the public key. HMAC
+    suits clients provisioned with the shared key, anyone holding it can also sign.
+    """
+
+    def __init__(self, algorithm=SIG_NONE, key=None):
+        self.algorithm = algorithm
+        self.key = key
+
+    @classmethod
+    def from_settings(cls, private_key_file=None, hmac_key=None, allow_unsigned=False):
+        """Signer for the configured key, raises RuntimeError when there is none unless allow_unsigned"""
+        if private_key_file:
+            try:
+                from cryptography.hazmat.primitives.serialization import load_pem_private_key
+            except ImportError:
+                raise RuntimeError('SNAPSHOT_SIGNING_KEY needs the cryptography package (pip install cryptography)')
+            with open(private_key_file, 'rb') as file:
+                return cls(SIG_ED25519, load_pem_private_key(file.read(), password=None))
+        if hmac_key:
+            return cls(SIG_HMAC_SHA256, hmac_key.encode('utf-8'))
+        if not allow_unsigned:
+            raise RuntimeError('no SNAPSHOT_SIGNING_KEY or SNAPSHOT_HMAC_KEY set, offline clients could not '
+                               'tell these snapshots from forged ones (SNAPSHOT_ALLOW_UNSIGNED=1 publishes them anyway)')
+        return cls()
+
+    def sign(self, payload):
+        if self.algorithm == SIG_ED25519:
+            return self.key.sign(payload)
+        if self.algorithm == SIG_HMAC_SHA256:
+            return hmac.new(self.key, payload, hashlib.sha256).digest()
+        return b''
+
+    def public_key(self):
+        """Hex of the raw Ed25519 public key, None for the other algorithms"""
+        if self.algorithm != SIG_ED25519:
+            return None
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+        return self.key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw).hex()
+
+
+def verify_signature(payload, signature, algorithm, key):
+    """Check a snapshot signature, `key` is the HMAC key or the raw Ed25519 public key bytes"""
+    if algorithm == SIG_HMAC_SHA256:
+        return hmac.compare_digest(hmac.new(key, payload, hashlib.sha256).digest(), signature)
+    if algorithm == SIG_ED25519:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+        try:
+            Ed25519PublicKey.from_public_bytes(key).verify(signature, payload)
+            return True
+        except InvalidSignature:
+            return False
+    return False
+
+
+def ledger_roots_payload(snapshot_id, blocks):
+    """The signed bytes of a ledger roots file: canonical json of the snapshot id and the [id, root, hash] list"""
+    return json.dumps({'snapshot_id': snapshot_id, 'blocks': blocks}, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def verify_ledger_roots(document, key):
+    """Check a parsed ledger roots file, `key` as in verify_signature()"""
+    return verify_signature(ledger_roots_payload(document['snapshot_id'], document['blocks']),
+                            bytes.fromhex(document['signature']), SIG_IDS.get(document['algorithm']), key)
+
+
+def encode(records, kind, snapshot_id, base_id=0, signer=None, created_at=None):
+    """Serialize sorted (batch number, kind, medicine, pharmacy, manufacture date, expiry date) tuples"""
+    signer = signer or Signer()
+    strings = {}
+    string_list = []
+
+    def string_id(value):
+        found = strings.get(value)
+        if found is None:
+            found = strings[value] = len(string_list)
+            string_list.append(value)
+        return found
+
+    data = bytearray()
+    index = []
+    previous = b''
+    for position, (batch_number, record_kind, medicine, pharmacy, manufactured, expires) in enumerate(records):
+        key = batch_number.encode('utf-8')
+        if position % BLOCK_SIZE == 0:
+            index.append(len(data))
+            shared = 0
+        else:
+            shared = len(os.path.commonprefix((previous, key)))
+        _varint(shared, data)
+        _varint(len(key) - shared, data)
+        data += key[shared:]
+        data.append(record_kind)
+        if record_kind == RECORD_UPSERT:
+            _varint(string_id(medicine), data)
+            _varint(0 if pharmacy is None else string_id(pharmacy) + 1, data)
+            _varint(_days(manufactured), data)
+            _varint(_days(expires), data)
+        previous = key
+    record_count = len(records)
+
+    blob = bytearray()
+    offsets = [0]
+    for value in string_list:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    strings_offset = HEADER.size
+    index_offset = strings_offset + 4 * len(offsets) + len(blob)
+    data_offset = index_offset + 4 * len(index)
+    data_end = data_offset + len(data)
+
+    body = bytearray(HEADER.pack(
+        MAGIC, FORMAT_VERSION, kind, BLOCK_SIZE, snapshot_id, base_id, int(created_at or time.time()),
+        record_count, len(index), len(string_list), strings_offset, index_offset, data_offset, data_end,
+        signer.algorithm))
+    body += struct.pack(f'<{len(offsets)}I', *offsets) + blob
+    body += struct.pack(f'<{len(index)}I', *index) + data
+    signature = signer.sign(bytes(body))
+    body += struct.pack('<H', len(signature)) + signature
+    return bytes(body)
+
+
+class SnapshotReader:
+    """Read-only view of a snapshot or delta file, memory-mapped unless handed bytes.
+
+    lookup() binary searches the block index and decodes one block, nothing else is
+    read; iterating decodes every record in order.
+    """
+
+    def __init__(self, source):
+        self._map = None
+        if isinstance(source, (bytes, bytearray)):
+            self.buf = memoryview(bytes(source))
+        else:
+            with open(source, 'rb') as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buf = memoryview(self._map)
+        (magic, version, self.kind, self.block_size, self.snapshot_id, self.base_id, self.created_at,
+         self.record_count, self.block_count, self.string_count, strings_offset, index_offset,
+         self.data_offset, self.data_end, self.signature_algorithm) = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError('not a catalogue snapshot of a supported version')
+        self._string_offsets = struct.unpack_from(f'<{self.string_count + 1}I', self.buf, strings_offset)
+        self._blob_offset = strings_offset + 4 * (self.string_count + 1)
+        self._index = struct.unpack_from(f'<{self.block_count}I', self.buf, index_offset)
+        (length,) = struct.unpack_from('<H', self.buf, self.data_end)
+        self.signature = bytes(self.buf[self.data_end + 2:self.data_end + 2 + length])
+
+    def close(self):
+        self.buf.release()
+        if self._map is not None:
+            self._map.close()
+
+    def verify(self, key):
+        """True when the signature matches, `key` as in verify_signature()"""
+        return verify_signature(bytes(self.buf[:self.data_end]), self.signature, self.signature_algorithm, key)
+
+    def _string(self, string_id):
+        start = self._blob_offset + self._string_offsets[string_id]
+        end = self._blob_offset + self._string_offsets[string_id + 1]
+        return bytes(self.buf[start:end]).decode('utf-8')
+
+    def _decode(self, pos, previous):
+        buf = self.buf
+        shared, pos = _read_varint(buf, pos)
+        length, pos = _read_varint(buf, pos)
+        key = previous[:shared] + bytes(buf[pos:pos + length])
+        pos += length
+        record_kind = buf[pos]
+        pos += 1
+        if record_kind != RECORD_UPSERT:
+            return key, (key.decode('utf-8'), record_kind, None, None, None, None), pos
+        medicine, pos = _read_varint(buf, pos)
+        pharmacy, pos = _read_varint(buf, pos)
+        manufactured, pos = _read_varint(buf, pos)
+        expires, pos = _read_varint(buf, pos)
+        return key, (key.decode('utf-8'), record_kind, self._string(medicine),
+                     self._string(pharmacy - 1) if pharmacy else None,
+                     date.fromordinal(manufactured + EPOCH_ORDINAL),
+                     date.fromordinal(expires + EPOCH_ORDINAL)), pos
+
+    def _block_key(self, block):
+        pos = self.data_offset + self._index[block]
+        _, pos = _read_varint(self.buf, pos)
+        length, pos = _read_varint(self.buf, pos)
+        return bytes(self.buf[pos:pos + length])
+
+    def lookup(self, batch_number):
+        """The record tuple for `batch_number`, None when the file doesn't hold it"""
+        key = batch_number.encode('utf-8')
+        low, high = 0, self.block_count - 1
+        block = -1
+        while low <= high:  # last block whose first key is <= key
+            middle = (low + high) // 2
+            if self._block_key(middle) <= key:
+                block = middle
+                low = middle + 1
+            else:
+                high = middle - 1
+        if block < 0:
+            return None
+        pos = self.data_offset + self._index[block]
+        previous = b''
+        for _ in range(min(self.block_size, self.record_count - block * self.block_size)):
+            previous, record, pos = self._decode(pos, previous)
+            if previous == key:
+                return record
+            if previous > key:
+                return None
+        return None
+
+    def __iter__(self):
+        pos = self.data_offset
+        previous = b''
+        for _ in range(self.record_count):
+            previous, record, pos = self._decode(pos, previous)
+            yield record
+
+
+def read_catalogue(conn):
+    """Every verifiable batch as an upsert tuple, sorted by batch number bytes"""
+    rows = conn.execution_options(stream_results=True).execute(CATALOGUE_SQL)
+    records = [(row.batch_number, RECORD_UPSERT, row.medicine_name, row.pharmacy_name,
+                _date(row.manufacture_date), _date(row.expiry_date)) for row in rows]
+    records.sort(key=lambda record: record[0].encode('utf-8'))
+    return records
+
+
+def diff(old, new):
+    """Delta records turning the sorted `old` records into the sorted `new` ones"""
+    changes = []
+    old_iter, new_iter = iter(old), iter(new)
+    old_record, new_record = next(old_iter, None), next(new_iter, None)
+    while old_record is not None or new_record is not None:
+        old_key = old_record[0].encode('utf-8') if old_record else None
+        new_key = new_record[0].encode('utf-8') if new_record else None
+        if new_key is None or (old_key is not None and old_key < new_key):
+            changes.append((old_record[0], RECORD_DELETE, None, None, None, None))
+            old_record = next(old_iter, None)
+        elif old_key is None or new_key < old_key:
+            changes.append(new_record)
+            new_record = next(new_iter, None)
+        else:
+            if tuple(old_record[2:]) != tuple(new_record[2:]):
+                changes.append(new_record)
+            old_record, new_record = next(old_iter, None), next(new_iter, None)
+    return changes
+
+
+def _write(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(payload)
+    os.replace(tmp_path, path)  # atomic swap, a reader never sees half a file
+    return {'file': os.path.basename(path), 'size': len(payload), 'sha256': hashlib.sha256(payload).hexdigest()}
+
+
+def read_manifest(directory=DEFAULT_SNAPSHOT_DIR):
+    """The snapshot manifest, None before the first snapshot was written"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def build_snapshot(conn, directory=DEFAULT_SNAPSHOT_DIR, signer=None, keep=5, ledger=False):
+    """
+    Write the next full snapshot plus a delta from each of the `keep` - 1 previous ones,
+    and with `ledger` the signed roots of every sealed ledger block, then swap the manifest
+    in. Older snapshots, deltas and roots files are deleted. Returns the manifest.
+    """
+    os.makedirs(directory, exist_ok=True)
+    signer = signer or Signer()
+    manifest = read_manifest(directory) or {'latest': 0, 'snapshots': []}
+    snapshot_id = manifest['latest'] + 1
+    created_at = int(time.time())
+    records = read_catalogue(conn)
+
+    entry = _write(os.path.join(directory, f'catalogue-{snapshot_id:06d}.plc'),
+                   encode(records, KIND_FULL, snapshot_id, signer=signer, created_at=created_at))
+    entry.update({'id': snapshot_id, 'records': len(records), 'created_at': created_at})
+
+    kept = manifest['snapshots'][-(keep - 1):] if keep > 1 else []
+    deltas = {}
+    for previous in kept:
+        path = os.path.join(directory, previous['file'])
+        if not os.path.exists(path):
+            continue
+        reader = SnapshotReader(path)
+        try:
+            changes = diff(reader, records)
+        finally:
+            reader.close()
+        delta = _write(os.path.join(directory, f"delta-{previous['id']:06d}-{snapshot_id:06d}.plc"),
+                       encode(changes, KIND_DELTA, snapshot_id, previous['id'], signer, created_at))
+        delta['records'] = len(changes)
+        deltas[str(previous['id'])] = delta
+
+    roots = None
+    if ledger:
+        blocks = [[row.id, row.merkle_root, row.block_hash] for row in conn.execute(LEDGER_ROOTS_SQL)]
+        document = {'snapshot_id': snapshot_id, 'algorithm': SIG_NAMES[signer.algorithm], 'blocks': blocks,
+                    'signature': signer.sign(ledger_roots_payload(snapshot_id, blocks)).hex()}
+        roots = _write(os.path.join(directory, f'ledger-{snapshot_id:06d}.json'),
+                       json.dumps(document, separators=(',', ':')).encode('utf-8'))
+        # the head block hash chains every earlier root, clients can pin it between syncs
+        roots.update({'blocks': len(blocks), 'head': blocks[-1] if blocks else None})
+
+    new_manifest = {
+        'latest': snapshot_id,
+        'format': FORMAT_VERSION,
+        'signature': SIG_NAMES[signer.algorithm],
+        'public_key': signer.public_key(),
+        'snapshots': kept + [entry],
+        'deltas': deltas,
+        'ledger': roots
+    }
+    tmp_path = os.path.join(directory, f'{MANIFEST_FILE}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(new_manifest, file, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+    live = {item['file'] for item in new_manifest['snapshots']} | {item['file'] for item in deltas.values()}
+    if roots:
+        live.add(roots['file'])
+    for name in os.listdir(directory):
+        if (name.endswith('.plc') or name.startswith('ledger-')) and name not in live:
+            os.remove(os.path.join(directory, name))
+    return new_manifest
+
+
+class SnapshotStore:
+    """The flask side: which snapshot / delta file answers a sync, from the loader's manifest"""
+
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR):
+        self.directory = directory
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._manifest = None
+
+    def init_app(self, app):
+        """Read the snapshot folder from the flask config"""
+        self.enabled = app.config.get('SNAPSHOT_ENABLED', True)
+        self.directory = app.config.get('SNAPSHOT_DIR', self.directory)
+        app.extensions['catalogue_snapshots'] = self
+
+    def manifest(self):
+        """Current manifest, re-read only when the loader replaced it"""
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST_FILE)).st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                self._manifest = read_manifest(self.directory)
+                self._mtime = mtime
+            return self._manifest
+
+    def path(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def for_sync(self, since=None):
+        """(kind, manifest entry) a client holding snapshot `since` should fetch, None before any snapshot.
+
+        kind is 'current' when it is up to date, 'delta' when a delta from its snapshot is
+        kept and 'full' otherwise.
+        """
+        manifest = self.manifest()
+        if not manifest or not manifest['snapshots']:
+            return None
+        latest = manifest['snapshots'][-1]
+        if since == latest['id']:
+            return 'current', latest
+        delta = manifest['deltas'].get(str(since)) if since is not None else None
+        if delta:
+            return 'delta', delta
+        return 'full', latest
+
+
+catalogue_snapshots = SnapshotStore()
@@ -0,0 +1,256 @@
+import bisect
+import threading
+from collections import Counter, defaultdict
+from sqlalchemy import text
+from data_version import VersionWatcher
+
+# characters blister-pack prints and OCR mix up, each folds onto one canonical character
+OCR_CONFUSIONS = {'O': '0', 'Q': '0', 'D': '0', 'I': '1', 'L': '1', 'S': '5', 'B': '8', 'Z': '2', 'G': '6'}
+CONFUSION_COST = 0.25  # substituting a look-alike, any other edit costs 1
+GRAM = 3
+
+_CANONICAL = str.maketrans(OCR_CONFUSIONS)
+
+
+def canonical(batch_number):
+    return batch_number.translate(_CANONICAL)
+
+
+def grams(value):
+    padded = f'^{value}$'
+    return {padded[i:i + GRAM] for i in range(max(len(padded) - GRAM + 1, 1))}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance where look-alike substitutions cost CONFUSION_COST, None past `limit`.
+
+    Only the diagonal band of width 2 * limit + 1 is filled, cells outside it can't
+    be within the limit anyway.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    band = int(limit)
+    folded_a, folded_b = canonical(a), canonical(b)
+    outside = limit + 1
+    previous = [float(j) if j <= band else outside for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [float(i) if i <= band else outside] + [outside] * len(b)
+        char_a, fold_a = a[i - 1], folded_a[i - 1]
+        for j in range(max(1, i - band), min(len(b), i + band) + 1):
+            if char_a == b[j - 1]:
+                substitute = 0.0
+            elif fold_a == folded_b[j - 1]:
+                substitute = CONFUSION_COST
+            else:
+                substitute = 1.0
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + substitute)
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class _Index:
+    """Batch numbers with a trigram posting list over their canonical form and a sorted copy for prefixes"""
+
+    def __init__(self):
+        self.numbers = []
+        self.known = set()
+        self.postings = defaultdict(list)
+        self.by_canonical = defaultdict(list)
+        self.sorted_numbers = []
+
+    def add(self, batch_numbers):
+        return self.extend(*self.prepare(batch_numbers))
+
+    def prepare(self, batch_numbers):
+        """New batch numbers with their trigrams and the merged sorted copy, without changing the index"""
+        fresh = []
+        for batch_number in dict.fromkeys(batch_numbers):
+            if batch_number not in self.known:
+                folded = canonical(batch_number)
+                fresh.append((batch_number, folded, grams(folded)))
+        # sorted_numbers is already in order, so timsort only merges the new run in
+        sorted_numbers = sorted(self.sorted_numbers + [entry[0] for entry in fresh]) if fresh else self.sorted_numbers
+        return fresh, sorted_numbers
+
+    def extend(self, fresh, sorted_numbers):
+        """Add what prepare() returned, only appends and one list swap"""
+        for batch_number, folded, folded_grams in fresh:
+            self.known.add(batch_number)
+            item = len(self.numbers)
+            self.numbers.append(batch_number)
+            self.by_canonical[folded].append(item)
+            for gram in folded_grams:
+                self.postings[gram].append(item)
+        self.sorted_numbers = sorted_numbers
+        return len(fresh)
+
+
+class SuggestionIndex:
+    """In-memory near-match index over every batch number, for mistyped or misread scans.
+
+    Built from the database on first use. After a loader run (data version bump) only the
+    batch numbers written since the last build are added, a full rebuild only happens when
+    batch numbers disappeared (e.g. a truncating full load changed the set). Both run on
+    a background thread while searches keep using the current index, so searches never
+    touch the database. Until the first build finishes `warming` is True and searches
+    return nothing.
+    """
+
+    def __init__(self, max_distance=2, probe_grams=4, max_candidates=12, watcher=None):
+        self.max_distance = max_distance
+        self.probe_grams = probe_grams
+        self.max_candidates = max_candidates
+        self.watcher = watcher
+        self.enabled = True
+        self.app = None
+        self._index = None
+        self._version = None
+        self._loaded_through = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._builder = None
+        self.engine = None
+        self.builds = 0
+        self.incremental_updates = 0
+
+    def init_app(self, app, engine=None):
+        """Read the index settings from the app config, the index is read through `engine` (default db.engine)"""
+        self.app = app
+        self.engine = engine
+        self.enabled = app.config.get('SUGGEST_ENABLED', True)
+        self.max_distance = app.config.get('SUGGEST_MAX_DISTANCE', self.max_distance)
+        self.probe_grams = app.config.get('SUGGEST_PROBE_GRAMS', self.probe_grams)
+        self.max_candidates = app.config.get('SUGGEST_CANDIDATES', self.max_candidates)
+        self.watcher = VersionWatcher(
+            app.config.get('DATA_VERSION_FILE'),
+            app.config.get('DATA_VERSION_POLL_INTERVAL', 1.0)
+        )
+        app.extensions['batch_suggestions'] = self
+
+    def _refresh(self):
+        version = self.watcher.current() if self.watcher else None
+        if self._index is not None and version == self._version:
+            return
+        # one background thread brings the index up to date, requests keep searching the current one
+        if not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            if self._builder is not None and self._builder.is_alive():
+                return
+            self._builder = threading.Thread(target=self._update, args=(version,),
+                                             name='suggestion-index', daemon=True)
+            self._builder.start()
+        finally:
+            self._build_lock.release()
+
+    def _engine(self):
+        if self.engine is None:
+            from models import db
+            with self.app.app_context():
+                self.engine = db.engine
+        return self.engine
+
+    def _update(self, version):
+        try:
+            with self._engine().connect() as conn:
+                if self._index is None or not self._apply_delta(conn):
+                    self._rebuild(conn)
+            self._version = version
+        except Exception:
+            # the version stays behind, so the next search retries
+            self.app.logger.exception('suggestion index refresh failed')
+
+    def _rebuild(self, conn):
+        index = _Index()
+        rows = conn.execution_options(stream_results=True).execute(
+            text("SELECT DISTINCT batch_number FROM medicine_batches"))
+        index.add(batch_number for (batch_number,) in rows)
+        self._loaded_through = conn.execute(text("SELECT MAX(date_uploaded) FROM medicine_batches")).scalar()
+        with self._lock:
+            self._index = index
+        self.builds += 1
+
+    def _apply_delta(self, conn):
+        """Add batch numbers written since the last build, False when a full rebuild is needed"""
+        total = conn.execute(text("SELECT COUNT(DISTINCT batch_number) FROM medicine_batches")).scalar() or 0
+        loaded_through = conn.execute(text("SELECT MAX(date_uploaded) FROM medicine_batches")).scalar()
+        if self._loaded_through is None or loaded_through is None:
+            return False
+        rows = conn.execute(text("SELECT DISTINCT batch_number FROM medicine_batches WHERE date_uploaded > :since"),
+                            {'since': self._loaded_through})
+        # only this thread changes the index, so the delta is read and prepared without the
+        # lock and searches are held up just for the appends
+        fresh, sorted_numbers = self._index.prepare(batch_number for (batch_number,) in rows)
+        if len(self._index.numbers) + len(fresh) != total:
+            return False  # some batch numbers are gone
+        with self._lock:
+            self._index.extend(fresh, sorted_numbers)
+        self._loaded_through = loaded_through
+        self.incremental_updates += 1
+        return True
+
+    @property
+    def warming(self):
+        """True while the first build is still running, an empty result then says nothing"""
+        return self.enabled and self._index is None
+
+    def suggest(self, query, limit=5):
+        """Ranked near-matches for `query`: [{'batch_number', 'distance', 'match'}], best first"""
+        query = (query or '').strip().upper()
+        if not self.enabled or not query:
+            return []
+        self._refresh()
+        with self._lock:
+            index = self._index
+            if index is None:
+                return []
+            scored = {}
+            folded = canonical(query)
+            for item in index.by_canonical.get(folded, ()):
+                batch_number = index.numbers[item]
+                # only look-alike substitutions apart, ranked first however many there are
+                scored[batch_number] = (edit_distance(query, batch_number, len(query)),
+                                        'exact' if batch_number == query else 'lookalike')
+
+            # fuzzy candidates come from the query's rarest trigrams only, grams shared by
+            # whole runs of batch numbers (common prefixes / year suffixes) are never scanned,
+            # which keeps the work per query bounded whatever the index size
+            query_grams = sorted(grams(folded), key=lambda gram: len(index.postings.get(gram, ())))
+            overlap = Counter()
+            for gram in query_grams[:self.probe_grams]:
+                overlap.update(index.postings.get(gram, ()))
+            for item, _ in overlap.most_common(self.max_candidates):
+                batch_number = index.numbers[item]
+                if batch_number in scored:
+                    continue
+                distance = edit_distance(query, batch_number, self.max_distance)
+                if distance is not None:
+                    scored[batch_number] = (distance, 'fuzzy')
+
+            if len(query) >= GRAM:
+                start = bisect.bisect_left(index.sorted_numbers, query)
+                for batch_number in index.sorted_numbers[start:start + limit]:
+                    if not batch_number.startswith(query):
+                        break
+                    scored.setdefault(batch_number, (float(len(batch_number) - len(query)), 'prefix'))
+
+        ranked = sorted(scored.items(), key=lambda entry: (entry[1][0], entry[1][1] == 'prefix', entry[0]))
+        return [{'batch_number': batch_number, 'distance': round(distance, 2), 'match': match}
+                for batch_number, (distance, match) in ranked[:limit]]
+
+    def stats(self):
+        """Counters for the stats endpoint"""
+        index = self._index
+        return {
+            'loaded': index is not None,
+            'batch_numbers': len(index.numbers) if index else 0,
+            'grams': len(index.postings) if index else 0,
+            'refreshing': self._builder is not None and self._builder.is_alive(),
+            'builds': self.builds,
+            'incremental_updates': self.incremental_updates
+        }
+
+
+batch_suggestions = SuggestionIndex()
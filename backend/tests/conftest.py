@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the backend modules import each other by top-level name (python app.py from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,105 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import ledger
+from models import db
+
+
+def unit(medicine_id, batch_number='HXG1', expiry=date(2027, 1, 1), pharmacy='P1'):
+    return {'medicine_id': medicine_id, 'batch_number': batch_number, 'medicine_name': 'Paracetamol',
+            'manufacture_date': date(2025, 1, 1), 'expiry_date': expiry, 'pharmacy_name': pharmacy,
+            'date_uploaded': None}
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        yield connection
+    engine.dispose()
+
+
+def insert(conn, *rows):
+    conn.execute(text("""
+        INSERT INTO medicine_batches (medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name)
+        VALUES (:medicine_id, :batch_number, :medicine_name, :manufacture_date, :expiry_date, :pharmacy_name)
+    """), list(rows))
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 8, 33])
+def test_every_leaf_proves_against_the_root(size):
+    hashes = [ledger.sha256(str(i)) for i in range(size)]
+    root = ledger.merkle_root(hashes)
+    for index, value in enumerate(hashes):
+        assert ledger.verify_proof(value, ledger.merkle_proof(hashes, index), root)
+
+
+def test_proof_positions_match_the_stored_levels():
+    hashes = [ledger.sha256(str(i)) for i in range(11)]
+    levels = ledger.merkle_levels(hashes)
+    for index in range(len(hashes)):
+        proof = [{'hash': levels[level][position], 'side': side}
+                 for level, position, side in ledger.proof_positions(len(hashes), index)]
+        assert proof == ledger.merkle_proof(hashes, index)
+
+
+def test_tampered_entry_fails():
+    hashes = [ledger.sha256(str(i)) for i in range(5)]
+    proof = ledger.merkle_proof(hashes, 2)
+    assert not ledger.verify_proof(ledger.sha256('forged'), proof, ledger.merkle_root(hashes))
+
+
+def test_sync_only_appends_changes_and_tombstones(conn):
+    insert(conn, unit(1), unit(2))
+    assert ledger.sync_ledger(conn) == 2
+    assert ledger.sync_ledger(conn) == 0
+
+    conn.execute(text("UPDATE medicine_batches SET expiry_date = '2028-01-01' WHERE medicine_id = 1"))
+    conn.execute(text("DELETE FROM medicine_batches WHERE medicine_id = 2"))
+    assert ledger.sync_ledger(conn, medicine_ids={1, 2}) == 2
+    tombstone = conn.execute(text("SELECT record_hash FROM ledger_heads WHERE medicine_id = 2")).scalar()
+    assert tombstone == ledger.record_hash(None)
+
+    chain = conn.execute(text("SELECT prev_hash, record_hash, entry_hash FROM ledger_entries ORDER BY seq")).all()
+    previous = ledger.GENESIS_HASH
+    for prev_hash, rec_hash, entry in chain:
+        assert prev_hash == previous and entry == ledger.entry_hash(prev_hash, rec_hash)
+        previous = entry
+
+
+def test_blocks_chain_and_store_their_levels(conn):
+    insert(conn, *[unit(i, f'HXG{i}') for i in range(1, 6)])
+    ledger.sync_ledger(conn)
+    assert ledger.seal_blocks(conn, block_size=2) == 3
+    blocks = conn.execute(text("SELECT merkle_root, prev_block_hash, block_hash FROM ledger_blocks ORDER BY id")).all()
+    previous = ledger.GENESIS_HASH
+    for root, prev_block, block_hash in blocks:
+        assert prev_block == previous and block_hash == ledger.sha256(prev_block + root)
+        previous = block_hash
+    assert ledger.backfill_nodes(conn) == 0
+
+
+def test_inclusion_proof_covers_the_returned_record(conn):
+    insert(conn, unit(1), unit(2, pharmacy='P2'))
+    ledger.sync_ledger(conn)
+    ledger.seal_blocks(conn)
+
+    proof = ledger.inclusion_proof(conn, unit(1))
+    assert proof['medicineId'] == 1
+    assert proof['recordHash'] == ledger.record_hash(unit(1))
+    assert ledger.verify_proof(proof['entryHash'], proof['proof'], proof['merkleRoot'])
+
+    # a catalogue record carries no medicine_id, it is the batch's first unit
+    catalogue_record = dict(unit(1), medicine_id=None)
+    assert ledger.inclusion_proof(conn, catalogue_record)['seq'] == proof['seq']
+
+
+def test_no_proof_for_content_that_is_not_sealed(conn):
+    insert(conn, unit(1))
+    ledger.sync_ledger(conn)
+    assert ledger.inclusion_proof(conn, unit(1)) is None  # appended, not sealed
+    ledger.seal_blocks(conn)
+    assert ledger.inclusion_proof(conn, unit(1, expiry=date(2030, 1, 1))) is None  # not what was sealed
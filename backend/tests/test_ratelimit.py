@@ -0,0 +1,58 @@
+import pytest
+
+from ratelimit import MemoryBackend, client_address
+
+
+def test_burst_up_to_capacity_then_limited():
+    backend = MemoryBackend()
+    results = [backend.take('ip', 1.0, 3, now=100.0) for _ in range(4)]
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[2][1] == 0
+
+
+def test_refills_with_elapsed_time_up_to_capacity():
+    backend = MemoryBackend()
+    for _ in range(3):
+        backend.take('ip', 2.0, 3, now=0.0)
+    assert backend.take('ip', 2.0, 3, now=0.2) == (False, pytest.approx(0.4))
+    allowed, left = backend.take('ip', 2.0, 3, now=1.0)
+    assert allowed and left == pytest.approx(1.0)
+    allowed, left = backend.take('ip', 2.0, 3, now=100.0)
+    assert allowed and left == pytest.approx(2.0)
+
+
+def test_keys_have_their_own_buckets():
+    backend = MemoryBackend()
+    assert backend.take('a', 1.0, 1, now=0.0)[0]
+    assert not backend.take('a', 1.0, 1, now=0.0)[0]
+    assert backend.take('b', 1.0, 1, now=0.0)[0]
+
+
+def test_eviction_drops_idle_buckets_first():
+    backend = MemoryBackend(max_keys=3)
+    backend.take('idle', 1.0, 1, now=0.0)
+    backend.take('busy-1', 1.0, 1, now=100.0)
+    backend.take('busy-2', 1.0, 1, now=100.0)
+    backend.take('new', 1.0, 1, now=100.0)
+    assert set(backend._buckets) == {'busy-1', 'busy-2', 'new'}
+    assert not backend.take('busy-1', 1.0, 1, now=100.0)[0]  # kept its spent bucket
+
+
+def test_eviction_without_idle_buckets_drops_half():
+    backend = MemoryBackend(max_keys=4)
+    for key in range(4):
+        backend.take(key, 1.0, 1, now=0.0)
+    backend.take('new', 1.0, 1, now=1.0)
+    assert len(backend._buckets) == 3 and 'new' in backend._buckets
+
+
+@pytest.mark.parametrize('forwarded, trusted, expected', [
+    (None, 0, '10.0.0.9'),
+    ('1.2.3.4', 0, '10.0.0.9'),  # not behind a proxy, the header is the client's own
+    ('1.2.3.4', 1, '1.2.3.4'),
+    ('6.6.6.6, 1.2.3.4', 1, '1.2.3.4'),  # only the hop our proxy appended counts
+    ('6.6.6.6, 1.2.3.4, 10.0.0.2', 2, '1.2.3.4'),
+])
+def test_client_address(forwarded, trusted, expected):
+    headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+    assert client_address(headers, '10.0.0.9', trusted) == expected
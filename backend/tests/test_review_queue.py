@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from models import db, Manufacturer
+from review_queue import parse_cursor, queue_page, set_status
+
+START = datetime(2026, 1, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        # pairs share a created_at, so pages have to break ties on id
+        session.execute(insert(Manufacturer), [{
+            'company_name': f'Company {i}', 'license_number': f'LIC{i}', 'contact_name': 'Contact',
+            'contact_phone': f'+9100000{i:04d}', 'contact_email': f'c{i}@example.com', 'password_hash': 'x',
+            'status': 'approved' if i % 5 == 0 else 'pending', 'created_at': START + timedelta(seconds=i // 2)
+        } for i in range(1, 24)])
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def walk(session, limit, status='pending'):
+    pages, after = [], None
+    while True:
+        items, cursor = queue_page(session, 'manufacturers', status, after, limit)
+        pages.append(items)
+        if cursor is None:
+            return pages
+        after = parse_cursor(cursor)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 18, 100])
+def test_pages_cover_the_queue_once_in_order(session, limit):
+    pages = walk(session, limit)
+    ids = [item['id'] for page in pages for item in page]
+    assert ids == [i for i in range(1, 24) if i % 5]
+    assert all(len(page) <= limit for page in pages)
+    assert all(item['status'] == 'pending' and 'password_hash' not in item for page in pages for item in page)
+
+
+def test_cursor_round_trip(session):
+    items, cursor = queue_page(session, 'manufacturers', limit=3)
+    assert parse_cursor(cursor) == (START + timedelta(seconds=1), items[-1]['id'])
+
+
+@pytest.mark.parametrize('cursor', ['', 'nonsense', '2026-01-01T09:00:00:x', 'x:1'])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        parse_cursor(cursor)
+
+
+def test_moved_rows_leave_the_pending_queue(session):
+    first, cursor = queue_page(session, 'manufacturers', limit=4)
+    assert set_status(session, 'manufacturers', [item['id'] for item in first], 'approved') == 4
+    assert set_status(session, 'manufacturers', [first[0]['id']], 'rejected') == 0  # approved can't be rejected
+    session.commit()
+    rest = [item['id'] for page in walk(session, 4) for item in page]
+    assert rest and not set(rest) & {item['id'] for item in first}
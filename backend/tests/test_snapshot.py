@@ -0,0 +1,99 @@
+import json
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import snapshot
+from models import db
+
+
+def record(batch_number, medicine='Paracetamol', pharmacy='P1', expiry=date(2027, 1, 1)):
+    return (batch_number, snapshot.RECORD_UPSERT, medicine, pharmacy, date(2025, 1, 1), expiry)
+
+
+RECORDS = sorted([record(f'HXG{i:04d}', pharmacy=None if i % 7 == 0 else f'P{i % 3}') for i in range(200)],
+                 key=lambda item: item[0].encode('utf-8'))
+
+
+def test_round_trip_and_lookup():
+    reader = snapshot.SnapshotReader(snapshot.encode(RECORDS, snapshot.KIND_FULL, 1))
+    try:
+        assert list(reader) == RECORDS
+        for item in RECORDS[::17]:
+            assert reader.lookup(item[0]) == item
+        assert reader.lookup('HXG0000A') is None
+        assert reader.lookup('AAA') is None
+        assert reader.lookup('ZZZ') is None
+    finally:
+        reader.close()
+
+
+def test_hmac_signature_detects_tampering():
+    signer = snapshot.Signer(snapshot.SIG_HMAC_SHA256, b'key')
+    payload = bytearray(snapshot.encode(RECORDS, snapshot.KIND_FULL, 1, signer=signer))
+    assert snapshot.SnapshotReader(bytes(payload)).verify(b'key')
+    assert not snapshot.SnapshotReader(bytes(payload)).verify(b'other key')
+    payload[snapshot.HEADER.size + 10] ^= 1
+    assert not snapshot.SnapshotReader(bytes(payload)).verify(b'key')
+
+
+def test_unsigned_needs_to_be_allowed():
+    with pytest.raises(RuntimeError):
+        snapshot.Signer.from_settings()
+    assert snapshot.Signer.from_settings(allow_unsigned=True).algorithm == snapshot.SIG_NONE
+
+
+def test_diff_applies_to_the_new_catalogue():
+    old = RECORDS[:150]
+    new = [record(item[0], medicine='Ibuprofen') if i % 10 == 0 else item for i, item in enumerate(RECORDS[20:])]
+    changes = snapshot.diff(old, new)
+    applied = {item[0]: item for item in old}
+    for change in changes:
+        if change[1] == snapshot.RECORD_DELETE:
+            del applied[change[0]]
+        else:
+            applied[change[0]] = change
+    assert sorted(applied.values(), key=lambda item: item[0].encode('utf-8')) == new
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        yield connection
+    engine.dispose()
+
+
+def test_build_snapshot_keeps_deltas_and_signed_ledger_roots(conn, tmp_path):
+    conn.execute(text("""
+        INSERT INTO medicine_batches (medicine_id, batch_number, medicine_name, manufacture_date, expiry_date, pharmacy_name)
+        VALUES (1, 'HXG1', 'Paracetamol', '2025-01-01', '2027-01-01', 'P1'),
+               (2, 'HXG1', 'Paracetamol', '2025-01-01', '2027-06-01', 'P2')
+    """))
+    conn.execute(text("""
+        INSERT INTO ledger_blocks (id, first_seq, last_seq, merkle_root, prev_block_hash, block_hash, created_at)
+        VALUES (1, 1, 2, 'root', 'prev', 'hash', '2025-01-01 00:00:00')
+    """))
+    signer = snapshot.Signer(snapshot.SIG_HMAC_SHA256, b'key')
+    snapshot.build_snapshot(conn, str(tmp_path), signer, keep=2, ledger=True)
+    manifest = snapshot.build_snapshot(conn, str(tmp_path), signer, keep=2, ledger=True)
+
+    assert manifest['latest'] == 2 and list(manifest['deltas']) == ['1']
+    assert manifest['deltas']['1']['records'] == 0
+    reader = snapshot.SnapshotReader(os.path.join(str(tmp_path), manifest['snapshots'][-1]['file']))
+    try:
+        # the batch's first unit, the record verify-batch returns
+        assert reader.lookup('HXG1')[3] == 'P1'
+    finally:
+        reader.close()
+
+    assert manifest['ledger']['head'] == [1, 'root', 'hash']
+    with open(os.path.join(str(tmp_path), manifest['ledger']['file']), 'r', encoding='utf-8') as file:
+        roots = json.load(file)
+    assert snapshot.verify_ledger_roots(roots, b'key')
+    roots['blocks'][0][1] = 'forged'
+    assert not snapshot.verify_ledger_roots(roots, b'key')
+    assert sorted(name for name in os.listdir(str(tmp_path)) if name.startswith('ledger-')) == ['ledger-000002.json']
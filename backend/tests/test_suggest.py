@@ -0,0 +1,92 @@
+import itertools
+import random
+
+import pytest
+
+from suggest import CONFUSION_COST, SuggestionIndex, _Index, canonical, edit_distance
+
+
+def reference_distance(a, b):
+    """Full-table weighted Levenshtein, what the banded version has to agree with"""
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [float(i)] + [0.0] * len(b)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] == b[j - 1]:
+                substitute = 0.0
+            elif canonical(a[i - 1]) == canonical(b[j - 1]):
+                substitute = CONFUSION_COST
+            else:
+                substitute = 1.0
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + substitute)
+        previous = current
+    return previous[-1]
+
+
+@pytest.mark.parametrize('a, b, expected', [
+    ('HXG123', 'HXG123', 0.0),
+    ('HXG123', 'HX6123', CONFUSION_COST),  # G / 6 look alike
+    ('HXG1O3', 'HXG103', CONFUSION_COST),
+    ('HXG123', 'HXG124', 1.0),
+    ('HXG123', 'HXG12', 1.0),
+    ('HXG123', 'XHG123', 2.0),
+])
+def test_known_distances(a, b, expected):
+    assert edit_distance(a, b, 2) == expected
+
+
+def test_none_past_the_limit():
+    assert edit_distance('HXG123', 'ABC999', 2) is None
+    assert edit_distance('HXG123', 'HXG123456', 2) is None  # length gap alone is over
+    assert edit_distance('HXG123', 'HXG124', 0.5) is None
+
+
+def test_banded_matches_the_full_table():
+    rng = random.Random(7)
+    alphabet = 'HXG0OQDI1LS5B8Z26'
+    for _ in range(2000):
+        a = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 9)))
+        b = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 9)))
+        limit = rng.choice([1, 2, 3])
+        expected = reference_distance(a, b)
+        assert edit_distance(a, b, limit) == (expected if expected <= limit else None), (a, b, limit)
+
+
+def test_symmetric():
+    words = ['HXG123', 'HX6I23', 'HXG12', 'BXG1Z3', 'H8G123']
+    for a, b in itertools.permutations(words, 2):
+        assert edit_distance(a, b, 3) == edit_distance(b, a, 3)
+
+
+@pytest.fixture
+def index():
+    suggestions = SuggestionIndex()
+    suggestions._index = _Index()  # no watcher and no version, so it is never refreshed
+    suggestions._index.add(['HXG000012', 'HXG000112', 'HXG001012', 'ABC123', 'ABC1234', 'ZZZ999'])
+    return suggestions
+
+
+def test_ranks_lookalikes_before_fuzzy_and_prefix(index):
+    ranked = index.suggest('hxg0ooo12')
+    assert ranked[0] == {'batch_number': 'HXG000012', 'distance': 0.75, 'match': 'lookalike'}
+    assert [item['match'] for item in index.suggest('ABC123')][:2] == ['exact', 'fuzzy']
+    assert index.suggest('ZZZ999', limit=1) == [{'batch_number': 'ZZZ999', 'distance': 0.0, 'match': 'exact'}]
+
+
+def test_prepared_delta_is_applied_as_one_step(index):
+    fresh, sorted_numbers = index._index.prepare(['ABC123', 'NEW0001', 'NEW0001'])
+    assert [entry[0] for entry in fresh] == ['NEW0001']
+    assert 'NEW0001' not in index._index.known  # nothing changes before extend()
+    assert index._index.extend(fresh, sorted_numbers) == 1
+    assert index._index.sorted_numbers == sorted(index._index.numbers)
+    assert index.suggest('NEW0002')[0]['batch_number'] == 'NEW0001'
+
+
+def test_warming_until_the_first_build():
+    suggestions = SuggestionIndex()
+    assert suggestions.warming
+    suggestions._index = _Index()
+    assert not suggestions.warming
+    suggestions.enabled = False
+    suggestions._index = None
+    assert not suggestions.warming
@@ -0,0 +1,78 @@
+from sqlalchemy import select, exists, or_
+from models import db
+from cache import field_check_cache
+from db_routing import db_router
+
+# check-field name -> model column, the same three columns carry unique constraints
+FIELD_COLUMNS = {
+    'email': 'contact_email',
+    'phone': 'contact_phone',
+    'license': 'license_number'
+}
+
+CONFLICT_MESSAGES = {
+    'contact_email': 'Email already registered',
+    'contact_phone': 'Phone already registered',
+    'license_number': 'License already registered'
+}
+
+
+def normalize_field(field, value):
+    """Emails are stored lower-cased, phone and license as entered"""
+    value = (value or '').strip()
+    return value.lower() if field == 'email' else value
+
+
+def find_conflict(model, email, phone, license_number):
+    """One round-trip for all three unique columns, returns the 409 message or None"""
+    columns = (model.contact_email, model.contact_phone, model.license_number)
+    values = (email, phone, license_number)
+    matches = db.session.execute(
+        select(*(column == value for column, value in zip(columns, values)))
+        .where(or_(*(column == value for column, value in zip(columns, values))))
+        .limit(3)
+    ).all()
+    for index, column in enumerate(columns):
+        if any(row[index] for row in matches):
+            return CONFLICT_MESSAGES[column.key]
+    return None
+
+
+def integrity_conflict(error):
+    """409 message for a unique-constraint violation raised at commit, None if it isn't one"""
+    message = str(getattr(error, 'orig', error))
+    for column, conflict in CONFLICT_MESSAGES.items():
+        if column in message:
+            return conflict
+    return None
+
+
+def field_exists(model, field, value):
+    """EXISTS probe for /api/check-field, known-free values are cached for a few seconds.
+
+    A value a registration just took is read from the primary and never cached: a 'free'
+    answer from a replica that hadn't caught up yet would outlive the discard in
+    forget_fields().
+    """
+    key = (model.__tablename__, field, value)
+    recent_write = db_router.recently_written(key)
+    if recent_write:
+        db_router.use_primary()
+    else:
+        hit, cached = field_check_cache.get(key)
+        if hit:
+            return cached
+    generation = field_check_cache.generation
+    column = getattr(model, FIELD_COLUMNS[field])
+    found = db.session.execute(select(exists().where(column == value))).scalar()
+    if not found and not recent_write:
+        field_check_cache.set(key, False, generation)  # only free values are cached
+    return bool(found)
+
+
+def forget_fields(model, email, phone, license_number):
+    """Drop cached 'free' answers for values a new registration just took, and read them from the primary for a while"""
+    for field, value in (('email', email), ('phone', phone), ('license', license_number)):
+        key = (model.__tablename__, field, value)
+        field_check_cache.discard(key)
+        db_router.remember_write(key)
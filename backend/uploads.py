@@ -0,0 +1,168 @@
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Request, current_app, request
+from werkzeug.utils import secure_filename
+from models import db
+
+
+class StagingRequest(Request):
+    """Request whose uploaded files are spooled straight into the staging folder.
+
+    The form parser writes each part to its own named temp file while it reads the
+    body, so the handler only has to pass the path on, never copy the bytes again.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        staging = current_app.config['UPLOAD_STAGING_FOLDER']
+        os.makedirs(staging, exist_ok=True)
+        stream = tempfile.NamedTemporaryFile('wb+', dir=staging, suffix='.part', delete=False)
+        self.staged_paths = getattr(self, 'staged_paths', set())
+        self.staged_paths.add(stream.name)
+        return stream
+
+
+class UploadPipeline:
+    """Background pool that hashes staged uploads into content-addressed storage.
+
+    stage() runs in the request and returns an interim /static URL that already works.
+    submit() hands the staged files of one model column to the pool, which hashes them,
+    keeps a single copy per content hash and rewrites the column with the final URLs.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.app = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def init_app(self, app):
+        """Read the folders and pool size from the flask config"""
+        self.app = app
+        self.workers = app.config.get('UPLOAD_WORKERS', self.workers)
+        app.request_class = StagingRequest
+        app.teardown_request(self._discard_unclaimed)
+        app.extensions['upload_pipeline'] = self
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='uploads')
+        return self._pool
+
+    def _url(self, path):
+        relative = os.path.relpath(path, self.app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+        return f'/static/uploads/{relative}'
+
+    def stage(self, file):
+        """Claim an uploaded file, returns (staged path, interim url) or None for an empty field"""
+        if not file or not file.filename:
+            return None
+        file.stream.flush()
+        staged_path = file.stream.name
+        file.stream.close()
+        request.staged_paths.discard(staged_path)
+        # keep the original extension so the stored file is still served with the right type
+        extension = os.path.splitext(secure_filename(file.filename))[1].lower()
+        final_path = staged_path[:-len('.part')] + extension
+        os.replace(staged_path, final_path)
+        request.claimed_paths = getattr(request, 'claimed_paths', []) + [final_path]
+        return final_path, self._url(final_path)
+
+    def discard_claimed(self):
+        """Drop the files staged by this request, for a registration that was rolled back"""
+        for path in getattr(request, 'claimed_paths', ()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def submit(self, model, row_id, column, staged, joined=False):
+        """Queue the staged files of one column, the row is updated once they are stored"""
+        if staged:
+            self.pool.submit(self._process, model, row_id, column, [path for path, _ in staged], joined)
+
+    def _store(self, staged_path):
+        """Link a staged file into content-addressed storage, returns (final url, path created or None).
+
+        The staged file stays in place until the row points at the stored copy, its interim
+        url keeps working until then and is what the row keeps if the update fails.
+        """
+        digest = hashlib.sha256()
+        with open(staged_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        extension = os.path.splitext(staged_path)[1]
+        store = self.app.config['UPLOAD_STORE_FOLDER']
+        folder = os.path.join(store, content_hash[:2], content_hash[2:4])
+        final_path = os.path.join(folder, content_hash + extension)
+        os.makedirs(folder, exist_ok=True)
+        try:
+            os.link(staged_path, final_path)
+        except FileExistsError:
+            return self._url(final_path), None  # identical document already stored
+        return self._url(final_path), final_path
+
+    def _process(self, model, row_id, column, staged_paths, joined):
+        urls, created, stored = [], [], []
+        for path in staged_paths:
+            try:
+                url, final_path = self._store(path)
+            except OSError as e:
+                # keep the interim /static/uploads/pending url, it still serves the file
+                urls.append(self._url(path))
+                with self._lock:
+                    self.failed += 1
+                self.app.logger.error('storing upload failed', extra={'path': path, 'error': str(e)})
+                continue
+            urls.append(url)
+            stored.append(path)
+            if final_path:
+                created.append(final_path)
+        try:
+            with self.app.app_context():
+                model.query.filter_by(id=row_id).update({column: ','.join(urls) if joined else urls[0]})
+                db.session.commit()
+        except Exception as e:
+            # the row still holds the interim urls, so the staged files stay; the stored
+            # copies are content-addressed and another upload may already point at them
+            with self._lock:
+                self.failed += 1
+            self.app.logger.error('updating upload urls failed', extra={
+                'table': model.__tablename__, 'column': column, 'row_id': row_id, 'error': str(e)})
+            return
+        for path in stored:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.stored += len(created)
+            self.deduplicated += len(stored) - len(created)
+
+    def _discard_unclaimed(self, exc=None):
+        """Remove staged parts of requests that failed validation before claiming them"""
+        for path in getattr(request, 'staged_paths', ()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """Counters for the stats endpoint"""
+        return {
+            'stored': self.stored,
+            'deduplicated': self.deduplicated,
+            'failed': self.failed
+        }
+
+
+upload_pipeline = UploadPipeline()
@@ -0,0 +1,147 @@
+from datetime import datetime, date
+from flask import current_app
+from models import MedicineBatch, Batch
+from cache import batch_cache
+from bloom import batch_filter
+from suggest import batch_suggestions
+
+
+def normalize_batch_number(value):
+    """Batch numbers are stored stripped and upper-cased by the loader"""
+    return (value or '').strip().upper()
+
+
+def snapshot(batch):
+    """Plain copy of the columns verification needs, safe to keep outside the db session"""
+    return {
+        'medicine_id': getattr(batch, 'medicine_id', None),  # the unit row, None for catalogue rows
+        'batch_number': batch.batch_number,
+        'medicine_name': batch.medicine_name,
+        'manufacture_date': batch.manufacture_date,
+        'expiry_date': batch.expiry_date,
+        'pharmacy_name': batch.pharmacy_name,
+        'date_uploaded': batch.date_uploaded
+    }
+
+
+def catalogue_enabled():
+    """True once migrate_catalogue.py has run and the config switched verification over"""
+    return current_app.config.get('BATCH_CATALOGUE_ENABLED', False)
+
+
+def lookup_batch(batch_number):
+    """Read-through lookup, returns the batch snapshot or None if the batch is unknown"""
+    key = normalize_batch_number(batch_number)
+    hit, record = batch_cache.get(key)
+    if hit:
+        return record
+
+    generation = batch_cache.generation
+    if not batch_filter.might_contain(key):
+        batch_cache.set(key, None, generation)  # definite miss, no database round-trip
+        return None
+    if catalogue_enabled():
+        batch = Batch.query.filter_by(batch_number=key).one_or_none()  # unique-key lookup
+    else:
+        # the batch's first unit row, the one the catalogue and the expiry report use
+        batch = MedicineBatch.query.filter_by(batch_number=key).order_by(MedicineBatch.medicine_id).first()
+    record = snapshot(batch) if batch else None
+    batch_cache.set(key, record, generation)
+    return record
+
+
+def lookup_batches(batch_numbers, chunk_size=500):
+    """Bulk read-through lookup, returns {normalized batch number: snapshot or None}.
+
+    Duplicates collapse onto one key and cached entries never reach the database,
+    the rest are resolved with one IN (...) query per chunk.
+    """
+    records = {}
+    pending = []
+    for key in dict.fromkeys(normalize_batch_number(value) for value in batch_numbers):
+        if not key:
+            continue
+        hit, record = batch_cache.get(key)
+        if hit:
+            records[key] = record
+        elif not batch_filter.might_contain(key):
+            records[key] = None
+        else:
+            pending.append(key)
+
+    generation = batch_cache.generation
+    model = Batch if catalogue_enabled() else MedicineBatch
+    order_by = Batch.id if model is Batch else MedicineBatch.medicine_id
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        found = {}
+        batches = (model.query
+                   .filter(model.batch_number.in_(chunk))
+                   .order_by(order_by))
+        for batch in batches:
+            # several unit rows share a batch number, keep the first like lookup_batch does
+            found.setdefault(batch.batch_number, batch)
+        for key in chunk:
+            record = snapshot(found[key]) if key in found else None
+            batch_cache.set(key, record, generation)
+            records[key] = record
+    return records
+
+
+def build_missing(batch_number):
+    """Response body for a batch number that is not in the database"""
+    return {
+        'success': False,
+        'isAuthentic': False,
+        'message': 'Batch number not found in database',
+        'batchNumber': batch_number
+    }
+
+
+def build_result(record, today=None):
+    """Build the verify-batch response body, expiry is checked against today on every call"""
+    today = today or datetime.utcnow().date()
+    is_expired = record['expiry_date'] < today
+    return {
+        'success': True,
+        'isAuthentic': not is_expired,
+        'batchNumber': record['batch_number'],
+        'productName': record['medicine_name'],
+        'manufacturer': 'Verified Manufacturer',
+        'manufactureDate': record['manufacture_date'].strftime('%Y-%m-%d'),
+        'expiryDate': record['expiry_date'].strftime('%Y-%m-%d'),
+        'status': 'Expired' if is_expired else 'Authentic',
+        'pharmacyName': record['pharmacy_name'],
+        'dateUploaded': record['date_uploaded'].strftime('%Y-%m-%d %H:%M:%S') if record['date_uploaded'] else None
+    }
+
+
+def verify_body(batch_number, record, anomalies=(), suggest_limit=0):
+    """verify-batch body and status code, the same for app.py and async_app.py"""
+    if record is None:
+        body = build_missing(batch_number)
+        # a misread O/0 or I/1 shouldn't end at the counterfeit warning
+        body['suggestions'] = [suggestion['batch_number'] for suggestion in
+                               batch_suggestions.suggest(batch_number, suggest_limit)] if suggest_limit else []
+        if suggest_limit and batch_suggestions.warming:
+            body['suggestionsWarming'] = True
+    else:
+        body = build_result(record)
+    body['scanAnomaly'] = bool(anomalies)
+    if anomalies:
+        body['anomalyReasons'] = anomalies
+    return body, (200 if record else 404)
+
+
+def filter_batches(query, args):
+    """Apply the optional /api/batches filters to a Query or select(), raises ValueError on a malformed date"""
+    prefix = args.get('batch_prefix', '').strip().upper()
+    if prefix:
+        query = query.filter(MedicineBatch.batch_number.startswith(prefix, autoescape=True))
+    if args.get('expires_after'):
+        query = query.filter(MedicineBatch.expiry_date >= date.fromisoformat(args['expires_after']))
+    if args.get('expires_before'):
+        query = query.filter(MedicineBatch.expiry_date <= date.fromisoformat(args['expires_before']))
+    if args.get('pharmacy_name'):
+        query = query.filter(MedicineBatch.pharmacy_name == args['pharmacy_name'].strip())
+    return query